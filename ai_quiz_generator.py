@@ -1,26 +1,255 @@
+import argparse
+import asyncio
+import hashlib
 import json
 import os
+import random
+import re
+import time
 import openai
 from dotenv import load_dotenv
 
+from knowledge_index import KnowledgeIndex
+from quiz_model import Quiz, QuizFormatError, question_from_generated
+
 load_dotenv()
 
 
-class QuizGenerator:
+class ResponseCache:
+    """On-disk cache of generated quizzes, one JSON file per request."""
+
+    def __init__(self, directory=".quiz_cache"):
+        self.directory = directory
+
+    @staticmethod
+    def make_key(context_hash, instruction, model, temperature):
+        """Return the cache key for a generation request."""
+        content = json.dumps([context_hash, instruction, model, temperature])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached quiz, or None."""
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, quiz):
+        """Store a quiz, replacing the file atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(key)}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(quiz, f)
+        os.replace(tmp_path, self._path(key))
+
+
+_TITLE = re.compile(r'"title"\s*:\s*("(?:[^"\\]|\\.)*")')
+_QUESTIONS = re.compile(r'"questions"\s*:\s*\[')
+
+
+class QuestionStreamParser:
+    """
+    Incremental parser for a quiz JSON document arriving in pieces.
+
+    feed() returns each question object as soon as its closing brace
+    arrives, so nothing waits for the end of the completion. Objects that
+    are not valid JSON are reported and skipped without affecting the
+    questions around them.
+    """
+
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.title = None
+        self.errors = []
+        self._buffer = ''
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        """Add text and return the question dicts completed by it."""
+        if self._done:
+            return []
+        self._buffer += text
+
+        if not self._in_array:
+            match = _QUESTIONS.search(self._buffer)
+            if match is None:
+                return []
+            title = _TITLE.search(self._buffer, 0, match.start())
+            if title:
+                self.title = json.loads(title.group(1))
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+
+        found = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == '{':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif c == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = buffer[self._start:i + 1]
+                    try:
+                        found.append(json.loads(raw))
+                    except ValueError as e:
+                        self.errors.append(f"{e}: {raw[:80]}")
+                        print(f"Skipping malformed question: {e}")
+            elif c == ']' and self._depth == 0:
+                self._done = True
+                break
+            i += 1
+
+        # Keep only the unfinished object, if any
+        if self._depth > 0:
+            self._buffer = buffer[self._start:]
+            self._pos = i - self._start
+            self._start = 0
+        else:
+            self._buffer = ''
+            self._pos = 0
+        return found
+
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model, messages, temperature=None, stream=False, **kwargs):
+        response = self.owner._respond(messages)
+        if stream:
+            return self.owner._stream(response.choices[0].message.content)
+        return response
+
+
+class _FakeAsyncCompletions(_FakeCompletions):
+    async def create(self, model, messages, temperature=None, **kwargs):
+        if self.owner.latency:
+            await asyncio.sleep(self.owner.latency)
+        return self.owner._respond(messages)
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeOpenAI:
+    """
+    Offline stand-in for the OpenAI client.
+
+    Answers chat completions with a small quiz derived from the instruction,
+    so the generation pipeline can be tested and benchmarked without network
+    access. Set fail_first to make the first N calls raise, to exercise retries.
+    """
+
+    def __init__(self, questions=3, latency=0.0, fail_first=0):
+        self.questions = questions
+        self.latency = latency
+        self.fail_first = fail_first
+        self.calls = 0
+        self.chat = _Namespace(completions=self._completions())
+
+    def _completions(self):
+        return _FakeCompletions(self)
+
+    def _respond(self, messages):
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise ConnectionError("simulated API failure")
+
+        instruction = messages[-1]['content'].rsplit("Instruction:", 1)[-1].split("\n", 1)[0].strip()
+        quiz = {
+            "title": f"Quiz: {instruction[:40]}",
+            "questions": [
+                {
+                    "question": f"Question {i + 1} about {instruction}?",
+                    "type": "multiple_choice",
+                    "options": [f"{label}) Option {label}" for label in "ABCD"],
+                    "correct_answer": "ABCD"[i % 4],
+                    "explanation": f"Option {'ABCD'[i % 4]} is correct."
+                }
+                for i in range(self.questions)
+            ]
+        }
+        content = f"```json\n{json.dumps(quiz, indent=2)}\n```"
+        return _Namespace(choices=[_Namespace(message=_Namespace(content=content))])
+
+    def _stream(self, content, size=16):
+        for i in range(0, len(content), size):
+            if self.latency:
+                time.sleep(self.latency / 10)
+            yield _Namespace(choices=[_Namespace(delta=_Namespace(content=content[i:i + size]))])
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    """Async variant of FakeOpenAI, with optional simulated latency per call."""
+
+    def _completions(self):
+        return _FakeAsyncCompletions(self)
+
+
+class QuizGenerator:
+    def __init__(self, client=None, async_client=None, model="gpt-4o-mini", temperature=0.7,
+                 cache_dir=".quiz_cache", knowledge_base_path="quiz_knowledge_base.md", top_k=4):
+        if client is None and async_client is None:
+            client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+            async_client = openai.AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = client
+        self.async_client = async_client
+        self.model = model
+        self.temperature = temperature
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.knowledge_base_path = knowledge_base_path
         self.knowledge_base = self._load_knowledge_base()
+        self.top_k = top_k
+        self.index = KnowledgeIndex(knowledge_base_path) if top_k else None
 
     def _load_knowledge_base(self):
         """Load the knowledge base file."""
-        with open("quiz_knowledge_base.md", 'r') as f:
+        with open(self.knowledge_base_path, 'r') as f:
             return f.read()
 
-    def generate_quiz(self, instruction):
-        """Generate a quiz based on instruction."""
-        prompt = f"""
+    def _context(self, instruction):
+        """
+        Return the knowledge base text to include for an instruction.
+
+        Small knowledge bases are included whole; larger ones are narrowed
+        to the top_k chunks the index ranks as most relevant.
+        """
+        if not self.index or len(self.index) <= self.top_k:
+            return self.knowledge_base
+        chunks = self.index.search(instruction, self.top_k)
+        return "\n\n".join(chunks) if chunks else self.knowledge_base
+
+    def _build_prompt(self, instruction, context=None):
+        """Build the generation prompt for an instruction."""
+        if context is None:
+            context = self._context(instruction)
+        return f"""
 Knowledge Base:
-{self.knowledge_base}
+{context}
 
 Instruction: {instruction}
 
@@ -32,25 +261,152 @@ Create a quiz as JSON with this structure:
             "question": "Question text?",
             "type": "multiple_choice",
             "options": ["A) Option 1", "B) Option 2", "C) Option 3", "D) Option 4"],
-            "correct_answer": "A"
+            "correct_answer": "A",
+            "explanation": "Why the answer is correct."
         }}
     ]
 }}
 """
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-
-        # Clean and parse response
-        quiz_json = response.choices[0].message.content.strip()
+    @staticmethod
+    def _parse_response(content):
+        """Clean and parse a completion into quiz data."""
+        quiz_json = content.strip()
         if quiz_json.startswith('```json'):
             quiz_json = quiz_json[7:-3]
 
         return json.loads(quiz_json)
 
+    def _cache_key(self, instruction, context):
+        context_hash = hashlib.sha256(context.encode()).hexdigest()
+        return ResponseCache.make_key(context_hash, instruction, self.model, self.temperature)
+
+    def generate_quiz(self, instruction):
+        """Generate a quiz based on instruction."""
+        context = self._context(instruction)
+        key = self._cache_key(instruction, context)
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": self._build_prompt(instruction, context)}],
+            temperature=self.temperature
+        )
+        quiz = self._parse_response(response.choices[0].message.content)
+
+        if self.cache:
+            self.cache.set(key, quiz)
+        return quiz
+
+    async def _generate_quiz_async(self, instruction, semaphore, retries, backoff):
+        context = self._context(instruction)
+        key = self._cache_key(instruction, context)
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        messages = [{"role": "user", "content": self._build_prompt(instruction, context)}]
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    if self.async_client is not None:
+                        response = await self.async_client.chat.completions.create(
+                            model=self.model, messages=messages, temperature=self.temperature)
+                    else:
+                        response = await asyncio.to_thread(
+                            self.client.chat.completions.create,
+                            model=self.model, messages=messages, temperature=self.temperature)
+                quiz = self._parse_response(response.choices[0].message.content)
+                break
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt * (0.5 + random.random())
+                print(f"Generation of '{instruction[:40]}' failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        if self.cache:
+            self.cache.set(key, quiz)
+        return quiz
+
+    async def generate_quizzes(self, instructions, concurrency=4, retries=3, backoff=1.0):
+        """
+        Generate quizzes for many instructions concurrently.
+
+        At most `concurrency` requests are in flight at once, and failed
+        requests are retried with exponential backoff. Results are returned
+        in the order of the instructions; an instruction that still fails
+        after all retries gets its exception in place of a quiz.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(
+            *(self._generate_quiz_async(instruction, semaphore, retries, backoff) for instruction in instructions),
+            return_exceptions=True
+        )
+
+    def stream_quiz(self, instruction, parser=None):
+        """
+        Generate a quiz as a stream, yielding validated Questions as they arrive.
+
+        Invalid questions are skipped. Once the stream ends the whole quiz
+        is cached like one from generate_quiz(); a cached quiz is replayed
+        at once. The title, when known, is available as parser.title.
+        """
+        parser = parser or QuestionStreamParser()
+        context = self._context(instruction)
+        key = self._cache_key(instruction, context)
+        cached = self.cache.get(key) if self.cache else None
+
+        if cached is not None:
+            parser.title = cached.get('title')
+            generated = cached.get('questions', [])
+        else:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": self._build_prompt(instruction, context)}],
+                temperature=self.temperature,
+                stream=True
+            )
+            generated = (data for chunk in stream if chunk.choices and chunk.choices[0].delta.content
+                         for data in parser.feed(chunk.choices[0].delta.content))
+
+        received = []
+        for position, data in enumerate(generated):
+            received.append(data)
+            try:
+                yield question_from_generated(data, position)
+            except QuizFormatError as e:
+                print(f"Skipping generated {e}")
+
+        if cached is None and self.cache and received and not parser.errors:
+            self.cache.set(key, {"title": parser.title, "questions": received})
+
+    def stream_to_quiz_bank(self, instruction, name, directory="quiz_bank"):
+        """
+        Stream a quiz into <directory>/<name>.json, adding each question as it arrives.
+
+        The file is replaced atomically after every question, so the quiz
+        bank never reads a partial file. Returns the final Quiz, or None if
+        no valid question was generated.
+        """
+        parser = QuestionStreamParser()
+        path = os.path.join(directory, f"{name}.json")
+        questions = []
+        quiz = None
+        for question in self.stream_quiz(instruction, parser):
+            questions.append(question)
+            quiz = Quiz(name, parser.title or name, tuple(questions))
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(quiz.to_dict(), f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            print(f"Question {len(questions)} written to {path}")
+        return quiz
+
     def save_quiz(self, quiz_data, filename=None):
         """Save quiz to file."""
         if not filename:
@@ -70,11 +426,38 @@ Create a quiz as JSON with this structure:
 
 # Usage
 if __name__ == "__main__":
-    generator = QuizGenerator()
+    parser = argparse.ArgumentParser(description="Generate quizzes from the knowledge base.")
+    parser.add_argument("--batch", help="file with one instruction per line to generate concurrently")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum requests in flight")
+    parser.add_argument("--stream", metavar="NAME", help="stream the quiz into quiz_bank/NAME.json")
+    parser.add_argument("--fake", action="store_true", help="use the offline fake client")
+    args = parser.parse_args()
+
+    if args.fake:
+        generator = QuizGenerator(client=FakeOpenAI(latency=0.2), async_client=FakeAsyncOpenAI(latency=0.2))
+    else:
+        generator = QuizGenerator()
 
-    instruction = input("Enter quiz instruction: ")
-    quiz = generator.generate_quiz(instruction)
-    filename = generator.save_quiz(quiz)
+    if args.batch:
+        with open(args.batch, 'r') as f:
+            instructions = [line.strip() for line in f if line.strip()]
+        quizzes = asyncio.run(generator.generate_quizzes(instructions, concurrency=args.concurrency))
+        for instruction, quiz in zip(instructions, quizzes):
+            if isinstance(quiz, Exception):
+                print(f"Failed: {instruction} ({quiz})")
+            else:
+                print(f"Quiz saved to: {generator.save_quiz(quiz)}")
+    elif args.stream:
+        instruction = input("Enter quiz instruction: ")
+        quiz = generator.stream_to_quiz_bank(instruction, args.stream)
+        if quiz is None:
+            print("No valid questions were generated")
+        else:
+            print(f"Quiz '{quiz.title}' saved with {len(quiz)} questions")
+    else:
+        instruction = input("Enter quiz instruction: ")
+        quiz = generator.generate_quiz(instruction)
+        filename = generator.save_quiz(quiz)
 
-    print(f"Quiz saved to: {filename}")
-    generator.print_summary(quiz)
\ No newline at end of file
+        print(f"Quiz saved to: {filename}")
+        generator.print_summary(quiz)
@@ -1,10 +1,20 @@
 # auth.py
+import asyncio
+import functools
 import hashlib
-from typing import Dict, Optional
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
 from nicegui import ui, app
 
 # User database with hashed passwords
-# In production, use a proper database with salted hashes
+# Legacy unsalted SHA-256 hashes are upgraded to salted PBKDF2 on the next successful login.
+# The upgrade only changes this dict, so it is not persisted and happens again after every restart.
 USERS: Dict[str, Dict[str, str]] = {
     'admin': {
         'password_hash': hashlib.sha256('Blueberry33@@'.encode()).hexdigest(),
@@ -19,22 +29,128 @@ USERS: Dict[str, Dict[str, str]] = {
 # Session configuration
 SESSION_TIMEOUT = 3600  # 1 hour in seconds
 
+# Password hashing configuration
+PBKDF2_ITERATIONS = int(os.environ.get('AUTH_PBKDF2_ITERATIONS', '600000'))
+AUTH_WORKERS = int(os.environ.get('AUTH_WORKERS', str(min(4, os.cpu_count() or 1))))
+VERIFIED_CACHE_TTL = 300  # Seconds a successful verification is remembered
+VERIFIED_CACHE_SIZE = 1000
+
+# Key derivation runs here instead of on the event loop. hashlib releases the
+# GIL while hashing, so the workers hash in parallel.
+_auth_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix='auth')
+
+# Recently verified credentials: HMAC(username, password) -> (expiry, stored hash)
+_verified: Dict[bytes, Tuple[float, str]] = {}
+_verified_secret = secrets.token_bytes(32)
+_users_lock = threading.Lock()
+
+
+def hash_password(password: str, salt: Optional[bytes] = None, iterations: Optional[int] = None) -> str:
+    """Hash a password for storing, as pbkdf2_sha256$iterations$salt$hash."""
+    salt = salt if salt is not None else secrets.token_bytes(16)
+    iterations = iterations or PBKDF2_ITERATIONS
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password: str, password_hash: str) -> Tuple[bool, bool]:
+    """
+    Check a password against a stored hash.
+
+    Returns:
+        Whether the password matches, and whether the hash should be
+        upgraded (legacy SHA-256 or fewer iterations than configured).
+    """
+    if password_hash.startswith('pbkdf2_sha256$'):
+        try:
+            _, iterations, salt, expected = password_hash.split('$')
+            iterations = int(iterations)
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), iterations)
+        except ValueError:
+            return False, False
+        matches = hmac.compare_digest(digest.hex(), expected)
+        return matches, matches and iterations < PBKDF2_ITERATIONS
+
+    # Legacy unsalted SHA-256
+    matches = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), password_hash)
+    return matches, matches
+
+
+@functools.lru_cache(maxsize=4)
+def _dummy_hash(iterations: int) -> str:
+    """Hash verified against for unknown users, so they take as long as known ones."""
+    return hash_password(secrets.token_hex(16), iterations=iterations)
+
+
+def _check_credentials(username: str, password: str) -> bool:
+    """
+    Verify credentials and upgrade the stored hash if needed (runs on a worker).
+
+    The upgraded hash is only kept in USERS, in memory.
+    """
+    user = USERS.get(username)
+    if not user:
+        verify_password(password, _dummy_hash(PBKDF2_ITERATIONS))
+        return False
+
+    stored = user['password_hash']
+    matches, needs_rehash = verify_password(password, stored)
+    if not matches and not stored.startswith('pbkdf2_sha256$'):
+        # A wrong password for a legacy hash would otherwise fail much faster than for an unknown user
+        verify_password(password, _dummy_hash(PBKDF2_ITERATIONS))
+    if matches and needs_rehash:
+        new_hash = hash_password(password)
+        with _users_lock:
+            if user['password_hash'] == stored:
+                user['password_hash'] = new_hash
+    return matches
+
+
+def _cache_key(username: str, password: str) -> bytes:
+    return hmac.new(_verified_secret, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+
+def _cached(username: str, password: str) -> bool:
+    entry = _verified.get(_cache_key(username, password))
+    user = USERS.get(username)
+    return (entry is not None and user is not None
+            and entry[0] > time.monotonic() and entry[1] == user['password_hash'])
 
-def hash_password(password: str) -> str:
-    """Hash a password for storing."""
-    return hashlib.sha256(password.encode()).hexdigest()
+
+def _remember(username: str, password: str):
+    if len(_verified) >= VERIFIED_CACHE_SIZE:
+        now = time.monotonic()
+        for key in [key for key, (expiry, _) in _verified.items() if expiry <= now]:
+            del _verified[key]
+        if len(_verified) >= VERIFIED_CACHE_SIZE:
+            _verified.clear()
+    _verified[_cache_key(username, password)] = (time.monotonic() + VERIFIED_CACHE_TTL,
+                                                  USERS[username]['password_hash'])
 
 
 def authenticate(username: str, password: str) -> bool:
-    """Authenticate user credentials."""
+    """Authenticate user credentials (blocking, prefer authenticate_async in handlers)."""
     if not username or not password:
         return False
+    if _cached(username, password):
+        return True
+    if _check_credentials(username, password):
+        _remember(username, password)
+        return True
+    return False
 
-    user = USERS.get(username)
-    if not user:
-        return False
 
-    return user['password_hash'] == hash_password(password)
+async def authenticate_async(username: str, password: str) -> bool:
+    """Authenticate user credentials on the worker pool without blocking the event loop."""
+    if not username or not password:
+        return False
+    if _cached(username, password):
+        return True
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(_auth_executor, _check_credentials, username, password):
+        _remember(username, password)
+        return True
+    return False
 
 
 def get_current_user() -> Optional[str]:
@@ -67,6 +183,39 @@ def login_required():
     return True
 
 
+# Roles that may see every student's progress and results
+TEACHER_ROLES = ('teacher', 'admin')
+
+
+def has_role(roles) -> bool:
+    """Check if the logged-in user has one of the given roles."""
+    return is_authenticated() and get_user_role(get_current_user()) in roles
+
+
+def role_required(roles, next_page: str = '/') -> bool:
+    """
+    Redirect unless the logged-in user has one of the given roles (for use in page functions).
+
+    Visitors who are not logged in are sent to the login page, which
+    returns them to next_page afterwards.
+    """
+    if not is_authenticated():
+        ui.navigate.to(f'/login?next_page={quote(next_page)}')
+        return False
+    if get_user_role(get_current_user()) not in roles:
+        ui.notify('Access denied: teacher privileges required', color='negative')
+        ui.navigate.to('/')
+        return False
+    return True
+
+
+def safe_next_page(next_page: Optional[str]) -> str:
+    """Return next_page if it is a path on this server, '/' otherwise."""
+    if not next_page or not next_page.startswith('/') or next_page.startswith('//') or '\\' in next_page:
+        return '/'
+    return next_page
+
+
 def logout():
     """Log out the current user."""
     try:
@@ -77,8 +226,8 @@ def logout():
     ui.navigate.to('/login')
 
 
-def render_login_page():
-    """Render the login page with improved styling and validation."""
+def render_login_page(next_page: str = '/'):
+    """Render the login page, going to next_page after a successful login."""
     # Apply global styles
     ui.add_head_html('''
         <style>
@@ -111,7 +260,7 @@ def render_login_page():
                 username.on('focus', clear_error)
                 password.on('focus', clear_error)
 
-                def attempt_login():
+                async def attempt_login():
                     # Clear previous errors
                     error_label.text = ''
 
@@ -127,7 +276,7 @@ def render_login_page():
                         return
 
                     # Attempt authentication
-                    if authenticate(username.value.strip(), password.value):
+                    if await authenticate_async(username.value.strip(), password.value):
                         try:
                             app.storage.user.update({
                                 'username': username.value.strip(),
@@ -138,7 +287,7 @@ def render_login_page():
                             # Fallback if storage fails
                             print(f"Storage warning: {e}")
                         ui.notify(f'Welcome back, {username.value}!', color='positive')
-                        ui.navigate.to('/')
+                        ui.navigate.to(safe_next_page(next_page))
                     else:
                         error_label.text = 'Invalid username or password'
                         password.value = ''  # Clear password field
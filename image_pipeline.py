@@ -0,0 +1,222 @@
+# image_pipeline.py
+import hashlib
+import html
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it originals are served as they are
+    Image = None
+
+STATIC_PREFIX = '/static/'
+IMAGES_PREFIX = '/images/'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=3600'
+
+_VARIANT_NAME = re.compile(r'^[0-9a-f]{16}-\d+w\.(webp|png|jpg)$')
+
+
+class ImageInfo(NamedTuple):
+    """The URLs to use for one question image."""
+    src: str
+    srcset: Tuple[Tuple[str, int], ...]  # (url, width) of each resized variant
+    width: Optional[int]
+    height: Optional[int]
+
+
+class ImagePipeline:
+    """
+    Resized, compressed variants of question images.
+
+    Images referenced as /static/<file> are read from source_dir. For each
+    one, width-limited WebP variants are written to cache_dir under names
+    that contain a hash of the source, so their URLs never change meaning
+    and can be cached by browsers for a year. Without Pillow, or for images
+    outside source_dir, the original URL is used unchanged.
+
+    Creating variants hashes and resizes the image, so pages never wait for
+    it: img_tag() uses the original URL until the variants exist and has
+    them created on a background thread meanwhile.
+    """
+
+    def __init__(self, source_dir: str = 'static', cache_dir: str = '.image_cache',
+                 widths: Tuple[int, ...] = (320, 640, 960), quality: int = 80):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self._infos: Dict[str, Tuple[Tuple[int, int], ImageInfo]] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+
+    def source_path(self, image_path: str) -> Optional[str]:
+        """Return the file behind a /static/ URL, or None if it is elsewhere."""
+        if not image_path.startswith(STATIC_PREFIX):
+            return None
+        relative = os.path.normpath(image_path[len(STATIC_PREFIX):])
+        if relative.startswith('..') or os.path.isabs(relative):
+            return None
+        return os.path.join(self.source_dir, relative)
+
+    def _signature(self, image_path: str) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+        path = self.source_path(image_path)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        return path, (stat.st_mtime_ns, stat.st_size) if stat is not None else None
+
+    def info(self, image_path: str) -> ImageInfo:
+        """Return the URLs for an image, creating its variants first if needed (blocking)."""
+        path, signature = self._signature(image_path)
+        if signature is None:
+            return ImageInfo(image_path, (), None, None)
+
+        with self._lock:
+            cached = self._infos.get(image_path)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+        # Built without the lock, so pages asking for other images don't wait meanwhile
+        info = self._build(image_path, path)
+        with self._lock:
+            self._infos[image_path] = (signature, info)
+        return info
+
+    def ready_info(self, image_path: str) -> Optional[ImageInfo]:
+        """
+        Return the URLs for an image without creating anything.
+
+        Returns:
+            None if the image has variants that were not created yet.
+        """
+        _, signature = self._signature(image_path)
+        if signature is None or Image is None:
+            return ImageInfo(image_path, (), None, None)
+        with self._lock:
+            cached = self._infos.get(image_path)
+        return cached[1] if cached is not None and cached[0] == signature else None
+
+    def create_later(self, image_path: str):
+        """Have the variants of an image created on the background thread."""
+        with self._lock:
+            if image_path in self._pending:
+                return
+            self._pending.add(image_path)
+        self._executor.submit(self._create, image_path)
+
+    def _create(self, image_path: str):
+        try:
+            self.info(image_path)
+        except Exception as e:
+            print(f"Could not create variants of {image_path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(image_path)
+
+    def _build(self, image_path: str, path: str) -> ImageInfo:
+        if Image is None:
+            return ImageInfo(image_path, (), None, None)
+
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        try:
+            with Image.open(path) as image:
+                image.load()
+                width, height = image.size
+                widths = sorted({*(w for w in self.widths if w < width), min(width, self.widths[-1])})
+                variants = []
+                for target in widths:
+                    name = f"{digest}-{target}w.webp"
+                    variant_path = os.path.join(self.cache_dir, name)
+                    if not os.path.exists(variant_path):
+                        self._write_variant(image, target, variant_path)
+                    variants.append((IMAGES_PREFIX + name, target))
+        except (OSError, ValueError) as e:
+            print(f"Could not create variants of {path}: {e}")
+            return ImageInfo(image_path, (), None, None)
+
+        largest = variants[-1][1]
+        return ImageInfo(variants[-1][0], tuple(variants), largest, round(height * largest / width))
+
+    def _write_variant(self, image, width: int, variant_path: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        tmp_path = f"{variant_path}.{threading.get_ident()}.tmp"  # The warm-up may create the same variant
+        image.save(tmp_path, 'WEBP', quality=self.quality, method=4)
+        os.replace(tmp_path, variant_path)
+
+    def warm(self, image_paths: List[str]) -> int:
+        """Create variants for the given images ahead of time and return how many were processed."""
+        for image_path in image_paths:
+            self.info(image_path)
+        return len(image_paths)
+
+    def variant_path(self, name: str) -> Optional[str]:
+        """Return the file of a variant served under /images/, or None for an invalid name."""
+        if not _VARIANT_NAME.match(name):
+            return None
+        path = os.path.join(self.cache_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def img_tag(self, image_path: str, alt_text: str, css_class: str = '', style: str = '',
+                sizes: str = '(max-width: 640px) 100vw, 640px') -> str:
+        """Return an <img> tag that lazy loads the best variant for the screen, or the original until it exists."""
+        info = self.ready_info(image_path)
+        if info is None:
+            self.create_later(image_path)
+            info = ImageInfo(image_path, (), None, None)
+        attributes = self._source_attributes(info, sizes) + [f'alt="{html.escape(alt_text)}"']
+        if info.width and info.height:
+            attributes += [f'width="{info.width}"', f'height="{info.height}"']
+        attributes += ['loading="lazy"', 'decoding="async"']
+        if css_class:
+            attributes.append(f'class="{css_class}"')
+        if style:
+            attributes.append(f'style="{style}"')
+        return f"<img {' '.join(attributes)}>"
+
+    def preload_tag(self, image_path: str, sizes: str = '(max-width: 640px) 100vw, 640px') -> str:
+        """
+        Return a hidden <img> that fetches the image in the background.
+
+        With the same srcset and sizes as img_tag(), the browser downloads
+        exactly the variant the visible image will use later, so showing it
+        is served from the browser cache. Returns an empty string while the
+        variants are being created, and has them created if needed.
+        """
+        info = self.ready_info(image_path)
+        if info is None:
+            self.create_later(image_path)
+            return ''
+        attributes = self._source_attributes(info, sizes)
+        attributes += ['alt=""', 'aria-hidden="true"', 'fetchpriority="low"', 'style="display: none"']
+        return f"<img {' '.join(attributes)}>"
+
+    @staticmethod
+    def _source_attributes(info: ImageInfo, sizes: str) -> List[str]:
+        attributes = [f'src="{html.escape(info.src)}"']
+        if info.srcset:
+            srcset = ', '.join(f"{html.escape(url)} {width}w" for url, width in info.srcset)
+            attributes += [f'srcset="{srcset}"', f'sizes="{sizes}"']
+        return attributes
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag, so a 304 can be sent."""
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == '*' or etag in (tag.strip() for tag in if_none_match.split(','))
+
+
+image_pipeline = ImagePipeline(
+    source_dir=os.environ.get('IMAGE_SOURCE_DIR', 'static'),
+    cache_dir=os.environ.get('IMAGE_CACHE_DIR', '.image_cache'),
+)
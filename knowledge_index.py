@@ -0,0 +1,180 @@
+# knowledge_index.py
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from has have how in is it its of on or that the this to was were what when '
+    'which who why will with about into than then there these those can do does not no so such quiz question '
+    'questions create make generate write'.split()
+)
+_BLOCK_START = re.compile(r"^(#{1,6}\s|>\s*\[!)")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase search terms, dropping stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS and len(token) > 1]
+
+
+def split_chunks(text: str, max_chars: int = 1500) -> List[str]:
+    """
+    Split Markdown into chunks for retrieval.
+
+    Blocks start at headings, callouts (`> [!note]`) and blank lines.
+    Consecutive blocks under the same heading are packed into chunks of up
+    to max_chars, and each chunk is prefixed with its heading so that it
+    stands on its own in a prompt.
+    """
+    blocks: List[Tuple[str, str]] = []
+    heading = ''
+    current: List[str] = []
+
+    def end_block():
+        if any(line.strip() for line in current):
+            blocks.append((heading, '\n'.join(current).strip()))
+        current.clear()
+
+    for line in text.splitlines():
+        if not line.strip() or _BLOCK_START.match(line):
+            end_block()
+        if line.startswith('#'):
+            heading = line.strip()
+            continue
+        current.append(line)
+    end_block()
+
+    chunks: List[str] = []
+    packed: List[str] = []
+    packed_heading = None
+    for block_heading, block in blocks:
+        if packed and (block_heading != packed_heading or sum(map(len, packed)) + len(block) > max_chars):
+            chunks.append('\n\n'.join(([packed_heading] if packed_heading else []) + packed))
+            packed = []
+        packed_heading = block_heading
+        packed.append(block)
+    if packed:
+        chunks.append('\n\n'.join(([packed_heading] if packed_heading else []) + packed))
+    return chunks
+
+
+class KnowledgeIndex:
+    """
+    BM25 index over the chunks of a Markdown knowledge base.
+
+    The index is persisted next to the knowledge base and keyed by the file
+    hash. When the file changes, only chunks whose text changed are
+    tokenized again; unchanged chunks reuse their stored term counts.
+    """
+
+    def __init__(self, path: str, index_path: Optional[str] = None, max_chars: int = 1500,
+                 k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.index_path = index_path or os.path.join(os.path.dirname(path) or '.',
+                                                     f".{os.path.basename(path)}.index.json")
+        self.max_chars = max_chars
+        self.k1 = k1
+        self.b = b
+        self.file_hash = ''
+        self.chunks: List[str] = []
+        self._terms: List[Dict[str, int]] = []
+        self._lengths: List[int] = []
+        self._idf: Dict[str, float] = {}
+        self.load()
+
+    @staticmethod
+    def _chunk_hash(chunk: str) -> str:
+        return hashlib.sha256(chunk.encode()).hexdigest()
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != INDEX_VERSION or data.get('max_chars') != self.max_chars:
+            return {}
+        return data
+
+    def load(self) -> bool:
+        """Load the index, rebuilding it if the knowledge base changed. Returns True if it was rebuilt."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        file_hash = hashlib.sha256(text.encode()).hexdigest()
+
+        stored = self._read_index()
+        if stored.get('file_hash') == file_hash:
+            self.file_hash = file_hash
+            self.chunks = [chunk['text'] for chunk in stored['chunks']]
+            self._terms = [chunk['terms'] for chunk in stored['chunks']]
+            self._update_statistics()
+            return False
+
+        known = {chunk['hash']: chunk['terms'] for chunk in stored.get('chunks', ())}
+        self.file_hash = file_hash
+        self.chunks = split_chunks(text, self.max_chars)
+        self._terms = []
+        reused = 0
+        for chunk in self.chunks:
+            terms = known.get(self._chunk_hash(chunk))
+            if terms is None:
+                terms = dict(Counter(tokenize(chunk)))
+            else:
+                reused += 1
+            self._terms.append(terms)
+        self._update_statistics()
+        self._write_index()
+        print(f"Indexed {len(self.chunks)} knowledge base chunks ({len(self.chunks) - reused} new)")
+        return True
+
+    def _write_index(self):
+        data = {
+            'version': INDEX_VERSION,
+            'max_chars': self.max_chars,
+            'file_hash': self.file_hash,
+            'chunks': [{'hash': self._chunk_hash(chunk), 'text': chunk, 'terms': terms}
+                       for chunk, terms in zip(self.chunks, self._terms)],
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not write knowledge index {self.index_path}: {e}")
+
+    def _update_statistics(self):
+        self._lengths = [sum(terms.values()) for terms in self._terms]
+        document_frequency = Counter(term for terms in self._terms for term in terms)
+        count = len(self._terms)
+        self._idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def search(self, query: str, k: int = 4) -> List[str]:
+        """Return the k chunks most relevant to the query, in knowledge base order."""
+        if not self.chunks:
+            return []
+        average_length = sum(self._lengths) / len(self._lengths) or 1.0
+        query_terms = set(tokenize(query))
+
+        scores = []
+        for i, terms in enumerate(self._terms):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / average_length)
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((score, i))
+
+        best = sorted(i for _, i in sorted(scores, reverse=True)[:k])
+        return [self.chunks[i] for i in best]
+
+    def __len__(self) -> int:
+        return len(self.chunks)
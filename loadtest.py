@@ -0,0 +1,416 @@
+# loadtest.py
+"""
+Classroom load test: simulate N students taking a quiz against a running server.
+
+Each simulated student drives the real pages the way a browser does: it loads
+the HTML of /dashboard, / , /quiz and /results over HTTP, connects to the
+NiceGUI websocket of every page and sends the same element events a browser
+sends (typing a name, picking options, clicking buttons).
+
+Usage:
+    python loadtest.py --students 30
+    python loadtest.py --students 200 --ramp-up 20 --start-server
+    python loadtest.py --students 30 --record trace.json
+    python loadtest.py --trace trace.json
+
+A trace stores when each student starts and how long they think before each
+action, so a run can be replayed with exactly the same timing.
+"""
+
+import argparse
+import ast
+import asyncio
+import html
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+import httpx
+import socketio
+
+SOCKET_PATH = '/_nicegui_ws/socket.io'
+ELEMENTS_RE = re.compile(r'parseElements\(String\.raw`(.*?)`\)', re.DOTALL)
+QUERY_RE = re.compile(r'query: (\{.*?\}),\n')
+
+
+class PageError(Exception):
+    """Raised when a page does not behave as a browser would expect."""
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the pct-th percentile of values using linear interpolation."""
+    ordered = sorted(values)
+    if not ordered:
+        return float('nan')
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def parse_page(text: str):
+    """Extract the element tree and websocket query parameters from a page."""
+    elements_match = ELEMENTS_RE.search(text)
+    query_match = QUERY_RE.search(text)
+    if not elements_match or not query_match:
+        raise PageError('page does not look like a NiceGUI page')
+    elements = json.loads(html.unescape(elements_match.group(1)))
+    return elements, ast.literal_eval(query_match.group(1))  # Rendered as a Python dict literal
+
+
+class Page:
+    """A page loaded by a simulated student, connected to its websocket."""
+
+    def __init__(self, base_url: str, elements: dict, query: dict, cookies: str):
+        self.base_url = base_url
+        self.elements = elements
+        self.query = query
+        self.cookies = cookies
+        self.client_id = query['client_id']
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.messages: 'asyncio.Queue[tuple]' = asyncio.Queue()
+        self.sio.on('update', self._on_update)
+        for event in ('open', 'run_javascript', 'notify'):
+            self.sio.on(event, lambda msg, event=event: self.messages.put_nowait((event, msg)))
+
+    async def _on_update(self, msg: dict):
+        for element_id, element in msg.items():
+            if element_id == '_id':
+                continue
+            if element is None:
+                self.elements.pop(element_id, None)
+            else:
+                self.elements[element_id] = element
+        self.messages.put_nowait(('update', msg))
+
+    async def connect(self):
+        query = {**self.query, 'tab_id': str(uuid.uuid4()), 'document_id': str(uuid.uuid4())}
+        query = {k: str(v).lower() if isinstance(v, bool) else v for k, v in query.items()}
+        await self.sio.connect(f"{self.base_url}?{urlencode(query)}", socketio_path=SOCKET_PATH,
+                               transports=['websocket'], headers={'Cookie': self.cookies})
+
+    async def close(self):
+        await self.sio.disconnect()
+
+    def find(self, tag: Optional[str] = None, text: Optional[str] = None,
+             prop: Optional[tuple] = None) -> List[str]:
+        """Return the IDs of elements matching tag, visible text and/or a prop value."""
+        found = []
+        for element_id, element in self.elements.items():
+            if tag is not None and element.get('tag') != tag:
+                continue
+            if text is not None and text not in (element.get('text'), element.get('props', {}).get('label')):
+                continue
+            if prop is not None and element.get('props', {}).get(prop[0]) != prop[1]:
+                continue
+            found.append(element_id)
+        return sorted(found, key=int)
+
+    async def emit(self, element_id: str, event_type: str, *args):
+        """Send an event to every listener of the element, like the browser does."""
+        listeners = [e for e in self.elements[element_id].get('events', []) if e['type'] == event_type]
+        await self._send(element_id, event_type, listeners, args)
+
+    async def set_value(self, element_id: str, value):
+        """Send a value change, whichever model property the element binds."""
+        listeners = [e for e in self.elements[element_id].get('events', []) if e['type'].startswith('update:')]
+        await self._send(element_id, 'update', listeners, [value])
+
+    async def _send(self, element_id: str, event_type: str, listeners: list, args):
+        if not listeners:
+            raise PageError(f"element {element_id} has no {event_type} listener")
+        for listener in listeners:
+            await self.sio.emit('event', {
+                'id': int(element_id),
+                'client_id': self.client_id,
+                'listener_id': listener['listener_id'],
+                'args': [json.dumps(arg) for arg in args],
+            })
+
+    async def wait_for(self, *events: str, timeout: float = 30) -> tuple:
+        """Wait for the next server message of one of the given kinds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PageError(f"timed out waiting for {'/'.join(events)}")
+            kind, msg = await asyncio.wait_for(self.messages.get(), remaining)
+            if kind == 'notify':
+                raise PageError(f"server notification: {msg.get('message')}")
+            if kind in events:
+                return kind, msg
+
+    async def wait_for_replacement(self, element_id: str, timeout: float = 30) -> str:
+        """Wait until the element is replaced by a refresh or the page navigates away."""
+        deadline = time.monotonic() + timeout
+        while element_id in self.elements:
+            kind, _ = await self.wait_for('update', 'open', timeout=deadline - time.monotonic())
+            if kind == 'open':
+                return kind
+        return 'update'
+
+
+class Student:
+    """One simulated student working through the dashboard → quiz → results flow."""
+
+    def __init__(self, number: int, run: 'LoadTest', think: List[float]):
+        self.number = number
+        self.run = run
+        self.think = list(think)
+        self.recorded_think: List[float] = []
+        self.rng = random.Random(run.seed + number)
+        self.http = httpx.AsyncClient(base_url=run.base_url, timeout=30, follow_redirects=True)
+
+    async def pause(self):
+        delay = self.think.pop(0) if self.think else self.rng.uniform(*self.run.think_range)
+        self.recorded_think.append(round(delay, 3))
+        await asyncio.sleep(delay)
+
+    async def timed(self, step: str, coro):
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception:
+            self.run.errors[step] = self.run.errors.get(step, 0) + 1
+            raise
+        self.run.latencies.setdefault(step, []).append(time.perf_counter() - start)
+        return result
+
+    async def load(self, path: str) -> Page:
+        response = await self.http.get(path)
+        response.raise_for_status()
+        self.run.requests += 1
+        elements, query = parse_page(response.text)
+        cookies = '; '.join(f"{name}={value}" for name, value in self.http.cookies.items())
+        page = Page(self.run.base_url, elements, query, cookies)
+        await page.connect()
+        return page
+
+    async def take_quiz(self):
+        page = None
+        try:
+            # Dashboard: enter a name
+            page = await self.timed('dashboard', self.load('/dashboard'))
+            await self.pause()
+            name_input = page.find(prop=('label', 'Your Name'))[0]
+            await page.set_value(name_input, f"Student {self.number}")
+            await page.emit(page.find(text='Save Name')[0], 'click')
+            await self.timed('save_name', page.wait_for('run_javascript'))
+            await page.close()
+
+            # Quiz list: start the chosen quiz
+            page = await self.timed('index', self.load('/'))
+            await self.pause()
+            buttons = page.find(text='Start Quiz')
+            await page.emit(buttons[min(self.run.quiz_index, len(buttons) - 1)], 'click')
+            await self.timed('start_quiz', page.wait_for('open'))
+            await page.close()
+
+            # Questions are swapped in place until the quiz sends us to /results
+            page = await self.timed('quiz_page', self.load('/quiz'))
+            while True:
+                await self.pause()
+                radio = page.find(tag='q-option-group')[-1]
+                options = page.elements[radio]['props']['options']
+                await page.set_value(radio, self.rng.randrange(len(options)))
+                next_button = (page.find(text='Next') or page.find(text='Finish'))[-1]
+                await page.emit(next_button, 'click')
+                if await self.timed('answer', page.wait_for_replacement(radio)) == 'open':
+                    break
+            await page.close()
+
+            page = await self.timed('results', self.load('/results'))
+            await page.close()
+            self.run.completed += 1
+            page = None
+        except Exception as e:
+            self.run.failures.append(f"student {self.number}: {type(e).__name__}: {e}")
+        finally:
+            if page is not None:
+                await page.close()
+            await self.http.aclose()
+
+
+class ServerMonitor:
+    """Sample CPU time and resident memory of the server process from /proc."""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.samples: List[tuple] = []
+
+    def _read(self) -> Optional[tuple]:
+        try:
+            with open(f'/proc/{self.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            ticks = os.sysconf('SC_CLK_TCK')
+            cpu = (int(fields[11]) + int(fields[12])) / ticks
+            rss = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+            return time.monotonic(), cpu, rss
+        except (OSError, IndexError, ValueError):
+            return None
+
+    async def run(self, interval: float = 0.5):
+        if self.pid is None:
+            return
+        while True:
+            sample = self._read()
+            if sample is not None:
+                self.samples.append(sample)
+            await asyncio.sleep(interval)
+
+    def summary(self) -> Optional[dict]:
+        if len(self.samples) < 2:
+            return None
+        (t0, cpu0, _), (t1, cpu1, _) = self.samples[0], self.samples[-1]
+        return {
+            'cpu_percent': 100 * (cpu1 - cpu0) / (t1 - t0),
+            'peak_rss_mb': max(rss for _, _, rss in self.samples) / 2 ** 20,
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url: str, students: int, ramp_up: float, think_range: tuple,
+                 quiz_index: int, seed: int, trace: Optional[dict] = None):
+        self.base_url = base_url.rstrip('/')
+        self.students = students
+        self.ramp_up = ramp_up
+        self.think_range = think_range
+        self.quiz_index = quiz_index
+        self.seed = seed
+        self.trace = trace
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.failures: List[str] = []
+        self.requests = 0
+        self.completed = 0
+        self.schedule: List[dict] = []
+
+    def _plan(self) -> List[dict]:
+        if self.trace is not None:
+            return self.trace['students']
+        rng = random.Random(self.seed)
+        return [{'start': round(rng.uniform(0, self.ramp_up), 3), 'think': []} for _ in range(self.students)]
+
+    async def _student(self, number: int, plan: dict):
+        await asyncio.sleep(plan['start'])
+        student = Student(number, self, plan['think'])
+        await student.take_quiz()
+        self.schedule.append({'number': number, 'start': plan['start'], 'think': student.recorded_think})
+
+    async def run(self, server_pid: Optional[int] = None) -> dict:
+        monitor = ServerMonitor(server_pid)
+        monitor_task = asyncio.create_task(monitor.run())
+        start = time.perf_counter()
+        await asyncio.gather(*(self._student(i, plan) for i, plan in enumerate(self._plan())))
+        elapsed = time.perf_counter() - start
+        monitor_task.cancel()
+
+        return {
+            'students': len(self.schedule),
+            'completed': self.completed,
+            'elapsed_s': elapsed,
+            'requests_per_s': self.requests / elapsed,
+            'attempts_per_min': 60 * self.completed / elapsed,
+            'steps': {
+                step: {
+                    'count': len(values),
+                    'errors': self.errors.get(step, 0),
+                    'mean_ms': 1000 * statistics.fmean(values),
+                    'p50_ms': 1000 * percentile(values, 50),
+                    'p95_ms': 1000 * percentile(values, 95),
+                    'p99_ms': 1000 * percentile(values, 99),
+                }
+                for step, values in self.latencies.items()
+            },
+            'server': monitor.summary(),
+            'failures': self.failures,
+        }
+
+    def trace_data(self) -> dict:
+        return {'students': [{'start': s['start'], 'think': s['think']}
+                             for s in sorted(self.schedule, key=lambda s: s['number'])]}
+
+
+def print_report(report: dict):
+    print(f"Students: {report['students']}  completed: {report['completed']}  "
+          f"elapsed: {report['elapsed_s']:.1f}s")
+    print(f"Throughput: {report['requests_per_s']:.1f} page loads/s, "
+          f"{report['attempts_per_min']:.1f} finished attempts/min")
+    print(f"{'step':<12}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, stats in report['steps'].items():
+        print(f"{step:<12}{stats['count']:>7}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    if report['server']:
+        print(f"Server: {report['server']['cpu_percent']:.0f}% CPU, "
+              f"peak RSS {report['server']['peak_rss_mb']:.0f} MB")
+    for failure in report['failures'][:10]:
+        print(f"  {failure}")
+
+
+async def wait_for_server(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{base_url}/dashboard")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a class of students taking a quiz.')
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='base URL of the quiz server')
+    parser.add_argument('--students', type=int, default=30, help='number of simulated students')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='seconds over which students arrive')
+    parser.add_argument('--think', type=float, nargs=2, default=(0.5, 2.0), metavar=('MIN', 'MAX'),
+                        help='range of seconds a student waits before each action')
+    parser.add_argument('--quiz', type=int, default=0, help='position of the quiz to take on the quiz list')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for arrival, think time and answers')
+    parser.add_argument('--trace', help='replay arrival and think times from a recorded trace')
+    parser.add_argument('--record', help='write the arrival and think times of this run to a trace file')
+    parser.add_argument('--json', help='also write the report as JSON to this file')
+    parser.add_argument('--start-server', action='store_true', help='start main.py for the duration of the test')
+    parser.add_argument('--server-pid', type=int, help='PID of an already running server to monitor')
+    args = parser.parse_args()
+
+    trace = None
+    if args.trace:
+        with open(args.trace, 'r') as f:
+            trace = json.load(f)
+
+    server = None
+    server_pid = args.server_pid
+    if args.start_server:
+        server = subprocess.Popen([sys.executable, 'main.py'], stdout=subprocess.DEVNULL)
+        server_pid = server.pid
+
+    try:
+        asyncio.run(wait_for_server(args.url.rstrip('/')))
+        test = LoadTest(args.url, args.students, args.ramp_up, tuple(args.think), args.quiz, args.seed, trace)
+        report = asyncio.run(test.run(server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.record:
+        with open(args.record, 'w') as f:
+            json.dump(test.trace_data(), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,26 @@
 import secrets
-from nicegui import ui, app
+from nicegui import ui, app, run, background_tasks, Client
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
 import base64, uuid
 import os
+from urllib.parse import quote
+import auth
 from quiz_bank import quiz_data
-from quiz_results.recorder import save_quiz_result
+from quiz_model import DrawQuiz, Quiz
+from quiz_pools import PoolIndex
+from quiz_results.recorder import save_quiz_result, results_writer
+from quiz_results.index import ResultsIndex
+from quiz_results.export import ANSWER_COLUMNS, ATTEMPT_COLUMNS, csv_chunks, iter_results, iter_rows, normalize_day
+from render_cache import markdown_cache
+from session_store import QuizSession, SessionStore, SqliteSessionStore
+from progress_bus import progress_bus, progress_of
+from image_pipeline import image_pipeline, etag_matches, IMMUTABLE, REVALIDATE
+from profiling import profiler
+from metrics import registry, timed, WebSocketMetrics, CONTENT_TYPE, HANDLER_SECONDS, PAGE_SECONDS, WEBSOCKET_MESSAGES
+from fastapi import Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
 
 
 # Function to get or create storage secret
@@ -28,70 +42,191 @@ def get_storage_secret():
         return secret
 
 
-# Dictionary to store user sessions
-sessions = {}
+def answer_key(quiz_name: str) -> Optional[List[int]]:
+    """Correct option of every question in a quiz, used to index results saved without their correctness"""
+    if quiz_name not in quiz_data:
+        return None
+    return quiz_data[quiz_name].answer_key
 
 
-class QuizSession:
-    def __init__(self):
-        self.current_quiz = None
-        self.current_question = 0
-        self.score = 0
-        self.answers = []
-        self.start_time = None
-        self.quiz_completed = False
-        self.selected_answer = None
+# Index of saved results, fed by the results writer as batches are flushed
+results_index = ResultsIndex(answer_key=answer_key)
+results_writer.add_listener(results_index.ingest)
 
 
-def get_user_session() -> QuizSession:
-    # Use a simple approach - try to get from user storage, fallback to generating new session
-    try:
-        # Try to get existing session ID from user storage
-        user_data = app.storage.user
-        session_id = user_data.get('session_id')
+def start_results_index_sync():
+    """Catch the index up with results saved while the server was down"""
+    background_tasks.create(run.io_bound(results_index.sync), name='results-index-sync')
+
+
+app.on_startup(start_results_index_sync)
+
+# Pick up edited, added and removed quiz files without a restart
+quiz_data.add_listener(markdown_cache.invalidate)
+app.on_startup(quiz_data.watch)
+app.on_shutdown(quiz_data.stop)
+
 
-        # Check if student name is missing
-        if not user_data.get('student_name'):
-            ui.navigate.to('/dashboard')
+# Questions of the whole bank by tag, topic and difficulty, for quizzes that draw from pools.
+# It reads every quiz, so quizzes with draw rules can't be started with QUIZ_BANK_LAZY=1.
+question_pools = PoolIndex(quiz_data)
 
-        if not session_id:
-            # Generate new session ID and store it. ie session_0, session_1, etc.
-            session_id = str(uuid.uuid4())
-            user_data['session_id'] = session_id
 
-    except Exception:
-        # Fallback: use a simple counter-based approach
-        session_id = f"session_{len(sessions)}"
+# Store of user sessions, bounded by idle time and count.
+# Set SESSION_BACKEND=sqlite to share sessions between several server processes.
+if os.environ.get('SESSION_BACKEND') == 'sqlite':
+    sessions = SqliteSessionStore(os.environ.get('SESSION_DB', 'sessions.sqlite3'), quiz_data,
+                                  max_sessions=int(os.environ.get('SESSION_MAX', '10000')),
+                                  ttl=float(os.environ.get('SESSION_TTL', str(4 * 3600))))
+else:
+    sessions = SessionStore(max_sessions=int(os.environ.get('SESSION_MAX', '10000')),
+                            ttl=float(os.environ.get('SESSION_TTL', str(4 * 3600))))
 
-    if session_id not in sessions:
-        sessions[session_id] = QuizSession()
 
-    return sessions[session_id]
+# Server state read whenever /metrics is scraped
+registry.gauge('quiz_sessions', 'Quiz sessions in the session store', lambda: len(sessions))
+registry.gauge('quiz_connected_clients', 'Browser tabs with an open websocket',
+               lambda: sum(client.has_socket_connection for client in list(Client.instances.values())))
+registry.gauge('quiz_bank_quizzes', 'Quizzes in the quiz bank', lambda: len(quiz_data))
+registry.gauge('quiz_results_queued', 'Results waiting to be written', lambda: results_writer._queue.qsize())
+app.add_middleware(WebSocketMetrics, messages=WEBSOCKET_MESSAGES)
+
+# Write what the sampling profiler collected (see PROFILE_SAMPLE_RATE) before exiting
+app.on_shutdown(profiler.flush)
+# Write queued results; atexit handlers don't run when the server is stopped with SIGTERM
+app.on_shutdown(results_writer.close)
+
+
+@app.get('/metrics')
+def metrics():
+    """Latency histograms, counters and gauges in the Prometheus text format"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+def get_user_session(require_name: bool = True) -> QuizSession:
+    # Keyed on the browser's ID from the signed session cookie, which every server process
+    # can read; app.storage.user is a file of the process that created it
+    try:
+        session_id = app.storage.browser['id']
+    except (KeyError, RuntimeError):
+        # Fallback: a one-off session that is never looked up again, so it
+        # is the first to be evicted
+        session_id = f"session_{uuid.uuid4()}"
+
+    session = sessions.get_or_create(session_id)
+    # Check if student name is missing
+    if require_name and not session.student_name:
+        ui.navigate.to('/dashboard')
+    return session
+
+
+def publish_progress(session: QuizSession):
+    """Tell the live teacher view where a student is in their quiz"""
+    student_name = session.student_name or 'Anonymous'
+    progress_bus.publish(progress_of(session, student_name))
 
 
 def create_image_display(image_path: str, alt_text: str = "Question diagram") -> str:
-    """Create HTML for displaying images in questions"""
+    """Create HTML for displaying images in questions, lazy loading a resized variant"""
     if not image_path:
         return ""
 
+    img = image_pipeline.img_tag(image_path, alt_text,
+                                 css_class="max-w-full h-auto mx-auto border rounded-lg shadow-sm",
+                                 style="max-height: 300px; width: auto;")
     return f'''
     <div class="my-4 text-center">
-        <img src="{image_path}" alt="{alt_text}" class="max-w-full h-auto mx-auto border rounded-lg shadow-sm" style="max-height: 300px;">
+        {img}
     </div>
     '''
 
 
+def cached_file(path: str, request: Request, etag: str, cache_control: str):
+    """Serve a file with caching headers, answering revalidation with 304 Not Modified"""
+    headers = {'Cache-Control': cache_control, 'ETag': etag}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+
+@app.get('/images/{name}')
+def image_variant(name: str, request: Request):
+    """Resized image variants; their names contain a content hash, so they never change"""
+    path = image_pipeline.variant_path(name)
+    if path is None:
+        return Response(status_code=404)
+    return cached_file(path, request, f'"{name}"', IMMUTABLE)
+
+
+@app.get('/static/{file_path:path}')
+def static_image(file_path: str, request: Request):
+    """Original question images, revalidated by ETag"""
+    path = image_pipeline.source_path('/static/' + file_path)
+    if path is None or not os.path.isfile(path):
+        return Response(status_code=404)
+    stat = os.stat(path)
+    return cached_file(path, request, f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', REVALIDATE)
+
+
+def warm_images(quiz_names: List[str]):
+    """Create resized variants of the images in the given quizzes"""
+    quizzes = [quiz_data[name] for name in quiz_names if name in quiz_data]
+    image_paths = {question.image for quiz in quizzes if isinstance(quiz, Quiz)
+                   for question in quiz.questions if question.image}
+    image_pipeline.warm(sorted(image_paths))
+
+
+def start_image_warmup():
+    """Create variants in the background so the first student doesn't wait for them"""
+    if not quiz_data.lazy:
+        background_tasks.create(run.io_bound(warm_images, list(quiz_data)), name='image-warmup')
+
+
+app.on_startup(start_image_warmup)
+# Runs on the bank's watcher thread, for new quizzes as well as edited ones
+quiz_data.add_listener(lambda name: warm_images([name]), added=True)
+
+
+def render_markdown(content: str, quiz_name: str):
+    """Display Markdown with LaTeX, reusing HTML from the shared render cache"""
+    return ui.html(markdown_cache.render(content, quiz=quiz_name)).classes('nicegui-markdown')
+
+
+def render_question_content(quiz, question_index: int):
+    """Render the Markdown of a question and its options into the render cache"""
+    question = quiz.questions[question_index]
+    markdown_cache.render(question.text, quiz=quiz.name)
+    for label, option in zip(question.labels, question.options):
+        markdown_cache.render(f"{label}) {option}", quiz=quiz.name)
+
+
+def prefetch_question(quiz, question_index: int):
+    """
+    Prepare a question before it is shown: its HTML is rendered in the
+    background and its image is fetched by the browser, so moving to it
+    only needs cache hits. Images whose variants are still being created
+    are not preloaded, as the question will likely show a variant instead
+    """
+    if question_index >= len(quiz.questions):
+        return
+    background_tasks.create(run.io_bound(render_question_content, quiz, question_index), name='prefetch-question')
+
+    question = quiz.questions[question_index]
+    if question.image:
+        preload = image_pipeline.preload_tag(question.image)
+        if preload:
+            ui.html(preload)
+
+
 # Set up the main page
 @ui.page('/')
+@timed(PAGE_SECONDS, page='main')
 def main_page():
     """Create the main quiz selection page"""
     ui.page_title('Nice Quiz Server - Test Your Knowledge')
 
-    user_data = app.storage.user
-
-    # Check if student name is set, if not redirect to dashboard
-    if not user_data.get('student_name'):
-        ui.navigate.to('/dashboard')
+    # Redirects to the dashboard if the student name is not set
+    get_user_session()
 
     with ui.column().classes('w-full max-w-2xl mx-auto p-6'):
         ui.html('<h1 class="text-3xl font-bold text-center mb-6">📊 Nice Quiz Server</h1>')
@@ -100,53 +235,92 @@ def main_page():
         with ui.card().classes('w-full'):
             ui.html('<h2 class="text-xl font-semibold mb-4">Available Quizzes</h2>')
 
-            for quiz_name, quiz_content in quiz_data.items():
-                questions = quiz_content['questions']
-                title = quiz_content.get('title', quiz_name)
+            # Only titles and question counts are needed here, so the questions
+            # of a lazily loaded bank are not read until a quiz is started
+            for quiz_name, info in quiz_data.manifest().items():
+                title = info.title
 
                 with ui.row().classes('w-full justify-between items-center p-4 border rounded'):
                     with ui.column():
                         ui.html(f'<h3 class="font-medium">{title}</h3>')
-                        ui.html(f'<p class="text-sm text-gray-500">{len(questions)} questions</p>')
+                        ui.html(f'<p class="text-sm text-gray-500">{info.question_count} questions</p>')
 
                     ui.button('Start Quiz',
                               on_click=lambda q=quiz_name: start_quiz(q),
                               color='primary')
 
 
+@timed(HANDLER_SECONDS, handler='start_quiz')
 def start_quiz(quiz_name: str):
     """Initialize and start a quiz"""
+    # None if the quiz was removed, or its file turned invalid before the bank noticed
+    quiz = quiz_data.get(quiz_name)
+    if quiz is None:
+        ui.notify('This quiz is no longer available', type='warning')
+        ui.navigate.to('/')
+        return
+
+    drawn = None
+    if isinstance(quiz, DrawQuiz):
+        # Every attempt gets its own selection of questions
+        try:
+            quiz, drawn = question_pools.sample_with_sources(quiz)
+        except RuntimeError as e:
+            print(f"Cannot draw questions for {quiz_name}: {e}")
+            ui.notify('This quiz is not available on this server', type='warning')
+            return
+        if not quiz.questions:
+            ui.notify('No questions match this quiz yet', type='warning')
+            return
+
     session = get_user_session()
     session.current_quiz = quiz_name
+    session.quiz = quiz
     session.current_question = 0
     session.score = 0
     session.answers = []
     session.start_time = datetime.now()
     session.quiz_completed = False
     session.selected_answer = None
+    session.attempt_id = str(uuid.uuid4())
+    session.result_saved = False
+    session.drawn = drawn
+    sessions.save(session)
+    publish_progress(session)
 
     ui.navigate.to('/quiz')
 
 
 @ui.page('/quiz')
+@timed(PAGE_SECONDS, page='quiz')
+@profiler.profile('/quiz')
 def quiz_page():
     """Display the quiz questions with math rendering"""
     session = get_user_session()
-    if not session.current_quiz:
+    if not session.current_quiz or session.quiz is None:
         ui.navigate.to('/')
         return
 
-    questions = quiz_data[session.current_quiz]['questions']
+    questions = session.quiz.questions
 
     if session.current_question >= len(questions):
         ui.navigate.to('/results')
         return
 
-    current_q = questions[session.current_question]
+    ui.page_title(f'Quiz: {session.quiz.title}')
 
-    ui.page_title(f'Quiz: {quiz_data[session.current_quiz].get("title", session.current_quiz)}')
+    # Only the question area is rebuilt when moving between questions, so the
+    # client and its websocket stay alive for the whole attempt
+    @ui.refreshable
+    def question_area():
+        # Read the session again, a shared store may hand out a fresh copy
+        session = get_user_session()
+        if session.quiz is None:
+            ui.navigate.to('/')
+            return
+        questions = session.quiz.questions
+        current_q = questions[session.current_question]
 
-    with ui.column().classes('w-full max-w-3xl mx-auto p-6'):
         # Progress bar
         progress = (session.current_question + 1) / len(questions) * 100
         ui.html(f'<div class="w-full bg-gray-200 rounded-full h-2 mb-4">'
@@ -157,85 +331,156 @@ def quiz_page():
             f'<h2 class="text-xl font-semibold mb-2">Question {session.current_question + 1} of {len(questions)}</h2>')
 
         # Question text with math rendering
-        # ui.html(f'<h3 class="text-lg mb-4">{current_q["question"]}</h3>')
-        ui.markdown(f"{current_q['question']}", extras=['latex'])
+        # ui.html(f'<h3 class="text-lg mb-4">{current_q.text}</h3>')
+        render_markdown(current_q.text, session.current_quiz)
 
         # Display image if present
-        if current_q.get("image"):
-            ui.html(create_image_display(current_q["image"]))
+        if current_q.image:
+            ui.html(create_image_display(current_q.image))
 
         # Answer options using NiceGUI radio component
         session.selected_answer = None
         answer_radio = ui.radio(
-            options={i: '' for i, option in enumerate(current_q["options"])},  # Empty labels
+            options={i: '' for i in range(current_q.option_count)},  # Empty labels
             value=None
         ).classes('mb-6')
 
         # Teleport math content to each radio button label
-        for i, option in enumerate(current_q["options"]):
+        for i, (label, option) in enumerate(zip(current_q.labels, current_q.options)):
             with ui.teleport(f'#{answer_radio.html_id} > div:nth-child({i + 1}) .q-radio__label'):
-                ui.markdown(f"{chr(65 + i)}) {option}", extras=['latex'])  # A), B), C), etc.
+                render_markdown(f"{label}) {option}", session.current_quiz)  # A), B), C), etc.
 
         def update_selected_answer(value):
             session.selected_answer = value
 
         answer_radio.on('update:model-value', update_selected_answer)
 
-        # Navigation buttons
+        # Navigation buttons, bound to the question shown so that a repeated
+        # click is recognized as stale once the session has moved on
         with ui.row().classes('w-full justify-between'):
             if session.current_question > 0:
                 ui.button('Previous',
-                          on_click=lambda: go_to_question(session.current_question - 1),
+                          on_click=lambda q=session.current_question - 1: go_to_question(q, question_area.refresh),
                           color='secondary')
             else:
                 ui.html('<div></div>')  # Spacer
 
             ui.button('Next' if session.current_question < len(questions) - 1 else 'Finish',
-                      on_click=lambda: submit_answer(answer_radio.value),
+                      on_click=lambda q=session.current_question: submit_answer(answer_radio.value,
+                                                                                question_area.refresh, q),
                       color='primary')
 
+        # Get the next question ready while the student reads this one
+        prefetch_question(session.quiz, session.current_question + 1)
 
-def go_to_question(question_num: int):
-    """Navigate to a specific question"""
+    with ui.column().classes('w-full max-w-3xl mx-auto p-6'):
+        question_area()
+
+
+@timed(HANDLER_SECONDS, handler='go_to_question')
+def go_to_question(question_num: int, on_change: Optional[Callable[[], Any]] = None):
+    """Move to a specific question, updating the quiz view in place if possible"""
     session = get_user_session()
     session.current_question = question_num
-    ui.navigate.to('/quiz')
+    sessions.save(session)
+    publish_progress(session)
+    if on_change:
+        on_change()
+    else:
+        ui.navigate.to('/quiz')
 
 
-def submit_answer(selected_option: int):
+@timed(HANDLER_SECONDS, handler='submit_answer')
+@profiler.profile('submit_answer')
+def submit_answer(selected_option: int, on_change: Optional[Callable[[], Any]] = None,
+                  question_index: Optional[int] = None):
     """Submit answer and move to next question or results"""
     session = get_user_session()
     if selected_option is None:
         ui.notify('Please select an answer', type='warning')
         return
+    if session.quiz is None:
+        # The session expired or was evicted mid-attempt
+        ui.navigate.to('/')
+        return
+    if session.current_question >= len(session.quiz.questions) or \
+            question_index is not None and question_index != session.current_question:
+        return  # A repeated click on a question that was already answered
 
-    questions = quiz_data[session.current_quiz]['questions']
+    questions = session.quiz.questions
     current_q = questions[session.current_question]
 
     # Store the answer
-    is_correct = selected_option == current_q["correct"]
-    session.answers.append({
-        'question': current_q["question"],
-        'selected': selected_option,
-        'correct': current_q["correct"],
-        'is_correct': is_correct,
-        'explanation': current_q["explanation"],
-        'image': current_q.get("image")
-    })
-
-    if is_correct:
+    session.answers.append((session.current_question, selected_option))
+
+    if selected_option == current_q.correct:
         session.score += 1
 
     session.current_question += 1
+    session.quiz_completed = session.current_question >= len(questions)
+    sessions.save(session)
+    publish_progress(session)
 
-    if session.current_question >= len(questions):
-        session.quiz_completed = True
+    if session.quiz_completed:
         ui.navigate.to('/results')
+    elif on_change:
+        on_change()
     else:
         ui.navigate.to('/quiz')
 
 
+# Number of question reviews shown at once on the results page
+REVIEW_PAGE_SIZE = int(os.environ.get('REVIEW_PAGE_SIZE', '10'))
+
+
+def answer_summary(session: QuizSession, questions) -> str:
+    """One compact HTML strip marking every answer right or wrong"""
+    cells = []
+    for i, (question_index, selected) in enumerate(session.answers):
+        is_correct = selected == questions[question_index].correct
+        color = 'bg-green-100 text-green-800' if is_correct else 'bg-red-100 text-red-800'
+        cells.append(f'<span class="inline-block w-8 text-center rounded m-0.5 text-sm {color}" '
+                     f'title="Question {i + 1}: {"correct" if is_correct else "incorrect"}">{i + 1}</span>')
+    return f'<div class="flex flex-wrap mb-4">{"".join(cells)}</div>'
+
+
+def review_card(number: int, question, selected: int, quiz_name: str):
+    """Card reviewing one answered question"""
+    is_correct = selected == question.correct
+    with ui.card().classes('w-full mb-4'):
+        status_icon = "✅" if is_correct else "❌"
+        status_color = "text-green-600" if is_correct else "text-red-600"
+
+        ui.html(f'<div class="mb-2">'
+                f'<span class="text-lg">{status_icon}</span> '
+                f'<span class="font-medium">Question {number + 1}</span>'
+                f'</div>')
+
+        # Question with math
+        render_markdown(question.text, quiz_name)
+
+        # Display image if present
+        if question.image:
+            ui.html(create_image_display(question.image))
+
+        options = question.options
+
+        # Selected answer with math
+        render_markdown(f"<p class='mb-2 {status_color}'><strong>Your answer:</strong> {options[selected]}</p>",
+                        quiz_name)
+
+        if not is_correct:
+            render_markdown(f"<p class='mb-2'><strong>Correct answer:</strong> {options[question.correct]}</p>",
+                            quiz_name)
+
+        # Explanation with math
+        render_markdown(f"<p class='text-sm text-gray-600'><strong>Explanation:</strong> {question.explanation}</p>",
+                        quiz_name)
+
+
 @ui.page('/results')
+@timed(PAGE_SECONDS, page='results')
+@profiler.profile('/results')
 def results_page():
     """Display quiz results with math rendering"""
     session = get_user_session()
@@ -243,8 +488,8 @@ def results_page():
         ui.navigate.to('/')
         return
 
-    questions = quiz_data[session.current_quiz]['questions']
-    title = quiz_data[session.current_quiz].get('title', session.current_quiz)
+    questions = session.quiz.questions
+    title = session.quiz.title
     total_questions = len(questions)
     percentage = round((session.score / total_questions) * 100)
 
@@ -276,54 +521,40 @@ def results_page():
 
             ui.html(f'<p class="text-center text-lg mb-4">{message}</p>')
 
-        # Detailed results
+        # Summary of every answer; the detailed review is loaded a page at a time
         ui.html('<h3 class="text-xl font-semibold mb-4">Question Review</h3>')
-
-        for i, answer in enumerate(session.answers):
-            with ui.card().classes('w-full mb-4'):
-                status_icon = "✅" if answer['is_correct'] else "❌"
-                status_color = "text-green-600" if answer['is_correct'] else "text-red-600"
-
-                ui.html(f'<div class="mb-2">'
-                        f'<span class="text-lg">{status_icon}</span> '
-                        f'<span class="font-medium">Question {i + 1}</span>'
-                        f'</div>')
-
-                # Question with math
-                # ui.html(f'<p class="mb-2"><strong>Q:</strong> {answer["question"]}</p>')
-                ui.markdown(f"{answer['question']}", extras=['latex'])
-
-                # Display image if present
-                if answer.get("image"):
-                    ui.html(create_image_display(answer["image"]))
-
-                options = quiz_data[session.current_quiz]["questions"][i]["options"]
-
-                # Selected answer with math
-                ui.markdown(
-                    f"<p class='mb-2 {status_color}'><strong>Your answer:</strong> {options[answer['selected']]}</p>",
-                    extras=['latex'])
-
-                if not answer['is_correct']:
-                    # ui.html(f'<p class="mb-2"><strong>Correct answer:</strong> '
-                    #         f'<span class="text-green-600">{options[answer["correct"]]}</span></p>')
-                    ui.markdown(f"<p class='mb-2'><strong>Correct answer:</strong> {options[answer['correct']]}</p>",
-                                extras=['latex'])
-
-                # Explanation with math
-                ui.markdown(
-                    f"<p class='text-sm text-gray-600'><strong>Explanation:</strong> {answer['explanation']}</p>",
-                    extras=['latex']
+        ui.html(answer_summary(session, questions))
+
+        pages = max(1, -(-len(session.answers) // REVIEW_PAGE_SIZE))
+
+        @ui.refreshable
+        def review_page(page: int = 1):
+            first = (page - 1) * REVIEW_PAGE_SIZE
+            for i, (question_index, selected) in enumerate(session.answers[first:first + REVIEW_PAGE_SIZE], first):
+                review_card(i, questions[question_index], selected, session.current_quiz)
+
+        if pages > 1:
+            ui.pagination(1, pages, direction_links=True,
+                          on_change=lambda e: review_page.refresh(e.value)).classes('mb-4')
+        review_page()
+
+        # Record quiz result, once per attempt even if the page is reloaded after
+        # a restart or served by another worker sharing the session store
+        if not session.result_saved:
+            with HANDLER_SECONDS.time(handler='save_quiz_result'):
+                save_quiz_result(
+                    student_name=session.student_name,
+                    quiz_name=session.current_quiz,
+                    answers=[selected for _, selected in session.answers],
+                    score=f"{session.score}/{total_questions}",
+                    attempt_id=session.attempt_id,
+                    is_correct=[selected == questions[question_index].correct
+                                for question_index, selected in session.answers],
+                    quiz_fingerprint=session.quiz.fingerprint,
+                    questions=session.drawn
                 )
-
-        # Record quiz result
-        user_data = app.storage.user
-        save_quiz_result(
-            student_name=user_data['student_name'],
-            quiz_name=session.current_quiz,
-            answers=[ans['selected'] for ans in session.answers],
-            score=f"{session.score}/{total_questions}"
-        )
+            session.result_saved = True
+            sessions.save(session)
 
         # Action buttons
         with ui.row().classes('w-full justify-center gap-4 mt-6'):
@@ -336,10 +567,11 @@ def results_page():
 
 
 @ui.page('/dashboard')
+@timed(PAGE_SECONDS, page='dashboard')
 def dashboard():
-    user_data = app.storage.user
-    session_id = user_data.get('session_id', 'Unknown')
-    current_name = user_data.get('student_name', '')
+    session = get_user_session(require_name=False)
+    session_id = session.session_id
+    current_name = session.student_name or ''
 
     with ui.column().classes('w-full max-w-md mx-auto p-6'):
         ui.html('<h1 class="text-3xl font-bold text-center mb-6">📊 Nice Quiz Dashboard</h1>')
@@ -358,10 +590,126 @@ def dashboard():
             ui.html(f'<p>ID: {session_id[:6]} Name: {current_name}</p>')
             ui.button('Start Quiz', on_click=lambda: ui.navigate.to('/'))
 
+        # Statistics from the results index
+        with ui.card().classes('w-full mt-6'):
+            ui.html('<h2 class="text-xl font-semibold mb-2">Quiz Statistics</h2>')
+            summary = results_index.quiz_summary()
+            if not summary:
+                ui.html('<p class="text-sm text-gray-500">No results yet</p>')
+            for row in summary:
+                title = quiz_data.info(row['quiz_name']).title if row['quiz_name'] in quiz_data else row['quiz_name']
+                average = f"{round(row['average'])}%" if row['average'] is not None else '-'
+                ui.html(f'<p class="text-sm">{title}: {row["attempts"]} attempts, average {average}</p>')
+
+        if current_name:
+            history = results_index.student_history(current_name, limit=10)
+            if history:
+                with ui.card().classes('w-full mt-4'):
+                    ui.html('<h2 class="text-xl font-semibold mb-2">Your Recent Results</h2>')
+                    for row in history:
+                        ui.html(f'<p class="text-sm">{row["quiz_name"]}: {row["score"]}/{row["total"]} '
+                                f'<span class="text-gray-500">({row["completed_at"]})</span></p>')
+
+
+@app.get('/export.csv')
+def export_results(request: Request, quiz: Optional[str] = None, student: Optional[str] = None,
+                   since: Optional[str] = None, until: Optional[str] = None, per_question: bool = False):
+    """Stream saved results as CSV, filtered by quiz, student and date range (teachers only)"""
+    if not auth.is_authenticated():
+        target = request.url.path + (f"?{request.url.query}" if request.url.query else '')
+        return RedirectResponse(f"/login?next_page={quote(target)}")
+    if not auth.has_role(auth.TEACHER_ROLES):
+        return Response('Teacher privileges required', status_code=403)
+    try:
+        normalize_day(since), normalize_day(until)
+    except ValueError as e:
+        return Response(str(e), status_code=400)
+    results = iter_results(quiz=quiz, student=student, since=since, until=until)
+    rows = iter_rows(results, quiz_data, per_question)
+    columns = ANSWER_COLUMNS if per_question else ATTEMPT_COLUMNS
+    filename = f"{'answers' if per_question else 'results'}_{quiz or 'all'}.csv"
+    return StreamingResponse(csv_chunks(rows, columns), media_type='text/csv',
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@ui.page('/login')
+def login_page(next_page: str = '/'):
+    """Login for teachers, returning to the page that asked for it"""
+    if auth.is_authenticated():
+        ui.navigate.to(auth.safe_next_page(next_page))
+        return
+    auth.render_login_page(next_page)
+
+
+# Seconds between updates of the live teacher view; events in between are coalesced
+LIVE_UPDATE_INTERVAL = float(os.environ.get('LIVE_UPDATE_INTERVAL', '1.0'))
+
+LIVE_COLUMNS = [
+    {'name': 'student', 'label': 'Student', 'field': 'student', 'sortable': True, 'align': 'left'},
+    {'name': 'quiz', 'label': 'Quiz', 'field': 'quiz', 'sortable': True, 'align': 'left'},
+    {'name': 'progress', 'label': 'Progress', 'field': 'progress'},
+    {'name': 'score', 'label': 'Score', 'field': 'score', 'sortable': True},
+    {'name': 'status', 'label': 'Status', 'field': 'status', 'sortable': True},
+]
+
+
+def live_row(progress) -> Dict[str, Any]:
+    """Table row for a student's progress"""
+    question = min(progress.question + 1, progress.total)
+    return {
+        'id': progress.session_id,
+        'student': progress.student_name,
+        'quiz': progress.quiz_title,
+        'progress': f"{question}/{progress.total}",
+        'score': f"{progress.score}/{progress.answered}",
+        'status': 'Finished' if progress.completed else 'In progress',
+        'updated': progress.updated_at,
+    }
+
+
+@ui.page('/teacher')
+@timed(PAGE_SECONDS, page='teacher')
+def teacher_page():
+    """Live view of every student's current question and running score"""
+    if not auth.role_required(auth.TEACHER_ROLES, '/teacher'):
+        return
+    ui.page_title('Live Progress')
+    subscription = progress_bus.subscribe()
+    rows: Dict[str, Dict[str, Any]] = {}
+
+    with ui.column().classes('w-full max-w-5xl mx-auto p-6'):
+        ui.html('<h1 class="text-3xl font-bold mb-2">👩‍🏫 Live Progress</h1>')
+        summary = ui.label().classes('text-gray-600 mb-4')
+        ui.link('Download all results (CSV)', '/export.csv').classes('mb-4')
+        table = ui.table(columns=LIVE_COLUMNS, rows=[], row_key='id',
+                         pagination={'rowsPerPage': 50, 'sortBy': 'student'}).classes('w-full')
+
+    def apply_updates():
+        # One table update per interval, however many answers came in meanwhile
+        changes = subscription.drain()
+        forgotten = subscription.drain_forgotten()
+        if not changes and not forgotten:
+            return
+        for session_id in forgotten:
+            rows.pop(session_id, None)  # Evicted, or idle for longer than PROGRESS_MAX_AGE
+        for progress in changes:
+            rows[progress.session_id] = live_row(progress)
+        table.rows = list(rows.values())
+        table.update()
+        finished = sum(row['status'] == 'Finished' for row in rows.values())
+        summary.text = f"{len(rows)} students, {finished} finished"
+
+    apply_updates()
+    if not rows:
+        summary.text = 'Waiting for students to start a quiz'
+    ui.timer(LIVE_UPDATE_INTERVAL, apply_updates)
+    ui.context.client.on_delete(subscription.close)
+
 
 def save_name(name):
-    user_data = app.storage.user
-    user_data['student_name'] = name
+    session = get_user_session(require_name=False)
+    session.student_name = name
+    sessions.save(session)
     ui.navigate.reload()  # Refresh to show updated info
 
 
@@ -0,0 +1,191 @@
+# profiling.py
+"""
+Opt-in profiling of a sample of page builds and event handlers.
+
+Off unless PROFILE_SAMPLE_RATE is above 0. Each sampled call is traced and
+its time added to per-route totals, written to PROFILE_DIR as collapsed
+stacks (route.collapsed, for flamegraph.pl or speedscope) or as pstats
+(route.prof, for snakeviz or python -m pstats), depending on PROFILE_FORMAT.
+"""
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from typing import Dict, List
+
+# Once a route has this many stacks, new ones are counted as their deepest known ancestor
+MAX_STACKS = 2000
+# Frames deeper than this are counted as part of their ancestor at this depth
+MAX_DEPTH = 24
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class _StackTracer:
+    """Self time of every distinct call stack while it is installed, in microseconds."""
+
+    def __init__(self):
+        self.totals: Counter = Counter()
+        self._stack: List[str] = []
+        self._last = 0.0
+
+    def _charge(self, now: float):
+        if self._stack:
+            self.totals[';'.join(self._stack[:MAX_DEPTH])] += (now - self._last) * 1e6
+        self._last = now
+
+    def __call__(self, frame, event, arg):
+        if arg is sys.setprofile:
+            return  # Installing and removing the tracer itself
+        now = time.perf_counter()
+        if event == 'call':
+            self._charge(now)
+            self._stack.append(_frame_name(frame.f_code))
+        elif event == 'c_call':
+            self._charge(now)
+            self._stack.append(f"<builtin>:{getattr(arg, '__qualname__', arg)}")
+        elif event in ('return', 'c_return', 'c_exception'):
+            self._charge(now)
+            if len(self._stack) > 1:
+                self._stack.pop()
+
+    def run(self, root: str, func, *args, **kwargs):
+        self._stack = [root]
+        self._last = time.perf_counter()
+        sys.setprofile(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.setprofile(None)
+            self._charge(time.perf_counter())
+
+
+class Profiler:
+    """
+    Profiles a random sample of calls to the functions it wraps.
+
+    Results are aggregated per route in memory and written to directory at
+    most every flush_interval seconds, replacing the previous file, so disk
+    use stays at one bounded file per route however long it runs.
+    """
+
+    def __init__(self, directory: str = 'profiles', sample_rate: float = 0.0, fmt: str = 'collapsed',
+                 flush_interval: float = 10.0, max_stacks: int = MAX_STACKS):
+        if fmt not in ('collapsed', 'pstats'):
+            raise ValueError(f"unknown profile format {fmt!r}, expected 'collapsed' or 'pstats'")
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.fmt = fmt
+        self.flush_interval = flush_interval
+        self.max_stacks = max_stacks
+        self._stacks: Dict[str, Counter] = {}
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._samples: Counter = Counter()
+        self._dirty = set()
+        self._active = threading.local()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def profile(self, route: str):
+        """Decorator profiling a sample of the calls of a page or handler under route."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                # Unsampled calls only pay for this check
+                if self.sample_rate <= 0 or random.random() >= self.sample_rate \
+                        or getattr(self._active, 'route', None) is not None:
+                    return func(*args, **kwargs)
+                return self._run(route, func, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _run(self, route: str, func, *args, **kwargs):
+        self._active.route = route
+        try:
+            if self.fmt == 'pstats':
+                profile = cProfile.Profile()
+                try:
+                    return profile.runcall(func, *args, **kwargs)
+                finally:
+                    self._add_stats(route, profile)
+            tracer = _StackTracer()
+            try:
+                return tracer.run(route, func, *args, **kwargs)
+            finally:
+                self._add_stacks(route, tracer.totals)
+        finally:
+            self._active.route = None
+            self.maybe_flush()
+
+    def _add_stacks(self, route: str, totals: Counter):
+        with self._lock:
+            stacks = self._stacks.setdefault(route, Counter())
+            for stack, micros in totals.items():
+                while stack not in stacks and len(stacks) >= self.max_stacks and ';' in stack:
+                    stack = stack.rsplit(';', 1)[0]
+                stacks[stack] += micros
+            self._samples[route] += 1
+            self._dirty.add(route)
+
+    def _add_stats(self, route: str, profile: cProfile.Profile):
+        profile.create_stats()
+        with self._lock:
+            if route in self._stats:
+                self._stats[route].add(profile)
+            else:
+                self._stats[route] = pstats.Stats(profile)
+            self._samples[route] += 1
+            self._dirty.add(route)
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the totals of every route profiled since the last flush."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            routes, self._dirty = self._dirty, set()
+            if not routes:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            for route in routes:
+                try:
+                    self._write(route)
+                except OSError as e:
+                    print(f"Could not write profile of {route}: {e}")
+
+    def _write(self, route: str):
+        name = route.strip('/').replace('/', '_') or 'index'
+        if self.fmt == 'pstats':
+            path = os.path.join(self.directory, f"{name}.prof")
+            self._stats[route].dump_stats(f"{path}.tmp")
+        else:
+            path = os.path.join(self.directory, f"{name}.collapsed")
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                for stack, micros in sorted(self._stacks[route].items()):
+                    if micros >= 1:
+                        f.write(f"{stack} {int(micros)}\n")
+        os.replace(f"{path}.tmp", path)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of profiled calls per route."""
+        with self._lock:
+            return dict(self._samples)
+
+
+# Profiler of the quiz server, off unless PROFILE_SAMPLE_RATE is set (e.g. 0.05 for 5% of calls)
+profiler = Profiler(directory=os.environ.get('PROFILE_DIR', 'profiles'),
+                    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+                    fmt=os.environ.get('PROFILE_FORMAT', 'collapsed'))
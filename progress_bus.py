@@ -0,0 +1,147 @@
+# progress_bus.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Set
+
+
+class StudentProgress(NamedTuple):
+    """Latest known progress of one student's quiz attempt."""
+    session_id: str
+    student_name: str
+    quiz_name: str
+    quiz_title: str
+    question: int  # Index of the question the student is on
+    total: int
+    answered: int
+    score: int
+    completed: bool
+    updated_at: float
+
+
+class Subscription:
+    """A subscriber's view of the bus: which students changed since it last looked."""
+
+    def __init__(self, bus: 'ProgressBus'):
+        self._bus = bus
+        self._dirty: Set[str] = set()
+        self._forgotten: Set[str] = set()
+
+    def drain(self) -> List[StudentProgress]:
+        """Return the latest progress of every student that changed since the last drain."""
+        return self._bus._drain(self)
+
+    def drain_forgotten(self) -> Set[str]:
+        """Return the session IDs of students the bus stopped tracking since the last call."""
+        return self._bus._drain_forgotten(self)
+
+    def close(self):
+        """Stop receiving updates."""
+        self._bus.unsubscribe(self)
+
+
+class ProgressBus:
+    """
+    In-process bus of student progress, coalesced per student.
+
+    Publishing only records the student's latest state and marks it changed
+    for each subscriber, so it costs the same no matter how often students
+    answer. Subscribers drain at their own pace and get one entry per
+    changed student, which turns a burst of events into a single update.
+    At most max_students attempts are tracked, the least recently updated
+    being forgotten first, and attempts not updated for max_age seconds are
+    forgotten too.
+    """
+
+    def __init__(self, max_students: int = 2000, max_age: float = 4 * 3600):
+        self.max_students = max_students
+        self.max_age = max_age
+        self._progress: 'OrderedDict[str, StudentProgress]' = OrderedDict()
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, progress: StudentProgress):
+        """Record a student's progress and notify subscribers on their next drain."""
+        session_id = progress.session_id
+        with self._lock:
+            self._progress[session_id] = progress
+            self._progress.move_to_end(session_id)
+            while len(self._progress) > self.max_students:
+                self._forget_oldest()
+            for subscription in self._subscriptions:
+                subscription._dirty.add(session_id)
+            self.published += 1
+
+    def subscribe(self) -> Subscription:
+        """Return a subscription whose first drain returns every tracked student."""
+        subscription = Subscription(self)
+        with self._lock:
+            subscription._dirty.update(self._progress)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop marking changes for a subscription."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def _drain(self, subscription: Subscription) -> List[StudentProgress]:
+        with self._lock:
+            self._expire()
+            dirty, subscription._dirty = subscription._dirty, set()
+            return [self._progress[session_id] for session_id in dirty if session_id in self._progress]
+
+    def _drain_forgotten(self, subscription: Subscription) -> Set[str]:
+        with self._lock:
+            self._expire()
+            forgotten, subscription._forgotten = subscription._forgotten, set()
+            return forgotten
+
+    def _expire(self):
+        # Least recently updated first, so the idle attempts are at the front
+        deadline = time.time() - self.max_age
+        while self._progress and next(iter(self._progress.values())).updated_at < deadline:
+            self._forget_oldest()
+
+    def _forget_oldest(self):
+        session_id, _ = self._progress.popitem(last=False)
+        for subscription in self._subscriptions:
+            subscription._dirty.discard(session_id)
+            subscription._forgotten.add(session_id)
+
+    def snapshot(self) -> List[StudentProgress]:
+        """Return the progress of every tracked student."""
+        with self._lock:
+            return list(self._progress.values())
+
+    def stats(self) -> dict:
+        """Return the number of tracked students, subscribers and published events."""
+        with self._lock:
+            return {
+                'students': len(self._progress),
+                'subscribers': len(self._subscriptions),
+                'published': self.published,
+            }
+
+
+def progress_of(session, student_name: str) -> StudentProgress:
+    """Build the progress record of a quiz session."""
+    quiz = session.quiz
+    return StudentProgress(
+        session_id=session.session_id,
+        student_name=student_name,
+        quiz_name=session.current_quiz,
+        quiz_title=quiz.title if quiz is not None else session.current_quiz,
+        question=session.current_question,
+        total=len(quiz.questions) if quiz is not None else 0,
+        answered=len(session.answers),
+        score=session.score,
+        completed=session.quiz_completed,
+        updated_at=time.time(),
+    )
+
+
+progress_bus = ProgressBus(max_students=int(os.environ.get('PROGRESS_MAX_STUDENTS', '2000')),
+                           max_age=float(os.environ.get('PROGRESS_MAX_AGE', str(4 * 3600))))
@@ -1,7 +1,90 @@
 # quiz_bank.py
 
+import gc
 import os
 import json
+import marshal
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from metrics import QUIZ_LOAD_FAILURES, QUIZ_LOAD_SECONDS, QUIZ_REFRESH_SECONDS
+from quiz_model import DrawQuiz, Question, Quiz, QuizFormatError, quiz_from_dict
+
+# Cached titles and question counts of a lazily loaded bank, kept next to the quizzes
+MANIFEST_FILE = '.quiz_manifest.json'
+# Compiled quizzes of an eagerly loaded bank, so a restart only parses changed files
+SNAPSHOT_FILE = '.quiz_snapshot.marshal'
+SNAPSHOT_VERSION = 3
+
+
+def _to_snapshot(quiz: Union[Quiz, DrawQuiz]) -> Tuple[str, Any]:
+    # Plain values only, so the snapshot is loaded with marshal rather than pickle
+    if isinstance(quiz, DrawQuiz):
+        return 'draw', json.dumps(quiz.to_dict())
+    return 'quiz', (quiz.title, tuple((q.text, q.options, q.correct, q.explanation, q.image, q.tags, q.topic,
+                                       q.difficulty) for q in quiz.questions))
+
+
+def _text_or_none(value: Any) -> bool:
+    return value is None or type(value) is str
+
+
+def _from_snapshot(name: str, kind: str, data: Any) -> Union[Quiz, DrawQuiz]:
+    """
+    Rebuild a quiz from its snapshot entry.
+
+    Checks the types a validated quiz file would have produced, which is
+    much cheaper than validating the file content again.
+
+    Raises:
+        ValueError, TypeError: If the entry is not a quiz as written by _to_snapshot().
+    """
+    if kind == 'draw':
+        return DrawQuiz.from_dict(name, json.loads(data))
+    title, fields = data
+    questions = []
+    for text, options, correct, explanation, image, tags, topic, difficulty in fields:
+        if not (type(text) is str and type(options) is tuple and len(options) >= 2
+                and type(correct) is int and 0 <= correct < len(options) and type(explanation) is str
+                and _text_or_none(image) and _text_or_none(topic) and _text_or_none(difficulty)
+                and type(tags) is tuple):
+            raise ValueError(f"invalid question in the snapshot of {name}")
+        # join() raises TypeError unless every option and tag is text
+        ''.join(options)
+        ''.join(tags)
+        questions.append(Question(text, options, correct, explanation, image, tags, topic, difficulty))
+    if type(title) is not str:
+        raise ValueError(f"invalid title in the snapshot of {name}")
+    return Quiz(name, title, tuple(questions))
+
+
+def load_quiz_file(filepath: str) -> Optional[Union[Quiz, DrawQuiz]]:
+    """
+    Load, validate and compile a single quiz JSON file.
+
+    Returns:
+        The compiled quiz (a DrawQuiz if it draws from question pools), or
+        None if the file is unreadable or not a quiz.
+    """
+    filename = os.path.basename(filepath)
+    with QUIZ_LOAD_SECONDS.time():
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                quiz_content = json.load(f)
+        except Exception as e:
+            print(f"Failed to load {filename}: {e}")
+            QUIZ_LOAD_FAILURES.inc()
+            return None
+
+        try:
+            return quiz_from_dict(filename[:-5], quiz_content)
+        except QuizFormatError as e:
+            print(f"Warning: {filename} does not contain a valid quiz format ({e}). Skipping.")
+            QUIZ_LOAD_FAILURES.inc()
+            return None
+
 
 def load_quizzes_from_directory(directory: str) -> dict:
     """
@@ -14,7 +97,7 @@ def load_quizzes_from_directory(directory: str) -> dict:
 
     Returns:
         A dictionary of quizzes with filename (without .json) as key,
-        and the quiz content (dict with title + questions) as value.
+        and the compiled Quiz as value.
     """
     quizzes = {}
 
@@ -24,28 +107,315 @@ def load_quizzes_from_directory(directory: str) -> dict:
 
     for filename in os.listdir(directory):
         if filename.endswith('.json'):
-            filepath = os.path.join(directory, filename)
+            quiz_content = load_quiz_file(os.path.join(directory, filename))
+            if quiz_content is not None:
+                quiz_name = filename[:-5]  # Strip '.json'
+                quizzes[quiz_name] = quiz_content
+                print(f"Loaded quiz: {quiz_name} ({len(quiz_content)} questions)")
+
+    return quizzes
+
+
+class QuizInfo(NamedTuple):
+    """Metadata about a quiz file, enough to list it without loading its questions."""
+    title: str
+    question_count: int
+    signature: Tuple[int, int]  # (mtime_ns, size) of the file it was read from
+
+
+class QuizBank(Mapping):
+    """
+    Read-only mapping of quiz name to compiled Quiz that follows the directory.
+
+    The bank keeps a manifest with each quiz's title and question count.
+    refresh() compares each file's mtime and size with the last scan and
+    reparses only files that were added or changed. Updates are swapped in
+    as a new dict, so readers always see a consistent bank, and quiz objects
+    are never mutated: a session holding on to a quiz keeps that version even
+    after the file is edited or removed.
+
+    With lazy=True only the manifest is kept for every file. It is cached in
+    a hidden file in the directory, so unchanged files are not even opened on
+    startup. Questions are loaded on first access and held in an LRU of at
+    most cache_size quizzes. When a file is saved in an invalid state, its
+    last good version is kept out of the LRU for as long as the file stays
+    broken; if that version was already evicted, the quiz is dropped from
+    the manifest until the file is fixed.
+
+    Otherwise every compiled quiz is kept, and saved with its file's
+    signature in a snapshot whenever the bank changes. On startup quizzes
+    whose file is unchanged come from the snapshot in one read, and only
+    the other files are parsed and validated. The snapshot is marshal data
+    of plain tuples, which can't run code when loaded, and is type checked
+    as the quizzes are rebuilt from it.
+    """
+
+    def __init__(self, directory: str, lazy: bool = False, cache_size: int = 256):
+        self.directory = directory
+        self.lazy = lazy
+        self.cache_size = cache_size
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self._manifest: Dict[str, QuizInfo] = {}
+        self._broken: Dict[str, Tuple[int, int]] = {}  # Signatures of files that failed to load
+        self._retained: Dict[str, Quiz] = {}  # Last good versions of broken files in a lazy bank
+        self._quizzes: 'OrderedDict[str, Quiz]' = OrderedDict()
+        self._listeners: List[Tuple[Callable[[str], None], bool]] = []
+        self.version = 0  # Incremented whenever a quiz is added, changed or removed
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_version = -1
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        if not os.path.exists(directory):
+            print(f"Directory {directory} does not exist.")
+        self.refresh(initial=True)
+
+    def __getitem__(self, quiz_name: str) -> Quiz:
+        info = self._manifest[quiz_name]
+        with self._cache_lock:
+            quiz = self._quizzes.get(quiz_name)
+            if quiz is not None:
+                self._quizzes.move_to_end(quiz_name)
+                return quiz
+            quiz = self._retained.get(quiz_name)
+            if quiz is not None:
+                return quiz
+
+        quiz = load_quiz_file(self._path(quiz_name))
+        if quiz is None:
+            raise KeyError(quiz_name)
+
+        with self._cache_lock:
+            # Don't cache a version that a concurrent refresh already replaced
+            if self._manifest.get(quiz_name) is info:
+                self._quizzes[quiz_name] = quiz
+                self._evict()
+        return quiz
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._manifest)
+
+    def __len__(self) -> int:
+        return len(self._manifest)
+
+    def __contains__(self, quiz_name) -> bool:
+        return quiz_name in self._manifest
+
+    def info(self, quiz_name: str) -> QuizInfo:
+        """Return the title and question count of a quiz without loading it."""
+        return self._manifest[quiz_name]
+
+    def manifest(self) -> Dict[str, QuizInfo]:
+        """Return the metadata of every quiz in the bank."""
+        return self._manifest
+
+    def add_listener(self, callback: Callable[[str], None], added: bool = False):
+        """Call callback with the quiz name whenever a quiz is changed or removed, and added if added is True."""
+        self._listeners.append((callback, added))
+
+    def _path(self, quiz_name: str) -> str:
+        return os.path.join(self.directory, f"{quiz_name}.json")
+
+    def _evict(self):
+        if not self.lazy:
+            return
+        while len(self._quizzes) > self.cache_size:
+            self._quizzes.popitem(last=False)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        signatures = {}
+        if not os.path.isdir(self.directory):
+            return signatures
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json') and not entry.name.startswith('.') and entry.is_file():
+                stat = entry.stat()
+                signatures[entry.name[:-5]] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def _read_manifest(self) -> Dict[str, QuizInfo]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return {name: QuizInfo(title, count, tuple(signature))
+                        for name, (title, count, signature) in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _write_manifest(self, manifest: Dict[str, QuizInfo]):
+        try:
+            tmp_path = f"{self.manifest_path}.tmp"
+            # Broken files are left out, so a restart parses them again instead of listing them
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({name: list(info) for name, info in manifest.items() if name not in self._broken}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"Could not write quiz manifest: {e}")
+
+    def _read_snapshot(self) -> Dict[str, Tuple[Tuple[int, int], Union[Quiz, DrawQuiz]]]:
+        # The snapshot only allocates objects without cycles, so collecting while loading is wasted time
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = marshal.loads(f.read())  # Much faster than marshal.load(f), which reads in small pieces
+            if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+                return {}
+            return {name: (signature, _from_snapshot(name, kind, data))
+                    for name, (signature, kind, data) in snapshot['quizzes'].items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"Ignoring unreadable quiz snapshot: {e}")
+            return {}
+        finally:
+            if collecting:
+                gc.enable()
+
+    def _write_snapshot(self, version: int, quizzes: Dict[str, Tuple[Tuple[int, int], Union[Quiz, DrawQuiz]]]):
+        # Called without _lock: encoding and writing a large bank takes a while, and the quizzes are immutable
+        with self._snapshot_lock:
+            if version < self._snapshot_version:
+                return  # A later refresh already wrote a newer snapshot
+            self._snapshot_version = version
+            entries = {name: (signature,) + _to_snapshot(quiz) for name, (signature, quiz) in quizzes.items()}
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    quiz_content = json.load(f)
+                tmp_path = f"{self.snapshot_path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    marshal.dump({'version': SNAPSHOT_VERSION, 'quizzes': entries}, f)
+                os.replace(tmp_path, self.snapshot_path)
+            except (OSError, ValueError) as e:
+                print(f"Could not write quiz snapshot: {e}")
 
-                quiz_name = filename[:-5]  # Strip '.json'
+    def refresh(self, initial: bool = False) -> Dict[str, List[str]]:
+        """
+        Reload quizzes whose files were added, changed or removed.
+
+        Returns:
+            The names of added, changed and removed quizzes.
+        """
+        with self._lock, QUIZ_REFRESH_SECONDS.time():
+            signatures = self._scan()
+            manifest = dict(self._manifest)
+            cached = self._read_manifest() if initial and self.lazy else {}
+            snapshot = self._read_snapshot() if initial and not self.lazy else {}
+            loaded: Dict[str, Quiz] = {}
+            restored = 0
+            changes = {'added': [], 'changed': [], 'removed': []}
+
+            for quiz_name, signature in signatures.items():
+                old = manifest.get(quiz_name)
+                if old is not None and old.signature == signature:
+                    continue
+
+                if self._broken.get(quiz_name) == signature:
+                    continue
+
+                info = cached.get(quiz_name)
+                if info is None or info.signature != signature:
+                    snapped = snapshot.get(quiz_name)
+                    if snapped is not None and snapped[0] == signature:
+                        quiz = snapped[1]
+                        restored += 1
+                    else:
+                        quiz = load_quiz_file(self._path(quiz_name))
+                        if quiz is None:
+                            self._broken[quiz_name] = signature
+                            if old is None:
+                                continue
+                            with self._cache_lock:
+                                last_good = self._quizzes.get(quiz_name) or self._retained.get(quiz_name)
+                                if self.lazy and last_good is not None:
+                                    self._retained[quiz_name] = last_good
+                            if not self.lazy or last_good is not None:
+                                # Keep serving the previous version of a broken file
+                                manifest[quiz_name] = old._replace(signature=signature)
+                            else:
+                                # Evicted already, so there is no good version left to serve
+                                del manifest[quiz_name]
+                                changes['removed'].append(quiz_name)
+                                print(f"Removed quiz: {quiz_name} (invalid file)")
+                            continue
+                        verb = 'Loaded' if initial or old is None else 'Reloaded'
+                        print(f"{verb} quiz: {quiz_name} ({len(quiz)} questions)")
+                    self._broken.pop(quiz_name, None)
+                    info = QuizInfo(quiz.title, len(quiz), signature)
+                    loaded[quiz_name] = quiz
+
+                manifest[quiz_name] = info
+                changes['changed' if old is not None else 'added'].append(quiz_name)
 
-                # Validate format
-                if (isinstance(quiz_content, dict)
-                        and 'questions' in quiz_content
-                        and isinstance(quiz_content['questions'], list)):
+            for quiz_name in list(self._broken):
+                if quiz_name not in signatures:
+                    del self._broken[quiz_name]
 
-                    quizzes[quiz_name] = quiz_content
-                    print(f"Loaded quiz: {quiz_name} ({len(quiz_content['questions'])} questions)")
+            for quiz_name in list(manifest):
+                if quiz_name not in signatures:
+                    del manifest[quiz_name]
+                    changes['removed'].append(quiz_name)
+                    print(f"Removed quiz: {quiz_name}")
 
-                else:
-                    print(f"Warning: {filename} does not contain a valid quiz format. Skipping.")
+            with self._cache_lock:
+                self._manifest = manifest
+                if any(changes.values()):
+                    self.version += 1
+                for quiz_name in changes['changed'] + changes['removed']:
+                    self._quizzes.pop(quiz_name, None)
+                    self._retained.pop(quiz_name, None)
+                if not self.lazy:
+                    self._quizzes.update(loaded)
 
+            if self.lazy and (loaded or changes['removed'] or initial and manifest != cached):
+                self._write_manifest(manifest)
+            snapshot_quizzes = None
+            if not self.lazy and (len(loaded) > restored or changes['removed'] or
+                                  initial and restored != len(snapshot)):
+                # Files that failed to load are left out, so they are retried and reported on startup
+                snapshot_quizzes = {name: (info.signature, self._quizzes[name]) for name, info in manifest.items()
+                                    if name in self._quizzes and name not in self._broken}
+                snapshot_version = self.version
+
+        if snapshot_quizzes is not None:
+            self._write_snapshot(snapshot_version, snapshot_quizzes)
+
+        if initial and self.lazy:
+            print(f"Indexed {len(manifest)} quizzes ({len(loaded)} parsed)")
+        elif initial and restored:
+            print(f"Loaded {restored} quizzes from snapshot ({len(loaded) - restored} parsed)")
+
+        for quiz_name in changes['changed'] + changes['removed']:
+            for callback, _ in self._listeners:
+                callback(quiz_name)
+        for quiz_name in changes['added']:
+            for callback, added in self._listeners:
+                if added:
+                    callback(quiz_name)
+        return changes
+
+    def watch(self, interval: float = 2.0):
+        """Poll the directory for changes from a background thread."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='quiz-bank-watcher',
+                                         daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stop the background watcher."""
+        self._stop.set()
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
             except Exception as e:
-                print(f"Failed to load {filename}: {e}")
+                print(f"Failed to refresh quiz bank: {e}")
 
-    return quizzes
 
-# Load quizzes from the quiz_bank directory
-quiz_data = load_quizzes_from_directory('quiz_bank')
\ No newline at end of file
+# Load quizzes from the quiz_bank directory.
+# Set QUIZ_BANK_LAZY=1 for large banks to load questions on demand.
+quiz_data = QuizBank('quiz_bank',
+                     lazy=os.environ.get('QUIZ_BANK_LAZY', '') == '1',
+                     cache_size=int(os.environ.get('QUIZ_BANK_CACHE_SIZE', '256')))
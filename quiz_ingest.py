@@ -0,0 +1,315 @@
+# quiz_ingest.py
+"""
+Bulk import of quizzes into the quiz bank.
+
+Three kinds of input are converted to the quiz bank format and validated:
+quiz bank JSON files, JSON written by QuizGenerator ("A) " options and a
+"correct_answer" letter), and Python modules like those in
+quiz_bank_archive/ that map section names to question lists. Files are
+converted in a pool of processes. Quizzes whose questions are already in
+the bank are skipped, and inputs unchanged since the last run are not read
+again.
+
+    python quiz_ingest.py quiz_bank_archive/ generated/ --output quiz_bank
+    python quiz_ingest.py department/ --report ingest_report.json
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from quiz_model import (Question, Quiz, QuizFormatError, question_from_generated,
+                        quiz_from_dict)
+
+# What earlier runs read and wrote, kept next to the quizzes
+STATE_FILE = '.ingest_state.json'
+SOURCE_SUFFIXES = ('.json', '.py')
+
+
+class Converted(NamedTuple):
+    """A quiz converted from an input file."""
+    name: str
+    text: str  # The quiz file, serialized by the worker that converted it
+    digest: str
+
+
+class FileReport(NamedTuple):
+    """Quizzes converted from one input file, or why it could not be."""
+    path: str
+    quizzes: List[Converted]
+    errors: List[str]
+
+
+def slugify(text: str) -> str:
+    """Turn a title into a quiz name: lowercase words joined by underscores."""
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_') or 'quiz'
+
+
+def content_digest(data: dict) -> str:
+    """Hash of a quiz's questions or draw rules, ignoring its title."""
+    content = {key: value for key, value in data.items() if key != 'title'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def compile_quiz(name: str, title: Any, questions: Any) -> Tuple[Optional[Quiz], List[str]]:
+    """
+    Validate questions in either the quiz bank or the generated format.
+
+    Every invalid question is reported, not only the first.
+    """
+    if not isinstance(questions, list) or not questions:
+        return None, ["expected a non-empty list of questions"]
+
+    compiled, errors = [], []
+    for position, question in enumerate(questions):
+        try:
+            if isinstance(question, dict) and 'correct' not in question and 'correct_answer' in question:
+                compiled.append(question_from_generated(question, position))
+            else:
+                compiled.append(Question.from_dict(question, position))
+        except QuizFormatError as e:
+            errors.append(str(e))
+    if errors:
+        return None, errors
+    return Quiz(name, title if isinstance(title, str) and title.strip() else name, tuple(compiled)), []
+
+
+def _parse_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        # Raw completions wrap the JSON in a Markdown code fence
+        fenced = re.fullmatch(r'\s*```(?:json)?\s*(.*?)\s*```\s*', text, re.DOTALL)
+        if fenced is None:
+            raise
+        return json.loads(fenced.group(1))
+
+
+def _python_sections(source: str) -> Dict[str, Any]:
+    # The module is never run: only literal assignments are read
+    sections: Dict[str, Any] = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict):
+            value = ast.literal_eval(node.value)
+            sections.update(value)
+    if not sections:
+        raise ValueError("no dictionary of sections found")
+    return sections
+
+
+def convert_file(path: str) -> FileReport:
+    """Convert and validate every quiz in an input file."""
+    stem = slugify(os.path.splitext(os.path.basename(path))[0])
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        content = _python_sections(source) if path.endswith('.py') else _parse_json(source)
+    except (OSError, ValueError, SyntaxError, UnicodeDecodeError) as e:
+        return FileReport(path, [], [f"unreadable: {e}"])
+
+    if isinstance(content, dict) and 'draw' in content:
+        try:
+            quiz = quiz_from_dict(stem, content)
+        except QuizFormatError as e:
+            return FileReport(path, [], [str(e)])
+        return FileReport(path, [_converted(quiz)], [])
+
+    if isinstance(content, dict) and 'questions' in content:
+        sections = [(stem, content.get('title'), content['questions'])]
+    elif isinstance(content, dict) and content and all(isinstance(value, list) for value in content.values()):
+        # Several sections become one quiz each, titled by the section name
+        sections = [(stem if len(content) == 1 else f"{stem}_{slugify(str(title))}", str(title), questions)
+                    for title, questions in content.items()]
+    else:
+        return FileReport(path, [], ["not a quiz: expected questions, draw rules or sections of questions"])
+
+    quizzes, errors = [], []
+    for name, title, questions in sections:
+        quiz, problems = compile_quiz(name, title, questions)
+        if quiz is not None:
+            quizzes.append(_converted(quiz))
+        prefix = f"{title}: " if len(sections) > 1 else ''
+        errors.extend(prefix + problem for problem in problems)
+    return FileReport(path, quizzes if not errors else [], errors)
+
+
+def _converted(quiz) -> Converted:
+    data = quiz.to_dict()
+    return Converted(quiz.name, json.dumps(data, indent=4, ensure_ascii=False), content_digest(data))
+
+
+def find_inputs(paths: Iterable[str]) -> List[str]:
+    """Input files under paths, skipping hidden files and Python package files."""
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(os.path.abspath(path))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+            found.extend(os.path.abspath(os.path.join(root, name)) for name in files
+                         if name.endswith(SOURCE_SUFFIXES) and not name.startswith(('.', '__')))
+    return sorted(set(found))
+
+
+def _signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class Ingest:
+    """
+    Imports input files into a quiz bank directory.
+
+    The state file records the signature of every input imported without
+    errors with the quizzes it produced, and the content digest of every
+    quiz in the bank. Re-runs only read inputs that changed, or whose
+    quizzes were since edited or removed from the bank.
+    """
+
+    def __init__(self, output: str = 'quiz_bank', workers: Optional[int] = None):
+        self.output = output
+        self.workers = workers
+        self.state_path = os.path.join(output, STATE_FILE)
+        self.state = self._read_state()
+
+    def _read_state(self) -> dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if isinstance(state, dict):
+                return {'inputs': state.get('inputs', {}), 'bank': state.get('bank', {})}
+        except (OSError, ValueError):
+            pass
+        return {'inputs': {}, 'bank': {}}
+
+    def _write_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _bank_digests(self) -> Dict[str, str]:
+        # Quizzes already in the bank, read again only if their file changed
+        bank = {}
+        for entry in os.scandir(self.output):
+            if not entry.name.endswith('.json') or entry.name.startswith('.'):
+                continue
+            name = entry.name[:-5]
+            signature = _signature(entry.path)
+            known = self.state['bank'].get(name)
+            if known is not None and known[0] == signature:
+                bank[name] = known
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    # Normalized like converted quizzes, so equal content gets an equal digest
+                    bank[name] = [signature, content_digest(quiz_from_dict(name, json.load(f)).to_dict())]
+            except (OSError, ValueError) as e:
+                print(f"Cannot compare with {entry.name}: {e}")
+        self.state['bank'] = bank
+        return {name: digest for name, (_, digest) in bank.items()}
+
+    def _write_quiz(self, name: str, quiz: Converted):
+        path = os.path.join(self.output, f"{name}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(quiz.text)
+        os.replace(tmp_path, path)
+        self.state['bank'][name] = [_signature(path), quiz.digest]
+
+    def convert(self, paths: List[str]) -> Iterable[FileReport]:
+        """Convert files, in a process pool unless there are too few to be worth it."""
+        workers = self.workers or os.cpu_count() or 1
+        if workers == 1 or len(paths) < 2 * workers:
+            return map(convert_file, paths)
+        executor = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, min(64, len(paths) // (workers * 4)))
+        try:
+            return list(executor.map(convert_file, paths, chunksize=chunksize))
+        finally:
+            executor.shutdown()
+
+    def run(self, inputs: Iterable[str], force: bool = False) -> dict:
+        """
+        Import every input file that changed since the last run.
+
+        Returns:
+            Counts of skipped, written, unchanged and duplicate quizzes and
+            failed files, plus the errors of every failed file.
+        """
+        os.makedirs(self.output, exist_ok=True)
+        digests = self._bank_digests()
+        owners = {digest: name for name, digest in digests.items()}
+        summary = {'files': 0, 'skipped': 0, 'written': 0, 'unchanged': 0, 'duplicates': 0, 'failed': 0,
+                   'errors': {}}
+
+        pending = []
+        for path in find_inputs(inputs):
+            summary['files'] += 1
+            known = self.state['inputs'].get(path)
+            # Unchanged, and its quizzes are still in the bank as they were imported
+            if not force and known is not None and known['signature'] == _signature(path) \
+                    and all(digests.get(name) == digest for name, digest in known['outputs'].items()):
+                summary['skipped'] += 1
+            else:
+                pending.append(path)
+
+        for report in self.convert(pending):
+            if report.errors:
+                summary['failed'] += 1
+                summary['errors'][report.path] = report.errors
+                continue
+
+            previous = self.state['inputs'].get(report.path, {}).get('outputs', {})
+            outputs = {}
+            for quiz in report.quizzes:
+                owner = owners.get(quiz.digest)
+                if owner is not None:
+                    summary['unchanged' if owner in previous else 'duplicates'] += 1
+                    outputs[owner] = quiz.digest
+                    continue
+                name = quiz.name
+                if name in digests and name not in previous:
+                    name = f"{name}_{quiz.digest[:8]}"  # Another quiz already has this name
+                self._write_quiz(name, quiz)
+                digests[name] = quiz.digest
+                owners[quiz.digest] = name
+                outputs[name] = quiz.digest
+                summary['written'] += 1
+            self.state['inputs'][report.path] = {'signature': _signature(report.path), 'outputs': outputs}
+
+        self._write_state()
+        return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert, validate and import quizzes into the quiz bank.")
+    parser.add_argument('inputs', nargs='+', help="quiz files or directories (.json and .py)")
+    parser.add_argument('--output', default='quiz_bank', help="quiz bank directory")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="read unchanged inputs again")
+    parser.add_argument('--report', help="write the errors of every failed file to this JSON file")
+    args = parser.parse_args(argv)
+
+    summary = Ingest(args.output, args.workers).run(args.inputs, force=args.force)
+    for path, errors in summary['errors'].items():
+        print(f"{os.path.relpath(path)}:")
+        for error in errors:
+            print(f"  {error}")
+    print(f"{summary['files']} files: {summary['written']} quizzes written, {summary['unchanged']} unchanged, "
+          f"{summary['duplicates']} duplicates, {summary['skipped']} files skipped, {summary['failed']} failed")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary['errors'], f, indent=2)
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
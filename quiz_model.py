@@ -0,0 +1,335 @@
+# quiz_model.py
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+
+class QuizFormatError(ValueError):
+    """Raised when quiz content does not match the quiz bank format."""
+
+
+# Shared label tuples, so questions with the same option count reuse one tuple
+_LABELS: Dict[int, Tuple[str, ...]] = {}
+
+
+def option_labels(count: int) -> Tuple[str, ...]:
+    """Return the labels A, B, C... for count options."""
+    labels = _LABELS.get(count)
+    if labels is None:
+        labels = _LABELS.setdefault(count, tuple(chr(65 + i) for i in range(count)))
+    return labels
+
+
+class _Frozen:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class Question(_Frozen):
+    """A compiled, immutable multiple choice question."""
+
+    __slots__ = ('text', 'options', 'correct', 'explanation', 'image', 'tags', 'topic', 'difficulty',
+                 'labels', 'option_count')
+
+    def __init__(self, text: str, options: Tuple[str, ...], correct: int,
+                 explanation: str = '', image: Optional[str] = None, tags: Tuple[str, ...] = (),
+                 topic: Optional[str] = None, difficulty: Optional[str] = None):
+        set_ = object.__setattr__
+        set_(self, 'text', text)
+        set_(self, 'options', options)
+        set_(self, 'correct', correct)
+        set_(self, 'explanation', explanation)
+        set_(self, 'image', image)
+        set_(self, 'tags', tags)
+        set_(self, 'topic', topic)
+        set_(self, 'difficulty', difficulty)
+        set_(self, 'labels', option_labels(len(options)))
+        set_(self, 'option_count', len(options))
+
+    def with_options(self, order: Tuple[int, ...]) -> 'Question':
+        """Return a copy with the options in the given order of original indices."""
+        options = tuple(self.options[i] for i in order)
+        return Question(self.text, options, order.index(self.correct), self.explanation, self.image,
+                        self.tags, self.topic, self.difficulty)
+
+    @classmethod
+    def from_dict(cls, data: Any, position: int = 0) -> 'Question':
+        """
+        Validate a question dict from a quiz file and compile it.
+
+        Raises:
+            QuizFormatError: If a field is missing or has the wrong type.
+        """
+        where = f"question {position + 1}"
+        if not isinstance(data, dict):
+            raise QuizFormatError(f"{where} is not an object")
+
+        text = data.get('question')
+        if not isinstance(text, str) or not text.strip():
+            raise QuizFormatError(f"{where} has no question text")
+
+        options = data.get('options')
+        if (not isinstance(options, list) or len(options) < 2
+                or not all(isinstance(option, str) for option in options)):
+            raise QuizFormatError(f"{where} needs a list of at least two text options")
+
+        correct = data.get('correct')
+        if isinstance(correct, bool) or not isinstance(correct, int) or not 0 <= correct < len(options):
+            raise QuizFormatError(f"{where} has an invalid correct option index: {correct!r}")
+
+        explanation = data.get('explanation') or ''
+        if not isinstance(explanation, str):
+            raise QuizFormatError(f"{where} has a non-text explanation")
+
+        image = data.get('image') or None
+        if image is not None and not isinstance(image, str):
+            raise QuizFormatError(f"{where} has an invalid image path")
+
+        tags = data.get('tags') or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise QuizFormatError(f"{where} has tags that are not a list of text")
+
+        topic = _optional_text(data, 'topic', where)
+        difficulty = _optional_text(data, 'difficulty', where)
+
+        return cls(text, tuple(options), correct, explanation, image, tuple(tags), topic, difficulty)
+
+    def to_dict(self) -> dict:
+        """Return the question in the quiz file format."""
+        data = {
+            'question': self.text,
+            'options': list(self.options),
+            'correct': self.correct,
+            'explanation': self.explanation,
+            'image': self.image,
+        }
+        if self.tags:
+            data['tags'] = list(self.tags)
+        if self.topic is not None:
+            data['topic'] = self.topic
+        if self.difficulty is not None:
+            data['difficulty'] = self.difficulty
+        return data
+
+
+def _optional_text(data: dict, field: str, where: str) -> Optional[str]:
+    value = data.get(field)
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    if not isinstance(value, str):
+        raise QuizFormatError(f"{where} has an invalid {field}: {value!r}")
+    return value
+
+
+# Option labels of generated questions, e.g. "A) "
+_OPTION_PREFIX = re.compile(r"^\s*[A-Z][).:]\s*")
+
+
+def question_from_generated(data: Any, position: int = 0) -> Question:
+    """
+    Convert a generated question to the quiz bank format and validate it.
+
+    Generated questions label their options "A) ..." and give the answer as
+    a letter; quiz bank questions use plain options and an index.
+
+    Raises:
+        QuizFormatError: If the question is incomplete or inconsistent.
+    """
+    if not isinstance(data, dict):
+        raise QuizFormatError(f"question {position + 1} is not an object")
+
+    options = data.get('options')
+    if isinstance(options, list):
+        options = [_OPTION_PREFIX.sub('', option) if isinstance(option, str) else option for option in options]
+
+    correct = data.get('correct')
+    answer = data.get('correct_answer')
+    if correct is None and isinstance(answer, str) and len(answer.strip()) >= 1:
+        correct = ord(answer.strip()[0].upper()) - 65
+
+    return Question.from_dict({
+        'question': data.get('question'),
+        'options': options,
+        'correct': correct,
+        'explanation': data.get('explanation'),
+    }, position)
+
+
+class Quiz(_Frozen):
+    """A compiled, immutable quiz: a title and a tuple of questions."""
+
+    __slots__ = ('name', 'title', 'questions', 'answer_key', '_fingerprint')
+
+    def __init__(self, name: str, title: str, questions: Tuple[Question, ...]):
+        set_ = object.__setattr__
+        set_(self, 'name', name)
+        set_(self, 'title', title)
+        set_(self, 'questions', questions)
+        set_(self, 'answer_key', tuple(question.correct for question in questions))
+        set_(self, '_fingerprint', None)
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash identifying this exact version of the quiz."""
+        if self._fingerprint is None:
+            content = json.dumps([self.name, self.to_dict()], sort_keys=True)
+            object.__setattr__(self, '_fingerprint', hashlib.sha256(content.encode()).hexdigest())
+        return self._fingerprint
+
+    @classmethod
+    def from_dict(cls, name: str, data: Any) -> 'Quiz':
+        """
+        Validate quiz file content and compile it.
+
+        Raises:
+            QuizFormatError: If the quiz or any of its questions is invalid.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+            raise QuizFormatError("expected an object with a list of questions")
+
+        title = data.get('title') or name
+        if not isinstance(title, str):
+            raise QuizFormatError("title is not text")
+
+        questions = tuple(Question.from_dict(question, i) for i, question in enumerate(data['questions']))
+        return cls(name, title, questions)
+
+    def to_dict(self) -> dict:
+        """Return the quiz in the quiz file format."""
+        return {'title': self.title, 'questions': [question.to_dict() for question in self.questions]}
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+
+class PoolRule(_Frozen):
+    """Draw count questions from the pool of questions matching all given criteria."""
+
+    __slots__ = ('tags', 'topic', 'difficulty', 'count')
+
+    def __init__(self, count: int, tags: Tuple[str, ...] = (), topic: Optional[str] = None,
+                 difficulty: Optional[str] = None):
+        set_ = object.__setattr__
+        set_(self, 'count', count)
+        set_(self, 'tags', tags)
+        set_(self, 'topic', topic)
+        set_(self, 'difficulty', difficulty)
+
+    @property
+    def criteria(self) -> Tuple[Tuple[str, ...], Optional[str], Optional[str]]:
+        """The (tags, topic, difficulty) that pool questions must match."""
+        return self.tags, self.topic, self.difficulty
+
+    @classmethod
+    def from_dict(cls, data: Any, position: int = 0) -> 'PoolRule':
+        """
+        Validate a draw rule from a quiz file.
+
+        Raises:
+            QuizFormatError: If a field has the wrong type.
+        """
+        where = f"draw rule {position + 1}"
+        if not isinstance(data, dict):
+            raise QuizFormatError(f"{where} is not an object")
+
+        count = data.get('count')
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            raise QuizFormatError(f"{where} needs a positive question count")
+
+        tags = data.get('tags') or []
+        if isinstance(tags, str):
+            tags = [tags]
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise QuizFormatError(f"{where} has tags that are not a list of text")
+
+        topic = _optional_text(data, 'topic', where)
+        difficulty = _optional_text(data, 'difficulty', where)
+        return cls(count, tuple(sorted(set(tags))), topic, difficulty)
+
+    def to_dict(self) -> dict:
+        """Return the rule in the quiz file format."""
+        data = {'count': self.count}
+        if self.tags:
+            data['tags'] = list(self.tags)
+        if self.topic is not None:
+            data['topic'] = self.topic
+        if self.difficulty is not None:
+            data['difficulty'] = self.difficulty
+        return data
+
+
+class DrawQuiz(_Frozen):
+    """
+    A quiz whose questions are drawn from question pools for every attempt.
+
+    Its file lists draw rules instead of questions:
+        {"title": ..., "draw": [{"tags": [...], "topic": ..., "difficulty": ..., "count": 5}],
+         "shuffle_options": true}
+    """
+
+    __slots__ = ('name', 'title', 'rules', 'shuffle_options', '_fingerprint')
+
+    # Answers differ between attempts, so there is no fixed answer key
+    answer_key = None
+
+    def __init__(self, name: str, title: str, rules: Tuple[PoolRule, ...], shuffle_options: bool = False):
+        set_ = object.__setattr__
+        set_(self, 'name', name)
+        set_(self, 'title', title)
+        set_(self, 'rules', rules)
+        set_(self, 'shuffle_options', shuffle_options)
+        set_(self, '_fingerprint', None)
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash identifying this version of the draw definition."""
+        if self._fingerprint is None:
+            content = json.dumps([self.name, self.to_dict()], sort_keys=True)
+            object.__setattr__(self, '_fingerprint', hashlib.sha256(content.encode()).hexdigest())
+        return self._fingerprint
+
+    @classmethod
+    def from_dict(cls, name: str, data: Any) -> 'DrawQuiz':
+        """
+        Validate draw quiz file content.
+
+        Raises:
+            QuizFormatError: If the definition or any of its rules is invalid.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('draw'), list) or not data['draw']:
+            raise QuizFormatError("expected an object with a list of draw rules")
+
+        title = data.get('title') or name
+        if not isinstance(title, str):
+            raise QuizFormatError("title is not text")
+
+        shuffle_options = data.get('shuffle_options', False)
+        if not isinstance(shuffle_options, bool):
+            raise QuizFormatError("shuffle_options is not true or false")
+
+        rules = tuple(PoolRule.from_dict(rule, i) for i, rule in enumerate(data['draw']))
+        return cls(name, title, rules, shuffle_options)
+
+    def to_dict(self) -> dict:
+        """Return the definition in the quiz file format."""
+        return {'title': self.title, 'draw': [rule.to_dict() for rule in self.rules],
+                'shuffle_options': self.shuffle_options}
+
+    def __len__(self) -> int:
+        return sum(rule.count for rule in self.rules)
+
+
+def quiz_from_dict(name: str, data: Any):
+    """Compile quiz file content into a Quiz, or a DrawQuiz if it draws from pools."""
+    if isinstance(data, dict) and 'draw' in data:
+        return DrawQuiz.from_dict(name, data)
+    return Quiz.from_dict(name, data)
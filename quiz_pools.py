@@ -0,0 +1,169 @@
+# quiz_pools.py
+import random
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from quiz_model import DrawQuiz, PoolRule, Question, Quiz
+
+Criteria = Tuple[Tuple[str, ...], Optional[str], Optional[str]]
+
+
+class PoolIndex:
+    """
+    Index of every question in a quiz bank by tag, topic and difficulty.
+
+    The index is built from the bank on first use and rebuilt when the
+    bank's version changes. Pools for a combination of criteria are
+    computed once and kept as tuples, so drawing questions for an attempt
+    is a random.sample() over a shared tuple: no pool is copied and the
+    cost depends on the number of questions drawn, not the pool size.
+
+    Building the index reads every quiz, so it needs a bank that keeps all
+    quizzes in memory: with a lazily loaded bank it raises RuntimeError
+    instead of loading the whole bank through its cache.
+    """
+
+    def __init__(self, quizzes: Mapping):
+        self.quizzes = quizzes
+        self._built = False
+        self._version = None
+        self._questions: Tuple[Question, ...] = ()
+        self._sources: Tuple[Tuple[str, int], ...] = ()  # (quiz name, question index) of every question
+        self._by_tag: Dict[str, Set[int]] = {}
+        self._by_topic: Dict[str, Set[int]] = {}
+        self._by_difficulty: Dict[str, Set[int]] = {}
+        self._pools: Dict[Criteria, Tuple[Tuple[Question, ...], Tuple[int, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def _build(self):
+        if getattr(self.quizzes, 'lazy', False):
+            raise RuntimeError("question pools need a quiz bank loaded in full, unset QUIZ_BANK_LAZY")
+        version = getattr(self.quizzes, 'version', None)
+        questions = []
+        sources = []
+        by_tag: Dict[str, Set[int]] = {}
+        by_topic: Dict[str, Set[int]] = {}
+        by_difficulty: Dict[str, Set[int]] = {}
+
+        for name in sorted(self.quizzes):
+            quiz = self.quizzes.get(name)
+            if not isinstance(quiz, Quiz):
+                continue
+            for number, question in enumerate(quiz.questions):
+                position = len(questions)
+                questions.append(question)
+                sources.append((name, number))
+                for tag in question.tags:
+                    by_tag.setdefault(tag, set()).add(position)
+                if question.topic is not None:
+                    by_topic.setdefault(question.topic, set()).add(position)
+                if question.difficulty is not None:
+                    by_difficulty.setdefault(question.difficulty, set()).add(position)
+
+        self._questions = tuple(questions)
+        self._sources = tuple(sources)
+        self._by_tag = by_tag
+        self._by_topic = by_topic
+        self._by_difficulty = by_difficulty
+        self._pools = {}
+        self._version = version
+        self._built = True
+
+    def _ensure_current(self):
+        version = getattr(self.quizzes, 'version', None)
+        if not self._built or version != self._version:
+            self._build()
+
+    def pool(self, tags: Tuple[str, ...] = (), topic: Optional[str] = None,
+             difficulty: Optional[str] = None) -> Tuple[Question, ...]:
+        """Return every question having all the tags and the given topic and difficulty."""
+        with self._lock:
+            self._ensure_current()
+            return self._pool(tags, topic, difficulty)[0]
+
+    def _pool(self, tags: Tuple[str, ...], topic: Optional[str],
+              difficulty: Optional[str]) -> Tuple[Tuple[Question, ...], Tuple[int, ...]]:
+        # The questions of a pool and their positions in the index, called with the lock held
+        criteria = (tuple(sorted(set(tags))), topic, difficulty)
+        pool = self._pools.get(criteria)
+        if pool is None:
+            positions = self._match(*criteria)
+            pool = self._pools[criteria] = (tuple(self._questions[position] for position in positions), positions)
+        return pool
+
+    def _match(self, tags: Tuple[str, ...], topic: Optional[str], difficulty: Optional[str]) -> Tuple[int, ...]:
+        matches: List[Set[int]] = [self._by_tag.get(tag, set()) for tag in tags]
+        if topic is not None:
+            matches.append(self._by_topic.get(topic, set()))
+        if difficulty is not None:
+            matches.append(self._by_difficulty.get(difficulty, set()))
+        if not matches:
+            return tuple(range(len(self._questions)))
+
+        matches.sort(key=len)
+        return tuple(sorted(set(matches[0]).intersection(*matches[1:])))
+
+    def sample(self, draw: DrawQuiz, rng: Optional[random.Random] = None) -> Quiz:
+        """Draw the questions of one attempt at a DrawQuiz."""
+        return self.sample_with_sources(draw, rng)[0]
+
+    def sample_with_sources(self, draw: DrawQuiz,
+                            rng: Optional[random.Random] = None) -> Tuple[Quiz, List[Dict[str, Any]]]:
+        """
+        Draw the questions of one attempt at a DrawQuiz, and record where they came from.
+
+        Each rule contributes up to its count of questions not already drawn
+        by an earlier rule; a pool smaller than the count contributes all it
+        has. Options are shuffled per question if the quiz asks for it.
+
+        Returns:
+            The drawn quiz, and for each of its questions the quiz and question
+            index it was drawn from and the original index of every option shown.
+        """
+        rng = rng or random
+        positions: List[int] = []
+        # All rules draw from the same version of the index
+        with self._lock:
+            self._ensure_current()
+            questions, origins = self._questions, self._sources
+            for rule in draw.rules:
+                positions.extend(self._draw(rule, rng, positions))
+
+        chosen, sources = [], []
+        for position in positions:
+            question = questions[position]
+            order = tuple(range(question.option_count))
+            if draw.shuffle_options:
+                order = tuple(rng.sample(order, len(order)))
+                question = question.with_options(order)
+            chosen.append(question)
+            quiz_name, number = origins[position]
+            sources.append({'quiz': quiz_name, 'question': number, 'options': list(order)})
+        return Quiz(draw.name, draw.title, tuple(chosen)), sources
+
+    def _draw(self, rule: PoolRule, rng, drawn_before: List[int]) -> List[int]:
+        _, pool = self._pool(*rule.criteria)
+        seen = set(drawn_before)
+        # Draw a few extra to make up for questions an earlier rule already took
+        wanted = min(len(pool), rule.count + len(seen))
+        drawn = []
+        for position in rng.sample(pool, wanted):
+            if position not in seen:
+                seen.add(position)
+                drawn.append(position)
+                if len(drawn) == rule.count:
+                    break
+        return drawn
+
+    def stats(self) -> dict:
+        """Return the number of indexed questions, tags, topics and difficulties."""
+        with self._lock:
+            self._ensure_current()
+            return {
+                'questions': len(self._questions),
+                'tags': len(self._by_tag),
+                'topics': len(self._by_topic),
+                'difficulties': len(self._by_difficulty),
+                'pools': len(self._pools),
+            }
@@ -0,0 +1,323 @@
+"""
+Compaction of old results into compressed, append-only segment files.
+
+Results older than a few days are moved out of the results directory into
+one gzip segment per quiz per day under results/archive/. Each segment is
+a series of independently compressed blocks of JSON lines, so a full scan
+simply decompresses the file while a point lookup reads a single block,
+located through a small SQLite index of attempt ID to block offset.
+
+    python -m quiz_results.archive --older-than 7
+    python -m quiz_results.archive --get 3f2c...
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from quiz_results.index import read_attempt_file, read_log
+from quiz_results.recorder import RESULTS_DIR
+
+ARCHIVE_DIR = 'archive'
+ARCHIVE_INDEX = 'index.sqlite3'
+UNREADABLE_DIR = 'unreadable'  # Result files compaction could not read, under the archive directory
+BLOCK_SIZE = 256  # Results per compressed block
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    quiz_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    records INTEGER NOT NULL,
+    UNIQUE (day, quiz_name)
+);
+
+CREATE TABLE IF NOT EXISTS records (
+    attempt_id TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+'''
+
+_LOG_NAME = re.compile(r'^results_(\d{8})\.jsonl$')
+_LEGACY_DAY = re.compile(r'_(\d{8})-\d{6}\.json$')
+_UNSAFE = re.compile(r'[^\w.-]')
+
+
+def read_segment(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[dict]:
+    """Yield the results stored in a segment between two block boundaries."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(-1 if end is None else end - start)
+    with gzip.GzipFile(fileobj=io.BytesIO(data)) as blocks:
+        for line in blocks:
+            yield json.loads(line)
+
+
+class ResultsArchive:
+    """
+    Compacted results of a results directory.
+
+    Segments are only ever appended to. The index records each segment's
+    committed length; bytes past it, left by an interrupted compaction,
+    are ignored by readers and overwritten by the next compaction.
+    """
+
+    def __init__(self, directory: str = RESULTS_DIR):
+        self.directory = directory
+        self.root = os.path.join(directory, ARCHIVE_DIR)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.root, ARCHIVE_INDEX), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def exists(directory: str = RESULTS_DIR) -> bool:
+        """Whether directory has an archive, so readers don't create one."""
+        return os.path.isfile(os.path.join(directory, ARCHIVE_DIR, ARCHIVE_INDEX))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------------------------------
+    # Compaction
+    # ---------------------------------------------------
+    def compact(self, older_than_days: int = 7, today: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Move results completed more than older_than_days ago into segments.
+
+        Daily logs and legacy per-attempt files are compacted one day at a
+        time and deleted once their results are committed to the archive.
+        Attempts already in the archive are skipped, so running it again
+        after an interruption is safe. Files that can't be read in full are
+        moved to archive/unreadable/ instead.
+
+        Returns:
+            Counts of compacted files, archived results, skipped duplicates
+            and unreadable files.
+        """
+        if older_than_days < 1:
+            raise ValueError("only days the results writer has finished with can be compacted")
+        cutoff = ((today or datetime.now()) - timedelta(days=older_than_days)).strftime('%Y%m%d')
+
+        sources: Dict[str, List[str]] = {}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            match = _LOG_NAME.match(name) or _LEGACY_DAY.search(name)
+            if match and os.path.isfile(path) and match.group(1) < cutoff:
+                sources.setdefault(match.group(1), []).append(path)
+
+        stats = {'files': 0, 'results': 0, 'duplicates': 0, 'unreadable': 0}
+        for day in sorted(sources):
+            by_quiz: Dict[str, List[dict]] = {}
+            seen = set()
+            compacted = []
+            for path in sorted(sources[day]):
+                results = self._read_source(path)
+                if results is None:
+                    self._quarantine(path)
+                    stats['unreadable'] += 1
+                    continue
+                compacted.append(path)
+                for result in results:
+                    attempt_id = result['attempt_id']
+                    if attempt_id in seen or self._has(attempt_id):
+                        stats['duplicates'] += 1
+                        continue
+                    seen.add(attempt_id)
+                    by_quiz.setdefault(result.get('quiz_name', ''), []).append(result)
+
+            with self._lock, self._conn:
+                for quiz_name, results in sorted(by_quiz.items()):
+                    self._append(day, quiz_name, results)
+                    stats['results'] += len(results)
+
+            for path in compacted:
+                os.remove(path)
+                stats['files'] += 1
+            print(f"Compacted {len(compacted)} files from {day} ({len(seen)} results)")
+        return stats
+
+    @staticmethod
+    def _read_source(path: str) -> Optional[List[dict]]:
+        """
+        Read every result in a daily log or legacy per-attempt file.
+
+        Returns:
+            None if any part of the file is not a result with an attempt ID,
+            so the file is never deleted with results left unarchived.
+        """
+        try:
+            if path.endswith('.jsonl'):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                if data and not data.endswith(b'\n'):
+                    return None  # The writer has finished with old days, so this line was cut off
+                results = [json.loads(line) for line in data.splitlines() if line.strip()]
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    results = [json.load(f)]
+                if isinstance(results[0], dict):
+                    results[0].setdefault('attempt_id', f"file:{os.path.basename(path)}")
+        except (OSError, ValueError):
+            return None
+        if not all(isinstance(result, dict) and 'quiz_name' in result and result.get('attempt_id') is not None
+                   for result in results):
+            return None
+        return results
+
+    def _quarantine(self, path: str):
+        # Kept for someone to look at instead of being compacted or deleted
+        os.makedirs(os.path.join(self.root, UNREADABLE_DIR), exist_ok=True)
+        target = os.path.join(self.root, UNREADABLE_DIR, os.path.basename(path))
+        number = 1
+        while os.path.exists(target):
+            target = os.path.join(self.root, UNREADABLE_DIR, f"{os.path.basename(path)}.{number}")
+            number += 1
+        os.replace(path, target)
+        print(f"Moved unreadable results file {path} to {target}")
+
+    def _has(self, attempt_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM records WHERE attempt_id = ?', (attempt_id,)).fetchone() is not None
+
+    def _append(self, day: str, quiz_name: str, results: List[dict]):
+        row = self._conn.execute('SELECT id, path, length FROM segments WHERE day = ? AND quiz_name = ?',
+                                 (day, quiz_name)).fetchone()
+        if row is None:
+            path = os.path.join(day, f"{_UNSAFE.sub('_', quiz_name) or '_'}.jsonl.gz")
+            segment = self._conn.execute(
+                'INSERT INTO segments (day, quiz_name, path, length, records) VALUES (?, ?, ?, 0, 0)',
+                (day, quiz_name, path)).lastrowid
+            length = 0
+        else:
+            segment, path, length = row['id'], row['path'], row['length']
+
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        entries = []
+        with open(full_path, 'r+b' if os.path.exists(full_path) else 'wb') as f:
+            f.truncate(length)  # Drop anything an interrupted compaction left behind
+            f.seek(length)
+            for start in range(0, len(results), BLOCK_SIZE):
+                block = results[start:start + BLOCK_SIZE]
+                data = gzip.compress(''.join(json.dumps(result) + '\n' for result in block).encode(), mtime=0)
+                offset = f.tell()
+                f.write(data)
+                entries.extend((result['attempt_id'], segment, offset, len(data)) for result in block)
+            f.flush()
+            os.fsync(f.fileno())
+            length = f.tell()
+
+        self._conn.executemany('INSERT INTO records VALUES (?, ?, ?, ?)', entries)
+        self._conn.execute('UPDATE segments SET length = ?, records = records + ? WHERE id = ?',
+                           (length, len(results), segment))
+
+    # ---------------------------------------------------
+    # Reading
+    # ---------------------------------------------------
+    def get(self, attempt_id: str) -> Optional[dict]:
+        """
+        Return a result by attempt ID, archived or not compacted yet.
+
+        An archived result is found through the index, decompressing only
+        its block. Otherwise the daily logs, newest first, and the legacy
+        per-attempt files in the results directory are searched.
+        """
+        result = self._get_archived(attempt_id)
+        if result is not None:
+            return result
+
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not (_LOG_NAME.match(name) or name.endswith('.json')):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                results = read_log(path)[0] if name.endswith('.jsonl') else read_attempt_file(path)
+            except FileNotFoundError:
+                continue
+            for result in results:
+                if result.get('attempt_id') == attempt_id:
+                    return result
+        return self._get_archived(attempt_id)  # In case it was compacted while the files were searched
+
+    def _get_archived(self, attempt_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT s.path, r.offset, r.length FROM records r JOIN segments s ON s.id = r.segment '
+                'WHERE r.attempt_id = ?', (attempt_id,)).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(self.root, row['path'])
+        for result in read_segment(path, row['offset'], row['offset'] + row['length']):
+            if result.get('attempt_id') == attempt_id:
+                return result
+        return None
+
+    def segments(self, quiz: Optional[str] = None, since: Optional[str] = None,
+                 until: Optional[str] = None) -> List[dict]:
+        """Return segments (day, quiz_name, path, length, records) matching the filters, oldest first."""
+        sql, params = 'SELECT day, quiz_name, path, length, records FROM segments WHERE 1', []
+        if quiz is not None:
+            sql += ' AND quiz_name = ?'
+            params.append(quiz)
+        if since is not None:
+            sql += ' AND day >= ?'
+            params.append(since)
+        if until is not None:
+            sql += ' AND day <= ?'
+            params.append(until)
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY day, quiz_name', params).fetchall()
+        return [dict(row, path=os.path.join(self.root, row['path'])) for row in rows]
+
+    def scan(self, quiz: Optional[str] = None, since: Optional[str] = None,
+             until: Optional[str] = None) -> Iterator[dict]:
+        """Yield archived results of the matching segments, one segment in memory at a time."""
+        for segment in self.segments(quiz, since, until):
+            yield from read_segment(segment['path'], 0, segment['length'])
+
+    def stats(self) -> dict:
+        """Return the number of segments, archived results and compressed bytes."""
+        with self._lock:
+            row = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(records), 0), COALESCE(SUM(length), 0) '
+                                     'FROM segments').fetchone()
+        return {'segments': row[0], 'results': row[1], 'bytes': row[2]}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compact old quiz results into compressed segments.")
+    parser.add_argument('--results', default=RESULTS_DIR, help="results directory")
+    parser.add_argument('--older-than', type=int, default=7, metavar='DAYS',
+                        help="compact results completed at least this many days ago")
+    parser.add_argument('--get', metavar='ATTEMPT_ID', help="print one result, archived or not, instead of compacting")
+    args = parser.parse_args(argv)
+
+    archive = ResultsArchive(args.results)
+    try:
+        if args.get:
+            result = archive.get(args.get)
+            print(json.dumps(result, indent=2) if result is not None else f"No result {args.get}")
+            return
+        stats = archive.compact(args.older_than)
+        print(f"Compacted {stats['files']} files, {stats['results']} results "
+              f"({stats['duplicates']} duplicates skipped, {stats['unreadable']} unreadable files moved aside)")
+        print(f"Archive: {archive.stats()}")
+    finally:
+        archive.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Streaming export of saved results to CSV or Parquet.
+
+Results are read one line or file at a time and written out as they are
+read, so memory use does not grow with the number of results. Usage:
+
+    python -m quiz_results.export results.csv --quiz algebra --since 2025-09-01
+    python -m quiz_results.export answers.parquet --per-question
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from quiz_results.archive import ResultsArchive, read_segment
+from quiz_results.index import parse_score
+from quiz_results.recorder import RESULTS_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+ATTEMPT_COLUMNS = ['attempt_id', 'student_name', 'quiz_name', 'quiz_title', 'completed_at',
+                   'score', 'total', 'percentage']
+ANSWER_COLUMNS = ['attempt_id', 'student_name', 'quiz_name', 'quiz_title', 'completed_at',
+                  'question', 'question_text', 'selected', 'selected_text', 'correct', 'correct_text', 'is_correct']
+
+# Cells starting with these are run as formulas by spreadsheet programs
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+_LOG_NAME = re.compile(r'^results_(\d{8})\.jsonl$')
+_LEGACY_DAY = re.compile(r'_(\d{8})-\d{6}\.json$')
+
+
+def normalize_day(day: Optional[str]) -> Optional[str]:
+    """Turn YYYY-MM-DD or YYYYMMDD into YYYYMMDD."""
+    if day is None:
+        return None
+    digits = day.replace('-', '')
+    if not re.fullmatch(r'\d{8}', digits):
+        raise ValueError(f"expected a date as YYYY-MM-DD, got {day!r}")
+    return digits
+
+
+def iter_log(path: str) -> Iterator[dict]:
+    """Yield the complete, well-formed results of a JSONL log one at a time."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Partially written line
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                print(f"Skipping malformed result in {path}: {e}", file=sys.stderr)
+
+
+def _read_legacy(path: str) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Skipping unreadable result {path}: {e}", file=sys.stderr)
+        return None
+    if not isinstance(result, dict) or 'quiz_name' not in result:
+        return None
+    result.setdefault('attempt_id', f"file:{os.path.basename(path)}")
+    return result
+
+
+def iter_results(directory: str = RESULTS_DIR, quiz: Optional[str] = None, student: Optional[str] = None,
+                 since: Optional[str] = None, until: Optional[str] = None) -> Iterator[dict]:
+    """
+    Yield saved results matching the filters, archived results first.
+
+    since and until are inclusive days (YYYY-MM-DD or YYYYMMDD). Archive
+    segments, daily logs and legacy files whose name shows a day outside
+    the range are skipped without being opened.
+    """
+    since, until = normalize_day(since), normalize_day(until)
+    if not os.path.isdir(directory):
+        return
+
+    def in_range(day: Optional[str]) -> bool:
+        return day is None or (since is None or day >= since) and (until is None or day <= until)
+
+    if ResultsArchive.exists(directory):
+        archive = ResultsArchive(directory)
+        try:
+            segments = archive.segments(quiz, since, until)
+        finally:
+            archive.close()
+        for segment in segments:
+            for result in read_segment(segment['path'], 0, segment['length']):
+                if student is None or result.get('student_name') == student:
+                    yield result
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        log = _LOG_NAME.match(name)
+        if log:
+            if not in_range(log.group(1)):
+                continue
+            results = iter_log(path)
+        elif name.endswith('.json'):
+            legacy = _LEGACY_DAY.search(name)
+            if legacy and not in_range(legacy.group(1)):
+                continue
+            result = _read_legacy(path)
+            results = [result] if result is not None else []
+        else:
+            continue
+
+        for result in results:
+            if quiz is not None and result.get('quiz_name') != quiz:
+                continue
+            if student is not None and result.get('student_name') != student:
+                continue
+            if not in_range(str(result.get('completed_at', ''))[:8] or None):
+                continue
+            yield result
+
+
+def _format_time(completed_at: str) -> str:
+    if re.fullmatch(r'\d{8}-\d{6}', completed_at or ''):
+        d, t = completed_at.split('-')
+        return f"{d[:4]}-{d[4:6]}-{d[6:]} {t[:2]}:{t[2:4]}:{t[4:]}"
+    return completed_at
+
+
+def _label(index: Optional[int]) -> Optional[str]:
+    return chr(65 + index) if isinstance(index, int) and 0 <= index < 26 else None
+
+
+class _QuizLookup:
+    """Quizzes by name, looked up once per export."""
+
+    def __init__(self, quizzes: Optional[Mapping]):
+        self.quizzes = quizzes
+        self._cache: Dict[str, object] = {}
+
+    def __call__(self, name: str):
+        if self.quizzes is None:
+            return None
+        if name not in self._cache:
+            self._cache[name] = self.quizzes.get(name)
+        return self._cache[name]
+
+
+def _drawn_question(lookup: _QuizLookup, source: Any):
+    # The question as it was shown in a drawn attempt: from its source quiz, options in the recorded order
+    if not isinstance(source, dict):
+        return None
+    questions = getattr(lookup(source.get('quiz')), 'questions', None)
+    number, order = source.get('question'), source.get('options')
+    if questions is None or not isinstance(number, int) or not 0 <= number < len(questions):
+        return None
+    question = questions[number]
+    if not isinstance(order, list) or sorted(order) != list(range(question.option_count)):
+        return None  # The source quiz changed since the attempt
+    return question.with_options(tuple(order))
+
+
+def iter_rows(results: Iterable[dict], quizzes: Optional[Mapping] = None,
+              per_question: bool = False) -> Iterator[dict]:
+    """
+    Turn results into export rows, one per attempt or one per answer.
+
+    Question text comes from the current version of each quiz in quizzes,
+    and so does correctness unless it was saved with the result. Answers to
+    quizzes that draw questions from pools are joined with the question
+    they were given, as recorded with the result. Quizzes that no longer
+    exist are exported without question text.
+    """
+    lookup = _QuizLookup(quizzes)
+    for result in results:
+        quiz_name = result.get('quiz_name')
+        quiz = lookup(quiz_name)
+        score, total = parse_score(result.get('score', ''))
+        base = {
+            'attempt_id': result.get('attempt_id'),
+            'student_name': result.get('student_name'),
+            'quiz_name': quiz_name,
+            'quiz_title': getattr(quiz, 'title', quiz_name),
+            'completed_at': _format_time(result.get('completed_at')),
+        }
+
+        if not per_question:
+            yield dict(base, score=score, total=total,
+                       percentage=round(100 * score / total, 1) if score is not None and total else None)
+            continue
+
+        questions = getattr(quiz, 'questions', None)
+        drawn = result.get('questions')
+        recorded = result.get('is_correct') or []
+        for number, selected in enumerate(result.get('answers') or []):
+            if isinstance(drawn, list):
+                question = _drawn_question(lookup, drawn[number]) if number < len(drawn) else None
+            else:
+                question = questions[number] if questions is not None and number < len(questions) else None
+            row = dict(base, question=number + 1, question_text=None, selected=_label(selected),
+                       selected_text=None, correct=None, correct_text=None, is_correct=None)
+            if question is not None:
+                row['question_text'] = question.text
+                row['correct'] = _label(question.correct)
+                row['correct_text'] = question.options[question.correct]
+                if isinstance(selected, int) and 0 <= selected < question.option_count:
+                    row['selected_text'] = question.options[selected]
+                    row['is_correct'] = selected == question.correct
+            if number < len(recorded) and recorded[number] is not None:
+                row['is_correct'] = bool(recorded[number])  # As marked when the attempt was taken
+            yield row
+
+
+def _csv_safe(row: dict) -> dict:
+    # Quote text such as a student name of "=HYPERLINK(...)" so it opens as text, not as a formula
+    return {key: f"'{value}" if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES) else value
+            for key, value in row.items()}
+
+
+def write_csv(rows: Iterable[dict], out: TextIO, columns: List[str]) -> int:
+    """Write rows as CSV, returning the number written. Text that would run as a formula is prefixed with '."""
+    writer = csv.DictWriter(out, fieldnames=columns)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(_csv_safe(row))
+        count += 1
+    return count
+
+
+def csv_chunks(rows: Iterable[dict], columns: List[str], rows_per_chunk: int = 500) -> Iterator[str]:
+    """Yield CSV text a chunk of rows at a time, for streaming HTTP responses, quoted as in write_csv()."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(_csv_safe(row))
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _parquet_schema(per_question: bool):
+    common = [('attempt_id', pa.string()), ('student_name', pa.string()), ('quiz_name', pa.string()),
+              ('quiz_title', pa.string()), ('completed_at', pa.string())]
+    if per_question:
+        return pa.schema(common + [
+            ('question', pa.int32()), ('question_text', pa.string()), ('selected', pa.string()),
+            ('selected_text', pa.string()), ('correct', pa.string()), ('correct_text', pa.string()),
+            ('is_correct', pa.bool_())])
+    return pa.schema(common + [('score', pa.int32()), ('total', pa.int32()), ('percentage', pa.float64())])
+
+
+def write_parquet(rows: Iterable[dict], path: str, per_question: bool = False, batch_size: int = 10_000) -> int:
+    """
+    Write rows to a Parquet file in row groups of batch_size, returning the number written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    if pa is None:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema(per_question)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch: List[dict] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or count == 0:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def export(output: str, directory: str = RESULTS_DIR, quizzes: Optional[Mapping] = None,
+           per_question: bool = False, fmt: Optional[str] = None, **filters) -> int:
+    """
+    Export filtered results to a CSV or Parquet file ('-' for CSV on stdout).
+
+    The format follows the file extension unless fmt is given. Returns
+    the number of rows written.
+    """
+    fmt = fmt or ('parquet' if output.endswith('.parquet') else 'csv')
+    rows = iter_rows(iter_results(directory, **filters), quizzes, per_question)
+    columns = ANSWER_COLUMNS if per_question else ATTEMPT_COLUMNS
+
+    if fmt == 'parquet':
+        return write_parquet(rows, output, per_question)
+    if output == '-':
+        return write_csv(rows, sys.stdout, columns)
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        return write_csv(rows, f, columns)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export saved quiz results to CSV or Parquet.")
+    parser.add_argument('output', help="output file (.csv or .parquet), or - for CSV on stdout")
+    parser.add_argument('--results', default=RESULTS_DIR, help="results directory")
+    parser.add_argument('--quiz', help="only this quiz")
+    parser.add_argument('--student', help="only this student")
+    parser.add_argument('--since', help="first day to include (YYYY-MM-DD)")
+    parser.add_argument('--until', help="last day to include (YYYY-MM-DD)")
+    parser.add_argument('--per-question', action='store_true', help="one row per answer instead of per attempt")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="override the format implied by the extension")
+    args = parser.parse_args(argv)
+
+    # Keep the bank's load messages out of CSV written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        from quiz_bank import quiz_data
+
+    count = export(args.output, args.results, quiz_data, per_question=args.per_question, fmt=args.format,
+                   quiz=args.quiz, student=args.student, since=args.since, until=args.until)
+    print(f"Exported {count} rows", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from quiz_results.recorder import RESULTS_DIR
+
+# Returns the correct option index of every question in a quiz, or None if unknown.
+# Only used for results saved before correctness was recorded with each answer.
+AnswerKey = Callable[[str], Optional[Sequence[int]]]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS attempts (
+    attempt_id TEXT PRIMARY KEY,
+    student_name TEXT NOT NULL,
+    quiz_name TEXT NOT NULL,
+    score INTEGER,
+    total INTEGER,
+    completed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_quiz ON attempts (quiz_name);
+CREATE INDEX IF NOT EXISTS attempts_student ON attempts (student_name, completed_at);
+
+CREATE TABLE IF NOT EXISTS answers (
+    attempt_id TEXT NOT NULL,
+    quiz_name TEXT NOT NULL,
+    question INTEGER NOT NULL,
+    selected INTEGER,
+    is_correct INTEGER,
+    source_quiz TEXT,
+    source_question INTEGER,
+    PRIMARY KEY (attempt_id, question)
+);
+CREATE INDEX IF NOT EXISTS answers_quiz ON answers (quiz_name, source_quiz, source_question);
+
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    offset INTEGER NOT NULL
+);
+'''
+# Bumped when the tables change; an older index is dropped and rebuilt from the results by sync()
+SCHEMA_VERSION = 2
+
+
+def parse_score(score: str):
+    """Split a "3/5" score string into (3, 5), or (None, None) if malformed."""
+    try:
+        correct, total = str(score).split('/')
+        return int(correct), int(total)
+    except ValueError:
+        return None, None
+
+
+class ResultsIndex:
+    """
+    SQLite index over saved quiz results.
+
+    New results are ingested as the results writer flushes them, and sync()
+    picks up anything written to the results directory since the last run
+    (per-attempt JSON files and the tail of JSONL logs), so statistics never
+    need a full rescan of the directory.
+    """
+
+    def __init__(self, path: str = os.path.join(RESULTS_DIR, 'index.sqlite3'),
+                 answer_key: Optional[AnswerKey] = None):
+        self.path = path
+        self.answer_key = answer_key
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._migrate()
+
+    def _migrate(self):
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'attempts'").fetchone() is not None:
+                print("Rebuilding the results index for a new schema")
+            self._conn.executescript('DROP TABLE IF EXISTS attempts; DROP TABLE IF EXISTS answers; '
+                                     'DROP TABLE IF EXISTS sources;')
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------------------------------
+    # Ingestion
+    # ---------------------------------------------------
+    def ingest(self, results: Iterable[dict]) -> int:
+        """
+        Add results to the index, ignoring attempts that are already present.
+
+        Returns:
+            The number of new attempts.
+        """
+        added = 0
+        with self._lock, self._conn:
+            for result in results:
+                added += self._insert(result)
+        return added
+
+    def _insert(self, result: dict) -> int:
+        quiz_name = result['quiz_name']
+        score, total = parse_score(result.get('score', ''))
+        cursor = self._conn.execute(
+            'INSERT OR IGNORE INTO attempts VALUES (?, ?, ?, ?, ?, ?)',
+            (result['attempt_id'], result['student_name'], quiz_name,
+             score, total, result['completed_at']))
+        if cursor.rowcount == 0:
+            return 0
+
+        # Correctness as of the quiz version taken, falling back to today's answer key for older results
+        recorded = result.get('is_correct')
+        key = None
+        if recorded is None and self.answer_key:
+            key = self.answer_key(quiz_name)
+        drawn = result.get('questions')
+        rows = []
+        for question, selected in enumerate(result.get('answers', [])):
+            is_correct = None
+            if recorded is not None:
+                if question < len(recorded) and recorded[question] is not None:
+                    is_correct = int(recorded[question])
+            elif key is not None and question < len(key) and selected is not None:
+                is_correct = int(selected == key[question])
+            source_quiz, source_question = _source(quiz_name, question, drawn)
+            rows.append((result['attempt_id'], quiz_name, question, selected, is_correct,
+                         source_quiz, source_question))
+        self._conn.executemany('INSERT OR IGNORE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        return 1
+
+    def sync(self, directory: str = RESULTS_DIR) -> int:
+        """
+        Ingest results saved in directory since the last sync.
+
+        Per-attempt JSON files are read once; JSONL logs and archive
+        segments are read from the offset where the previous sync stopped.
+
+        Returns:
+            The number of new attempts.
+        """
+        if not os.path.isdir(directory):
+            return 0
+
+        with self._lock:
+            known = {row['path']: row for row in self._conn.execute('SELECT * FROM sources')}
+
+        added = 0
+        for entry in os.scandir(directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+                source = known.get(entry.path)
+                if source is not None and source['size'] == stat.st_size and source['mtime'] == stat.st_mtime:
+                    continue
+
+                if entry.name.endswith('.jsonl'):
+                    offset = source['offset'] if source is not None and source['offset'] <= stat.st_size else 0
+                    results, offset = read_log(entry.path, offset)
+                elif entry.name.endswith('.json'):
+                    results, offset = read_attempt_file(entry.path), stat.st_size
+                else:
+                    continue
+            except FileNotFoundError:
+                continue  # Moved into the archive by a compaction
+
+            with self._lock, self._conn:
+                for result in results:
+                    added += self._insert(result)
+                self._conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                                   (entry.path, stat.st_size, stat.st_mtime, offset))
+        return added + self._sync_archive(directory, known)
+
+    def _sync_archive(self, directory: str, known: Dict[str, sqlite3.Row]) -> int:
+        # Segments only grow, so their committed length doubles as the offset
+        from quiz_results.archive import ResultsArchive, read_segment
+
+        if not ResultsArchive.exists(directory):
+            return 0
+        archive = ResultsArchive(directory)
+        try:
+            segments = archive.segments()
+        finally:
+            archive.close()
+
+        added = 0
+        for segment in segments:
+            source = known.get(segment['path'])
+            offset = source['offset'] if source is not None else 0
+            if offset >= segment['length']:
+                continue
+            with self._lock, self._conn:
+                for result in read_segment(segment['path'], offset, segment['length']):
+                    added += self._insert(result)
+                self._conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                                   (segment['path'], segment['length'], 0, segment['length']))
+        return added
+
+    # ---------------------------------------------------
+    # Queries
+    # ---------------------------------------------------
+    def _query(self, sql: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def quiz_summary(self) -> List[Dict]:
+        """Attempt count and average percentage for every quiz."""
+        rows = self._query(
+            'SELECT quiz_name, COUNT(*) AS attempts, '
+            'AVG(CASE WHEN total > 0 THEN 100.0 * score / total END) AS average '
+            'FROM attempts GROUP BY quiz_name ORDER BY quiz_name')
+        return [dict(row) for row in rows]
+
+    def score_distribution(self, quiz_name: str) -> Dict[int, int]:
+        """Map each score to the number of attempts that achieved it."""
+        rows = self._query(
+            'SELECT score, COUNT(*) AS attempts FROM attempts '
+            'WHERE quiz_name = ? AND score IS NOT NULL GROUP BY score ORDER BY score',
+            (quiz_name,))
+        return {row['score']: row['attempts'] for row in rows}
+
+    def question_correctness(self, quiz_name: str) -> List[Dict]:
+        """
+        Answer count, correct count and correctness rate for every question of a quiz.
+
+        Each row has the quiz and question number the answers belong to. For
+        quizzes that draw from question pools these are the source questions
+        recorded with each attempt, whatever position they were shown in.
+        """
+        rows = self._query(
+            'SELECT source_quiz AS quiz, source_question AS question, COUNT(is_correct) AS answered, '
+            'COALESCE(SUM(is_correct), 0) AS correct FROM answers '
+            'WHERE quiz_name = ? AND source_question IS NOT NULL '
+            'GROUP BY source_quiz, source_question ORDER BY source_quiz, source_question',
+            (quiz_name,))
+        return [dict(row, rate=row['correct'] / row['answered'] if row['answered'] else None)
+                for row in rows]
+
+    def student_history(self, student_name: str, limit: int = 50) -> List[Dict]:
+        """Most recent attempts of a student, newest first."""
+        rows = self._query(
+            'SELECT attempt_id, quiz_name, score, total, completed_at FROM attempts '
+            'WHERE student_name = ? ORDER BY completed_at DESC LIMIT ?',
+            (student_name, limit))
+        return [dict(row) for row in rows]
+
+
+def _source(quiz_name: str, question: int, drawn: Any) -> Tuple[Optional[str], Optional[int]]:
+    # The question an answer belongs to; only a drawn attempt's recorded sources say which one that was
+    if drawn is None:
+        return quiz_name, question
+    source = drawn[question] if isinstance(drawn, list) and question < len(drawn) else None
+    if not isinstance(source, dict) or not isinstance(source.get('question'), int):
+        return None, None
+    return source.get('quiz'), source['question']
+
+
+def read_log(path: str, offset: int = 0):
+    """
+    Read complete result lines from a JSONL log starting at offset.
+
+    Returns:
+        The parsed results and the offset just after the last complete line.
+    """
+    results = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Partially written line, picked up by the next sync
+            offset += len(line)
+            try:
+                results.append(json.loads(line))
+            except ValueError as e:
+                print(f"Skipping malformed result in {path}: {e}")
+    return results, offset
+
+
+def read_attempt_file(path: str) -> List[dict]:
+    """Read a legacy per-attempt result file, deriving an attempt_id from its name."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Skipping unreadable result {path}: {e}")
+        return []
+
+    if not isinstance(result, dict) or 'quiz_name' not in result:
+        return []
+    result.setdefault('attempt_id', f"file:{os.path.basename(path)}")
+    return [result]
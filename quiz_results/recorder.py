@@ -1,24 +1,205 @@
+import atexit
 import json
 import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
 from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
 
+from metrics import RESULTS_WRITE_SECONDS, RESULTS_WRITTEN
 
-def save_quiz_result(student_name, quiz_name, answers, score):
-    # Create results directory
-    os.makedirs('results', exist_ok=True)
+RESULTS_DIR = 'results'
 
-    # Generate filename
+
+class ResultsWriter:
+    """
+    Queue quiz results and append them to daily JSONL logs in batches.
+
+    Submitting only puts the result on a queue, so page handlers never wait
+    for disk I/O. A background thread collects whatever is queued (up to
+    batch_size results) and writes it with one open/write/fsync per log file.
+    Results that could not be written (e.g. a full disk) are kept and tried
+    again every retry_interval seconds.
+
+    Results are deduplicated by their attempt_id within this process; the
+    quiz server also marks sessions whose result was saved, which covers
+    restarts and other workers sharing the session store.
+    """
+
+    def __init__(self, directory: str = RESULTS_DIR, batch_size: int = 100,
+                 flush_interval: float = 0.5, max_seen: int = 100_000, retry_interval: float = 5.0):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_seen = max_seen
+        self.retry_interval = retry_interval
+        self._queue: 'queue.Queue[Optional[dict]]' = queue.Queue()
+        self._seen: 'OrderedDict[str, None]' = OrderedDict()  # Written
+        self._pending = set()  # Queued, or waiting to be tried again
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[List[dict]], None]] = []
+
+    def add_listener(self, callback: Callable[[List[dict]], None]):
+        """Call callback with every batch after it has been written."""
+        self._listeners.append(callback)
+
+    def submit(self, result: dict) -> bool:
+        """
+        Queue a result for writing.
+
+        Returns:
+            False if a result with the same attempt_id was already submitted.
+        """
+        attempt_id = result['attempt_id']
+        with self._lock:
+            if attempt_id in self._seen or attempt_id in self._pending:
+                return False
+            self._pending.add(attempt_id)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='results-writer', daemon=True)
+                self._thread.start()
+
+        self._queue.put(result)
+        return True
+
+    def flush(self):
+        """Block until every queued result has been written, or failed to be and waits to be tried again."""
+        self._queue.join()
+
+    def close(self):
+        """Write everything still queued and stop the background thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        failed: List[dict] = []
+        while True:
+            batch, stop = self._collect(self.retry_interval if failed else None)
+            try:
+                failed = self._write_batch(failed + batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                if failed:
+                    # Last resort, so the results can still be recovered from the server log
+                    print(f"Could not save {len(failed)} quiz results before stopping:")
+                    for result in failed:
+                        print(json.dumps(result))
+                return
+
+    def _collect(self, timeout: Optional[float]) -> Tuple[List[dict], bool]:
+        # Wait up to timeout for a result, then take what else arrives within flush_interval
+        batch: List[dict] = []
+        try:
+            item = self._queue.get(timeout=timeout)
+            while True:
+                if item is None:
+                    self._queue.task_done()
+                    return batch, True
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            pass
+        return batch, False
+
+    def _write_batch(self, batch: List[dict]) -> List[dict]:
+        """Append results to their daily logs, returning those that could not be written."""
+        by_file: Dict[str, List[dict]] = {}
+        for result in batch:
+            day = result['completed_at'][:8]
+            by_file.setdefault(log_path(self.directory, day), []).append(result)
+
+        written: List[dict] = []
+        failed: List[dict] = []
+        with RESULTS_WRITE_SECONDS.time():
+            for path, results in by_file.items():
+                try:
+                    self._append(path, results)
+                    written.extend(results)
+                except OSError as e:
+                    print(f"Failed to save {len(results)} quiz results, retrying in {self.retry_interval}s: {e}")
+                    failed.extend(results)
+        if not written:
+            return failed
+
+        with self._lock:
+            for result in written:
+                self._pending.discard(result['attempt_id'])
+                self._seen[result['attempt_id']] = None
+            while len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+        RESULTS_WRITTEN.inc(len(written))
+
+        for callback in self._listeners:
+            try:
+                callback(written)
+            except Exception as e:
+                print(f"Results listener failed: {e}")
+        return failed
+
+    def _append(self, path: str, results: List[dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            start = f.tell()
+            try:
+                f.write(''.join(json.dumps(result) + '\n' for result in results))
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError:
+                f.truncate(start)  # Don't leave half a line for the retry to append to
+                raise
+
+
+def log_path(directory: str, day: str) -> str:
+    """Return the JSONL log holding results completed on day (YYYYMMDD)."""
+    return os.path.join(directory, f"results_{day}.jsonl")
+
+
+# Shared writer used by the quiz server
+results_writer = ResultsWriter()
+atexit.register(results_writer.close)
+
+
+def save_quiz_result(student_name, quiz_name, answers, score, attempt_id=None, is_correct=None,
+                     quiz_fingerprint=None, questions=None):
+    """
+    Queue a finished attempt for saving without blocking the caller.
+
+    is_correct and quiz_fingerprint record whether each answer was right and
+    which version of the quiz was taken, so statistics don't depend on the
+    quiz file as it is later. For a quiz drawn from question pools,
+    questions records the quiz, question and option order behind each
+    answer. Saving the same attempt_id twice in one
+    process (e.g. when /results is reloaded) is a no-op. Returns True if
+    the result was queued.
+    """
     timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-    filename = f"results/{quiz_name}_{student_name}_{timestamp}.json"
 
-    # Save result
     result = {
+        'attempt_id': attempt_id or str(uuid.uuid4()),
         'student_name': student_name,
         'quiz_name': quiz_name,
         'answers': answers,
         'score': score,
         'completed_at': timestamp
     }
+    if is_correct is not None:
+        result['is_correct'] = is_correct
+    if quiz_fingerprint is not None:
+        result['quiz_fingerprint'] = quiz_fingerprint
+    if questions is not None:
+        result['questions'] = questions
 
-    with open(filename, 'w') as f:
-        json.dump(result, f)
\ No newline at end of file
+    return results_writer.submit(result)
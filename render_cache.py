@@ -0,0 +1,122 @@
+# render_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+import markdown2
+from nicegui.helpers import remove_indentation
+
+# Extras used for all quiz content (questions, options and explanations)
+DEFAULT_EXTRAS = ('latex',)
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of Markdown+LaTeX converted to HTML.
+
+    Entries are keyed by a hash of the content and the markdown extras, so
+    identical strings are converted only once no matter how many students
+    view them. Each entry can be tagged with the quiz it belongs to, which
+    allows dropping everything for a quiz when its file changes.
+
+    ui.markdown already memoizes its conversion, but in one unlabelled
+    cache of 1000 entries. This one can be sized for a whole quiz bank,
+    reports its hit rate, drops a reloaded quiz's stale HTML instead of
+    waiting for it to age out, and is filled by the prefetch of the next
+    question. Its HTML is shown with ui.html, which also saves registering
+    the code highlighting stylesheet for every Markdown element on a page.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[str, Optional[str]]]' = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(content: str, extras: Sequence[str] = DEFAULT_EXTRAS) -> str:
+        """Return the content hash used as the cache key."""
+        digest = hashlib.sha256()
+        digest.update(' '.join(extras).encode())
+        digest.update(b'\0')
+        digest.update(content.encode())
+        return digest.hexdigest()
+
+    def render(self, content: str, quiz: Optional[str] = None,
+               extras: Sequence[str] = DEFAULT_EXTRAS) -> str:
+        """Return the HTML for content, converting it on first use."""
+        key = self.make_key(content, extras)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Convert outside the lock so other pages are not blocked meanwhile
+        html = markdown2.markdown(remove_indentation(content), extras=list(extras))
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (html, quiz)
+                if quiz is not None:
+                    self._tags.setdefault(quiz, set()).add(key)
+                self._evict()
+        return html
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, (_, quiz) = self._entries.popitem(last=False)
+            self._untag(key, quiz)
+            self.evictions += 1
+
+    def _untag(self, key: str, quiz: Optional[str]):
+        if quiz is None:
+            return
+        keys = self._tags.get(quiz)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[quiz]
+
+    def invalidate(self, quiz: Optional[str] = None) -> int:
+        """
+        Drop cached HTML for a quiz, or everything if no quiz is given.
+
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            if quiz is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._tags.clear()
+                return removed
+
+            keys = self._tags.pop(quiz, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current size."""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# Shared cache used by the quiz pages
+markdown_cache = RenderCache(max_entries=int(os.environ.get('RENDER_CACHE_SIZE', '5000')))
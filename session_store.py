@@ -0,0 +1,351 @@
+# session_store.py
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from quiz_model import Quiz
+
+
+class QuizSession:
+    __slots__ = ('session_id', 'student_name', 'current_quiz', 'quiz', 'current_question', 'score', 'answers',
+                 'start_time', 'quiz_completed', 'selected_answer', 'attempt_id', 'result_saved', 'drawn')
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.student_name = None
+        self.current_quiz = None
+        self.quiz = None  # Version of the quiz pinned for the current attempt
+        self.current_question = 0
+        self.score = 0
+        self.answers = []  # (question index, selected option) pairs
+        self.start_time = None
+        self.quiz_completed = False
+        self.selected_answer = None
+        self.attempt_id = None
+        self.result_saved = False  # Set once the finished attempt was queued for saving
+        self.drawn = None  # Where each question of a drawn quiz came from, see PoolIndex.sample_with_sources()
+
+    def to_dict(self) -> dict:
+        """Return the session as JSON-serializable data, referencing the quiz by fingerprint."""
+        return {
+            'student_name': self.student_name,
+            'current_quiz': self.current_quiz,
+            'quiz_fingerprint': self.quiz.fingerprint if self.quiz is not None else None,
+            'current_question': self.current_question,
+            'score': self.score,
+            'answers': self.answers,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'quiz_completed': self.quiz_completed,
+            'attempt_id': self.attempt_id,
+            'result_saved': self.result_saved,
+            'drawn': self.drawn,
+        }
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: dict, quiz: Optional[Quiz]) -> 'QuizSession':
+        """Rebuild a session from to_dict() data and its resolved quiz."""
+        session = cls(session_id)
+        session.student_name = data.get('student_name')
+        session.current_quiz = data['current_quiz']
+        session.quiz = quiz
+        session.current_question = data['current_question']
+        session.score = data['score']
+        session.answers = [tuple(answer) for answer in data['answers']]
+        session.start_time = datetime.fromisoformat(data['start_time']) if data['start_time'] else None
+        session.quiz_completed = data['quiz_completed']
+        session.attempt_id = data['attempt_id']
+        session.result_saved = data.get('result_saved', False)
+        session.drawn = data.get('drawn')
+        return session
+
+
+class SessionBackend(ABC):
+    """
+    Interface of session stores.
+
+    Pages get a session with get_or_create(), change it and hand it back with
+    save() so that stores outside the process see the change.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[QuizSession]:
+        """Return the session, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def get_or_create(self, session_id: str) -> QuizSession:
+        """Return the session, creating a new one if needed."""
+
+    @abstractmethod
+    def save(self, session: QuizSession):
+        """Store changes made to a session."""
+
+    @abstractmethod
+    def remove(self, session_id: str):
+        """Forget a session."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Return the number of live sessions and lifetime counters."""
+
+
+class SessionStore(SessionBackend):
+    """
+    Quiz sessions by session ID, bounded by idle time and count.
+
+    Sessions are kept in least-recently-used order, so expired sessions are
+    always at the front and are dropped as new requests come in. When the
+    store is full, the least recently used session is evicted.
+    """
+
+    def __init__(self, max_sessions: int = 10_000, ttl: float = 4 * 3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: 'OrderedDict[str, QuizSession]' = OrderedDict()
+        self._last_seen = {}
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __contains__(self, session_id) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sessions)
+
+    def get(self, session_id: str) -> Optional[QuizSession]:
+        """Return the session and mark it as used, or None if it is unknown or expired."""
+        self.purge_expired()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            self._last_seen[session_id] = time.monotonic()
+        return session
+
+    def get_or_create(self, session_id: str) -> QuizSession:
+        """Return the session, creating a new one if needed."""
+        session = self.get(session_id)
+        if session is None:
+            session = QuizSession(session_id)
+            self._sessions[session_id] = session
+            self._last_seen[session_id] = time.monotonic()
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._remove_oldest()
+                self.evicted += 1
+        return session
+
+    def save(self, session: QuizSession):
+        """Nothing to do, sessions are changed in place."""
+
+    def remove(self, session_id: str):
+        """Forget a session."""
+        self._sessions.pop(session_id, None)
+        self._last_seen.pop(session_id, None)
+
+    def purge_expired(self) -> int:
+        """Drop sessions idle for longer than the TTL and return how many were dropped."""
+        deadline = time.monotonic() - self.ttl
+        purged = 0
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if self._last_seen[oldest] > deadline:
+                break
+            self._remove_oldest()
+            purged += 1
+        self.expired += purged
+        return purged
+
+    def _remove_oldest(self):
+        session_id, _ = self._sessions.popitem(last=False)
+        del self._last_seen[session_id]
+
+    def stats(self) -> dict:
+        """Return the number of live sessions and lifetime counters."""
+        return {
+            'live': len(self._sessions),
+            'created': self.created,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    quiz_fingerprint TEXT,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+
+CREATE TABLE IF NOT EXISTS quizzes (
+    fingerprint TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+'''
+
+
+class SqliteSessionStore(SessionBackend):
+    """
+    Quiz sessions in a SQLite database shared by several server processes.
+
+    The database runs in WAL mode, so readers in one process don't block
+    writers in another. Each session row references its pinned quiz by
+    fingerprint; every quiz version in use is stored once in the quizzes
+    table, so any process can rebuild the exact version an attempt started
+    with even if the file has changed since. Idle and excess sessions are
+    purged periodically, oldest first, on a background thread.
+
+    Pages call the store on the event loop, so a statement waits at most
+    busy_timeout seconds for another process's write before it is tried
+    again, up to retries times, instead of blocking every page meanwhile.
+    """
+
+    def __init__(self, path: str, quizzes: Mapping, max_sessions: int = 10_000,
+                 ttl: float = 4 * 3600, purge_interval: float = 60, busy_timeout: float = 0.05,
+                 retries: int = 3):
+        self.path = path
+        self.quizzes = quizzes
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.retries = retries
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self._pinned: 'OrderedDict[str, Quiz]' = OrderedDict()
+        self._next_purge = 0.0
+        self._purging = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SQLITE_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _run(self, statements: Callable[[sqlite3.Connection], Any], transaction: bool = False) -> Any:
+        # Other threads of this process get the connection between tries
+        for attempt in range(self.retries + 1):
+            try:
+                with self._lock:
+                    if not transaction:
+                        return statements(self._conn)
+                    with self._conn:
+                        return statements(self._conn)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or attempt == self.retries:
+                    raise
+
+    def _resolve_quiz(self, name: Optional[str], fingerprint: Optional[str]) -> Optional[Quiz]:
+        if fingerprint is None:
+            return None
+
+        quiz = self._pinned.get(fingerprint)
+        if quiz is None:
+            current = self.quizzes.get(name) if name is not None else None
+            if current is not None and current.fingerprint == fingerprint:
+                quiz = current
+            else:
+                row = self._run(lambda conn: conn.execute('SELECT name, data FROM quizzes WHERE fingerprint = ?',
+                                                          (fingerprint,)).fetchone())
+                if row is None:
+                    return None
+                quiz = Quiz.from_dict(row[0], json.loads(row[1]))
+            self._pinned[fingerprint] = quiz
+            while len(self._pinned) > 64:
+                self._pinned.popitem(last=False)
+        return quiz
+
+    def get(self, session_id: str) -> Optional[QuizSession]:
+        self._maybe_purge()
+        row = self._run(lambda conn: conn.execute('SELECT data FROM sessions WHERE session_id = ? AND last_seen > ?',
+                                                  (session_id, time.time() - self.ttl)).fetchone())
+        if row is None:
+            return None
+
+        data = json.loads(row[0])
+        quiz = self._resolve_quiz(data['current_quiz'], data['quiz_fingerprint'])
+        return QuizSession.from_dict(session_id, data, quiz)
+
+    def get_or_create(self, session_id: str) -> QuizSession:
+        session = self.get(session_id)
+        if session is None:
+            session = QuizSession(session_id)
+            self.save(session)
+            self.created += 1
+        return session
+
+    def save(self, session: QuizSession):
+        data = session.to_dict()
+        fingerprint = data['quiz_fingerprint']
+
+        def write(conn: sqlite3.Connection):
+            if fingerprint is not None and conn.execute(
+                    'SELECT 1 FROM quizzes WHERE fingerprint = ?', (fingerprint,)).fetchone() is None:
+                conn.execute('INSERT INTO quizzes VALUES (?, ?, ?)',
+                             (fingerprint, session.quiz.name, json.dumps(session.quiz.to_dict())))
+            conn.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)',
+                         (session.session_id, json.dumps(data), fingerprint, time.time()))
+
+        self._run(write, transaction=True)
+
+    def remove(self, session_id: str):
+        self._run(lambda conn: conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,)),
+                  transaction=True)
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now >= self._next_purge and not self._purging:
+            self._next_purge = now + self.purge_interval
+            self._purging = True
+            threading.Thread(target=self._purge_in_background, name='session-purge', daemon=True).start()
+
+    def _purge_in_background(self):
+        try:
+            self.purge_expired()
+        except sqlite3.Error as e:
+            print(f"Could not purge sessions, trying again in {self.purge_interval}s: {e}")
+        finally:
+            self._purging = False
+
+    def purge_expired(self) -> int:
+        """Drop idle and excess sessions, and quiz versions no session uses any more."""
+        def purge(conn: sqlite3.Connection) -> Tuple[int, int]:
+            expired = conn.execute('DELETE FROM sessions WHERE last_seen <= ?', (time.time() - self.ttl,)).rowcount
+            evicted = conn.execute(
+                'DELETE FROM sessions WHERE session_id IN '
+                '(SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)',
+                (self.max_sessions,)).rowcount
+            conn.execute('DELETE FROM quizzes WHERE fingerprint NOT IN '
+                         '(SELECT quiz_fingerprint FROM sessions WHERE quiz_fingerprint IS NOT NULL)')
+            return expired, evicted
+
+        expired, evicted = self._run(purge, transaction=True)
+        self.expired += expired
+        self.evicted += evicted
+        return expired + evicted
+
+    def __len__(self) -> int:
+        return self._run(lambda conn: conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0])
+
+    def stats(self) -> dict:
+        return {
+            'live': len(self),
+            'created': self.created,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
@@ -0,0 +1,71 @@
+import asyncio
+
+from ai_quiz_generator import FakeAsyncOpenAI, FakeOpenAI, QuestionStreamParser, QuizGenerator
+from quiz_bank import load_quiz_file
+
+
+def make_generator(tmp_path, **clients):
+    knowledge_base = tmp_path / "kb.md"
+    knowledge_base.write_text("# Fractions\nA fraction is a part of a whole.\n")
+    return QuizGenerator(cache_dir=str(tmp_path / "cache"), knowledge_base_path=str(knowledge_base), **clients)
+
+
+def test_batch_generation_retries_and_keeps_order(tmp_path):
+    """
+    Batch generation should retry failed requests and return quizzes in instruction order.
+    """
+    client = FakeAsyncOpenAI(fail_first=2)
+    generator = make_generator(tmp_path, async_client=client)
+    instructions = [f"topic {i}" for i in range(5)]
+
+    quizzes = asyncio.run(generator.generate_quizzes(instructions, concurrency=2, backoff=0.01))
+
+    assert [quiz['questions'][0]['question'] for quiz in quizzes] == \
+        [f"Question 1 about topic {i}?" for i in range(5)]
+    assert client.calls == 7
+
+
+def test_generated_quizzes_are_cached_on_disk(tmp_path):
+    """
+    Repeating an instruction should be served from the cache, also by a new generator.
+    """
+    client = FakeOpenAI()
+    first = make_generator(tmp_path, client=client).generate_quiz("fractions")
+    second = make_generator(tmp_path, client=client).generate_quiz("fractions")
+    assert first == second
+    assert client.calls == 1
+
+    other = make_generator(tmp_path, client=client)
+    other.temperature = 0.2
+    other.generate_quiz("fractions")
+    assert client.calls == 2
+
+
+def test_stream_parser_yields_questions_as_they_complete():
+    """
+    The stream parser should return each question once its object closes and skip malformed ones.
+    """
+    parser = QuestionStreamParser()
+    document = ('{"title": "Cells \\"101\\"", "questions": [{"question": "Has {braces}?", "options": []},'
+                ' {"question": broken}, {"question": "Last"}]}')
+    pieces = [parser.feed(document[i:i + 7]) for i in range(0, len(document), 7)]
+
+    found = [question for piece in pieces for question in piece]
+    assert parser.title == 'Cells "101"'
+    assert [question['question'] for question in found] == ["Has {braces}?", "Last"]
+    assert len(parser.errors) == 1
+    assert pieces.index([found[0]]) < len(pieces) - 1
+
+
+def test_stream_to_quiz_bank_writes_a_loadable_quiz(tmp_path):
+    """
+    Streaming into the quiz bank should produce a file the quiz bank can load.
+    """
+    generator = make_generator(tmp_path, client=FakeOpenAI(questions=4))
+    quiz = generator.stream_to_quiz_bank("fractions", "fractions", directory=str(tmp_path))
+
+    loaded = load_quiz_file(str(tmp_path / "fractions.json"))
+    assert loaded.to_dict() == quiz.to_dict()
+    assert loaded.title == "Quiz: fractions"
+    assert loaded.answer_key == (0, 1, 2, 3)
+    assert loaded.questions[0].options == ("Option A", "Option B", "Option C", "Option D")
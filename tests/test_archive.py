@@ -0,0 +1,94 @@
+import json
+import os
+from datetime import datetime
+
+from quiz_results.archive import ResultsArchive
+from quiz_results.export import iter_results
+from quiz_results.index import ResultsIndex
+
+
+def result(attempt_id, quiz_name, completed_at, student_name='Ann'):
+    return {'attempt_id': attempt_id, 'student_name': student_name, 'quiz_name': quiz_name,
+            'answers': [0, 1], 'score': '1/2', 'completed_at': completed_at}
+
+
+def make_results(directory):
+    directory.mkdir()
+    old = [result(f'a{i}', 'algebra' if i % 2 else 'geometry', '20250902-101500') for i in range(600)]
+    (directory / 'results_20250902.jsonl').write_text(''.join(json.dumps(r) + '\n' for r in old))
+    (directory / 'algebra_Cat_20250902-120000.json').write_text(json.dumps(
+        {'student_name': 'Cat', 'quiz_name': 'algebra', 'answers': [0, 0], 'score': '2/2',
+         'completed_at': '20250902-120000'}))
+    (directory / 'results_20251001.jsonl').write_text(json.dumps(result('fresh', 'algebra', '20251001-090000')) + '\n')
+
+
+def test_old_results_are_compacted_into_segments(tmp_path):
+    """
+    Old logs and legacy files should move into per-quiz segments and still be found.
+    """
+    make_results(tmp_path / 'results')
+    directory = str(tmp_path / 'results')
+    archive = ResultsArchive(directory)
+
+    stats = archive.compact(older_than_days=7, today=datetime(2025, 10, 2))
+    assert stats == {'files': 2, 'results': 601, 'duplicates': 0, 'unreadable': 0}
+    assert sorted(os.listdir(directory)) == ['archive', 'results_20251001.jsonl']
+    assert [(s['quiz_name'], s['records']) for s in archive.segments()] == [('algebra', 301), ('geometry', 300)]
+
+    assert archive.get('a599')['quiz_name'] == 'algebra'
+    assert archive.get('file:algebra_Cat_20250902-120000.json')['student_name'] == 'Cat'
+    assert archive.get('missing') is None
+    assert archive.get('fresh')['completed_at'] == '20251001-090000'  # Not compacted yet
+    assert len(list(archive.scan(quiz='geometry'))) == 300
+
+    # Readers see the archive and the fresh log as one set of results
+    assert len(list(iter_results(directory))) == 602
+    assert [r['attempt_id'] for r in iter_results(directory, student='Cat')] == ['file:algebra_Cat_20250902-120000.json']
+    index = ResultsIndex(str(tmp_path / 'index.sqlite3'))
+    assert index.sync(directory) == 602
+    assert index.sync(directory) == 0
+    archive.close()
+    index.close()
+
+
+def test_interrupted_compaction_is_not_duplicated(tmp_path):
+    """
+    Bytes past a segment's committed length should be ignored and overwritten.
+    """
+    make_results(tmp_path / 'results')
+    directory = str(tmp_path / 'results')
+    archive = ResultsArchive(directory)
+    archive.compact(older_than_days=7, today=datetime(2025, 10, 2))
+
+    segment = archive.segments(quiz='algebra')[0]
+    with open(segment['path'], 'ab') as f:
+        f.write(b'\x1f\x8b half written block')
+    (tmp_path / 'results' / 'results_20250902.jsonl').write_text(
+        json.dumps(result('a1', 'algebra', '20250902-101500')) + '\n' +
+        json.dumps(result('late', 'algebra', '20250902-180000')) + '\n')
+
+    stats = archive.compact(older_than_days=7, today=datetime(2025, 10, 2))
+    assert stats == {'files': 1, 'results': 1, 'duplicates': 1, 'unreadable': 0}
+    assert len(list(archive.scan(quiz='algebra'))) == 302
+    assert archive.get('late')['completed_at'] == '20250902-180000'
+    archive.close()
+
+
+def test_unreadable_files_are_moved_aside(tmp_path):
+    """
+    Files compaction can't read in full should be quarantined with nothing lost, not deleted.
+    """
+    directory = tmp_path / 'results'
+    directory.mkdir()
+    (directory / 'q_a_20200101-120000.json').write_text('{"student_name": "Ann", "quiz_na')
+    (directory / 'results_20200101.jsonl').write_text(
+        json.dumps(result('kept', 'algebra', '20200101-090000')) + '\n{"attempt_id": "cut off"')
+    (directory / 'results_20200102.jsonl').write_text(json.dumps(result('ok', 'algebra', '20200102-090000')) + '\n')
+    archive = ResultsArchive(str(directory))
+
+    stats = archive.compact(older_than_days=7, today=datetime(2020, 2, 1))
+    assert stats == {'files': 1, 'results': 1, 'duplicates': 0, 'unreadable': 2}
+    assert sorted(os.listdir(directory / 'archive' / 'unreadable')) == ['q_a_20200101-120000.json',
+                                                                         'results_20200101.jsonl']
+    assert archive.get('ok') is not None and archive.get('kept') is None
+    archive.close()
@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+
+import auth
+
+
+def test_legacy_hash_is_upgraded_on_login(monkeypatch):
+    """
+    A user with an unsalted SHA-256 hash should be rehashed with PBKDF2 after
+    logging in, and still be able to log in afterwards.
+    """
+    monkeypatch.setattr(auth, 'PBKDF2_ITERATIONS', 1000)
+    monkeypatch.setitem(auth.USERS, 'alex', {
+        'password_hash': hashlib.sha256('secret'.encode()).hexdigest(), 'role': 'user'})
+
+    assert asyncio.run(auth.authenticate_async('alex', 'secret'))
+    assert auth.USERS['alex']['password_hash'].startswith('pbkdf2_sha256$1000$')
+    assert auth.authenticate('alex', 'secret')
+    assert not asyncio.run(auth.authenticate_async('alex', 'wrong'))
+    assert not asyncio.run(auth.authenticate_async('nobody', 'secret'))
+
+
+def test_salted_hashes_differ():
+    """
+    The same password should hash differently for every user.
+    """
+    first = auth.hash_password('secret', iterations=1000)
+    second = auth.hash_password('secret', iterations=1000)
+    assert first != second
+    assert auth.verify_password('secret', first)[0]
+    assert auth.verify_password('other', first) == (False, False)
+
+
+def test_failed_logins_take_a_key_derivation(monkeypatch):
+    """
+    Unknown users and wrong passwords of legacy users should both cost a PBKDF2 at the configured iterations.
+    """
+    monkeypatch.setattr(auth, 'PBKDF2_ITERATIONS', 1000)
+    monkeypatch.setitem(auth.USERS, 'alex', {
+        'password_hash': hashlib.sha256('secret'.encode()).hexdigest(), 'role': 'user'})
+    checked = []
+    verify = auth.verify_password
+
+    def recording_verify(password, stored):
+        checked.append(stored)
+        return verify(password, stored)
+
+    monkeypatch.setattr(auth, 'verify_password', recording_verify)
+
+    assert not auth._check_credentials('nobody', 'secret')
+    assert not auth._check_credentials('alex', 'wrong')
+    assert [stored.split('$')[:2] for stored in checked if stored.startswith('pbkdf2')] == \
+        [['pbkdf2_sha256', '1000'], ['pbkdf2_sha256', '1000']]
+
+
+def test_only_teachers_and_admins_have_the_teacher_role(monkeypatch):
+    """
+    Teacher pages should need a login as a teacher or admin, and only return to paths on this server.
+    """
+    monkeypatch.setitem(auth.USERS, 'alex', {'password_hash': '', 'role': 'user'})
+    monkeypatch.setitem(auth.USERS, 'kim', {'password_hash': '', 'role': 'teacher'})
+    user = {}
+    monkeypatch.setattr(auth, 'is_authenticated', lambda: user.get('authenticated', False))
+    monkeypatch.setattr(auth, 'get_current_user', lambda: user.get('username'))
+
+    assert not auth.has_role(auth.TEACHER_ROLES)
+    user.update(username='alex', authenticated=True)
+    assert not auth.has_role(auth.TEACHER_ROLES)
+    user['username'] = 'kim'
+    assert auth.has_role(auth.TEACHER_ROLES)
+
+    assert auth.safe_next_page('/teacher') == '/teacher'
+    assert auth.safe_next_page('//evil.example') == '/'
+    assert auth.safe_next_page('https://evil.example') == '/'
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+
+import pytest
+
+from quiz_model import Quiz
+from quiz_results.export import export, csv_chunks, iter_results, iter_rows, write_csv, ANSWER_COLUMNS, ATTEMPT_COLUMNS
+
+
+def make_results(directory):
+    directory.mkdir()
+    lines = [
+        {'attempt_id': 'a1', 'student_name': 'Ann', 'quiz_name': 'algebra', 'answers': [0, 1],
+         'score': '1/2', 'completed_at': '20250902-101500'},
+        {'attempt_id': 'a2', 'student_name': 'Ben', 'quiz_name': 'algebra', 'answers': [0, 0],
+         'score': '2/2', 'completed_at': '20250902-103000'},
+    ]
+    (directory / 'results_20250902.jsonl').write_text(''.join(json.dumps(line) + '\n' for line in lines))
+    (directory / 'results_20251001.jsonl').write_text(json.dumps(
+        {'attempt_id': 'a3', 'student_name': 'Ann', 'quiz_name': 'algebra', 'answers': [1, 1],
+         'score': '0/2', 'completed_at': '20251001-090000'}) + '\n{"partial')
+    (directory / 'algebra_Cat_20250815-120000.json').write_text(json.dumps(
+        {'student_name': 'Cat', 'quiz_name': 'algebra', 'answers': [0, 0], 'score': '2/2',
+         'completed_at': '20250815-120000'}))
+
+
+QUIZZES = {'algebra': Quiz.from_dict('algebra', {'title': 'Algebra', 'questions': [
+    {'question': '1 + 1?', 'options': ['2', '3'], 'correct': 0},
+    {'question': '2 + 2?', 'options': ['4', '5'], 'correct': 0},
+]})}
+
+
+def test_results_are_filtered_by_student_and_days(tmp_path):
+    """
+    Filters should combine, covering JSONL logs and legacy per-attempt files.
+    """
+    make_results(tmp_path / 'results')
+    directory = str(tmp_path / 'results')
+
+    assert [r['attempt_id'] for r in iter_results(directory)] == ['file:algebra_Cat_20250815-120000.json',
+                                                                  'a1', 'a2', 'a3']
+    assert [r['attempt_id'] for r in iter_results(directory, student='Ann')] == ['a1', 'a3']
+    assert [r['attempt_id'] for r in iter_results(directory, since='2025-09-01', until='2025-09-30')] == ['a1', 'a2']
+    with pytest.raises(ValueError):
+        list(iter_results(directory, since='September'))
+
+
+def test_per_question_rows_join_the_quiz(tmp_path):
+    """
+    Per-question rows should carry question text, option text and correctness.
+    """
+    make_results(tmp_path / 'results')
+    rows = iter_rows(iter_results(str(tmp_path / 'results'), student='Ann', until='20250930'),
+                     QUIZZES, per_question=True)
+    out = io.StringIO()
+    assert write_csv(rows, out, ANSWER_COLUMNS) == 2
+
+    second = list(csv.DictReader(io.StringIO(out.getvalue())))[1]
+    assert second['quiz_title'] == 'Algebra'
+    assert second['completed_at'] == '2025-09-02 10:15:00'
+    assert (second['question_text'], second['selected_text'], second['correct_text'], second['is_correct']) == \
+        ('2 + 2?', '5', '4', 'False')
+
+
+def test_parquet_export(tmp_path):
+    """
+    Parquet export should write typed attempt rows.
+    """
+    pq = pytest.importorskip('pyarrow.parquet')
+    make_results(tmp_path / 'results')
+    path = str(tmp_path / 'out.parquet')
+
+    assert export(path, str(tmp_path / 'results'), QUIZZES, quiz='algebra') == 4
+    table = pq.read_table(path)
+    assert table.column('percentage').to_pylist() == [100.0, 50.0, 100.0, 0.0]
+    assert table.schema.field('score').type == 'int32'
+
+
+def test_drawn_answers_are_joined_with_the_questions_given(tmp_path):
+    """
+    Answers to a drawn attempt should be exported with the source question in its shown option order.
+    """
+    results = [{'attempt_id': 'd1', 'student_name': 'Ann', 'quiz_name': 'exam', 'answers': [0, 1],
+                'score': '1/2', 'completed_at': '20250902-101500', 'is_correct': [False, True],
+                'questions': [{'quiz': 'algebra', 'question': 1, 'options': [1, 0]},
+                              {'quiz': 'algebra', 'question': 0, 'options': [1, 0]}]}]
+    first, second = iter_rows(results, QUIZZES, per_question=True)
+
+    assert (first['question_text'], first['selected_text'], first['correct'], first['is_correct']) == \
+        ('2 + 2?', '5', 'B', False)
+    assert (second['question_text'], second['selected_text'], second['is_correct']) == ('1 + 1?', '2', True)
+
+
+def test_formula_cells_are_written_as_text():
+    """
+    Student-entered text starting a spreadsheet formula should be prefixed so it opens as text.
+    """
+    rows = [{'attempt_id': 'a1', 'student_name': '=HYPERLINK("http://x")', 'quiz_name': '@sum',
+             'quiz_title': 'Algebra', 'completed_at': '2025-09-02 10:15:00', 'score': -1, 'total': 2, 'percentage': None}]
+    out = io.StringIO()
+    write_csv(rows, out, ATTEMPT_COLUMNS)
+    written = list(csv.DictReader(io.StringIO(out.getvalue())))[0]
+    streamed = list(csv.DictReader(io.StringIO(''.join(csv_chunks(rows, ATTEMPT_COLUMNS)))))[0]
+
+    for row in (written, streamed):
+        assert row['student_name'] == '\'=HYPERLINK("http://x")'
+        assert (row['quiz_name'], row['quiz_title'], row['score']) == ("'@sum", 'Algebra', '-1')
@@ -0,0 +1,102 @@
+import pytest
+
+from image_pipeline import ImagePipeline, etag_matches
+
+
+def test_images_outside_static_keep_their_url(tmp_path):
+    """
+    External and missing images should be used as they are, still lazy loaded.
+    """
+    pipeline = ImagePipeline(source_dir=str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    assert pipeline.info("https://example.com/a.png").src == "https://example.com/a.png"
+    assert pipeline.source_path("/static/../secret.png") is None
+
+    tag = pipeline.img_tag("/static/missing.png", 'A "diagram"')
+    assert 'src="/static/missing.png"' in tag
+    assert 'alt="A &quot;diagram&quot;"' in tag
+    assert 'loading="lazy"' in tag and 'srcset' not in tag
+
+    preload = pipeline.preload_tag("/static/missing.png")
+    assert 'src="/static/missing.png"' in preload and 'display: none' in preload
+    assert 'loading="lazy"' not in preload
+
+
+def test_variants_are_resized_and_content_addressed(tmp_path):
+    """
+    Large images should get width-limited variants whose names change with the content.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "static"
+    source.mkdir()
+    Image.new("RGB", (800, 400), "white").save(source / "diagram.png")
+    pipeline = ImagePipeline(source_dir=str(source), cache_dir=str(tmp_path / "cache"))
+
+    info = pipeline.info("/static/diagram.png")
+    assert [width for _, width in info.srcset] == [320, 640, 800]
+    assert (info.width, info.height) == (800, 400)
+    name = info.srcset[0][0].rsplit("/", 1)[1]
+    with Image.open(pipeline.variant_path(name)) as variant:
+        assert variant.size == (320, 160)
+    assert pipeline.variant_path("../diagram.png") is None
+
+    Image.new("RGB", (800, 400), "black").save(source / "diagram.png")
+    assert pipeline.info("/static/diagram.png").src != info.src
+
+
+def test_images_wider_than_the_largest_width_get_each_variant_once(tmp_path):
+    """
+    An image wider than every width should get one variant per width, without a duplicate largest one.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "static"
+    source.mkdir()
+    Image.new("RGB", (1200, 600), "white").save(source / "wide.png")
+    pipeline = ImagePipeline(source_dir=str(source), cache_dir=str(tmp_path / "cache"))
+
+    info = pipeline.info("/static/wide.png")
+    assert [width for _, width in info.srcset] == [320, 640, 960]
+    assert (info.width, info.height) == (960, 480)
+
+
+def test_etag_matching():
+    """
+    If-None-Match should match any listed tag or a wildcard.
+    """
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('*', '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
+
+
+def test_img_tag_uses_the_original_until_variants_exist(tmp_path):
+    """
+    A page should get the original URL at once while the variants are created in the background.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "static"
+    source.mkdir()
+    Image.new("RGB", (800, 400), "white").save(source / "diagram.png")
+    pipeline = ImagePipeline(source_dir=str(source), cache_dir=str(tmp_path / "cache"))
+
+    assert pipeline.ready_info("/static/diagram.png") is None
+    tag = pipeline.img_tag("/static/diagram.png", "Diagram")
+    assert 'src="/static/diagram.png"' in tag and 'srcset' not in tag
+
+    pipeline._executor.shutdown(wait=True)
+    assert 'srcset="/images/' in pipeline.img_tag("/static/diagram.png", "Diagram")
+    assert pipeline.preload_tag("/static/diagram.png").startswith('<img src="/images/')
+
+
+def test_preload_is_skipped_until_variants_exist(tmp_path):
+    """
+    Preloading should not create variants on the caller's thread, nor fetch an original that is about to be replaced.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "static"
+    source.mkdir()
+    Image.new("RGB", (800, 400), "white").save(source / "diagram.png")
+    pipeline = ImagePipeline(source_dir=str(source), cache_dir=str(tmp_path / "cache"))
+
+    assert pipeline.preload_tag("/static/diagram.png") == ''
+    pipeline._executor.shutdown(wait=True)
+    assert 'srcset="/images/' in pipeline.preload_tag("/static/diagram.png")
@@ -0,0 +1,38 @@
+from knowledge_index import KnowledgeIndex, split_chunks
+
+KNOWLEDGE_BASE = """# Security
+> [!note]- malware
+> 'Malicious software' designed to damage computer systems.
+
+> [!note]- phishing
+> Fraudulent emails that trick users into revealing passwords.
+
+# Networks
+> [!note]- router
+> A device that forwards packets between networks.
+"""
+
+
+def test_chunks_keep_their_heading():
+    """
+    Chunks should stop at headings and carry the heading they belong to.
+    """
+    chunks = split_chunks(KNOWLEDGE_BASE, max_chars=80)
+    assert len(chunks) == 3
+    assert chunks[1].startswith("# Security\n\n> [!note]- phishing")
+    assert chunks[2].startswith("# Networks")
+
+
+def test_search_ranks_relevant_chunks_and_reindexes_changes(tmp_path):
+    """
+    Search should return matching chunks, and a changed file should be reindexed on load.
+    """
+    path = tmp_path / "kb.md"
+    path.write_text(KNOWLEDGE_BASE)
+    index = KnowledgeIndex(str(path), max_chars=80)
+    assert index.search("emails asking for passwords", k=1) == [split_chunks(KNOWLEDGE_BASE, 80)[1]]
+    assert not KnowledgeIndex(str(path), max_chars=80).load()
+
+    path.write_text(KNOWLEDGE_BASE + "\n> [!note]- firewall\n> Filters network traffic.\n")
+    assert index.load()
+    assert "firewall" in index.search("firewall traffic", k=1)[0]
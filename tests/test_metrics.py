@@ -0,0 +1,56 @@
+import pytest
+
+from metrics import Registry, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Histograms should render cumulative buckets, sum and count per label value.
+    """
+    registry = Registry()
+    latency = registry.histogram('page_seconds', 'Time to build a page', ['page'], buckets=(0.1, 1.0))
+    latency.observe(0.05, page='quiz')
+    latency.observe(0.5, page='quiz')
+    latency.observe(3.0, page='quiz')
+    latency.observe(0.1, page='results')
+
+    text = registry.render()
+    assert '# TYPE page_seconds histogram' in text
+    assert 'page_seconds_bucket{page="quiz",le="0.1"} 1' in text
+    assert 'page_seconds_bucket{page="quiz",le="1.0"} 2' in text
+    assert 'page_seconds_bucket{page="quiz",le="+Inf"} 3' in text
+    assert 'page_seconds_sum{page="quiz"} 3.55' in text
+    assert 'page_seconds_count{page="results"} 1' in text
+
+    with pytest.raises(ValueError):
+        latency.observe(1.0)
+
+
+def test_counters_gauges_and_timed_functions():
+    """
+    Gauges backed by a function should be read at render time, and timed functions observed even when they raise.
+    """
+    registry = Registry()
+    messages = registry.counter('messages_total', 'Websocket messages', ['direction'])
+    sessions = []
+    registry.gauge('sessions', 'Live sessions', lambda: len(sessions))
+    handler = registry.histogram('handler_seconds', 'Handler time', ['handler'])
+
+    @timed(handler, handler='submit')
+    def submit(fail=False):
+        if fail:
+            raise RuntimeError
+        return 'ok'
+
+    messages.inc(direction='received')
+    messages.inc(2, direction='received')
+    sessions.extend(['a', 'b'])
+    assert submit() == 'ok'
+    with pytest.raises(RuntimeError):
+        submit(fail=True)
+
+    text = registry.render()
+    assert 'messages_total{direction="received"} 3' in text
+    assert '\nsessions 2\n' in text
+    assert handler.count(handler='submit') == 2
+    assert submit.__name__ == 'submit'
@@ -0,0 +1,43 @@
+import json
+import pstats
+
+from profiling import Profiler
+
+
+def build_page(count):
+    return json.dumps([{'question': i} for i in range(count)])
+
+
+def test_sampled_calls_are_written_as_collapsed_stacks(tmp_path):
+    """
+    Every sampled call should add to its route's collapsed stacks; unsampled calls add nothing.
+    """
+    profiler = Profiler(str(tmp_path / 'profiles'), sample_rate=1.0)
+    page = profiler.profile('/quiz')(build_page)
+    off = Profiler(str(tmp_path / 'off')).profile('/quiz')(build_page)
+
+    assert page(3) == off(3) == build_page(3)
+    page(100)
+    profiler.flush()
+
+    assert profiler.stats() == {'/quiz': 2}
+    lines = (tmp_path / 'profiles' / 'quiz.collapsed').read_text().splitlines()
+    stacks = {line.rsplit(' ', 1)[0] for line in lines}
+    assert '/quiz;test_profiling.py:build_page;__init__.py:dumps' in stacks
+    assert all(line.startswith('/quiz') and int(line.rsplit(' ', 1)[1]) >= 1 for line in lines)
+    assert not (tmp_path / 'off').exists()
+
+
+def test_pstats_are_aggregated_per_route(tmp_path):
+    """
+    In pstats format the profiles of all sampled calls of a route should be merged into one file.
+    """
+    profiler = Profiler(str(tmp_path), sample_rate=1.0, fmt='pstats')
+    page = profiler.profile('submit_answer')(build_page)
+    for _ in range(3):
+        page(10)
+    profiler.flush()
+
+    stats = pstats.Stats(str(tmp_path / 'submit_answer.prof'))
+    calls = {func[2]: counts[1] for func, counts in stats.stats.items()}
+    assert calls['build_page'] == 3
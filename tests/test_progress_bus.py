@@ -0,0 +1,58 @@
+import time
+
+from progress_bus import ProgressBus, StudentProgress
+
+NOW = time.time()
+
+
+def progress(session_id, answered, completed=False, updated_at=None):
+    return StudentProgress(session_id, f'Student {session_id}', 'algebra', 'Algebra', answered, 10,
+                           answered, answered, completed, NOW if updated_at is None else updated_at)
+
+
+def test_updates_are_coalesced_per_student():
+    """
+    A subscriber should get only the latest progress of each student that changed since its last drain.
+    """
+    bus = ProgressBus()
+    bus.publish(progress('a', 1))
+    subscription = bus.subscribe()
+    assert subscription.drain() == [progress('a', 1)]
+
+    for answered in range(2, 8):
+        bus.publish(progress('a', answered))
+    bus.publish(progress('b', 1))
+    assert sorted(subscription.drain()) == [progress('a', 7), progress('b', 1)]
+    assert subscription.drain() == []
+
+    subscription.close()
+    bus.publish(progress('a', 8))
+    assert bus.stats() == {'students': 2, 'subscribers': 0, 'published': 9}
+
+
+def test_least_recently_updated_students_are_forgotten():
+    """
+    The bus should track at most max_students attempts.
+    """
+    bus = ProgressBus(max_students=2)
+    subscription = bus.subscribe()
+    for session_id in 'abc':
+        bus.publish(progress(session_id, 1))
+    assert sorted(p.session_id for p in subscription.drain()) == ['b', 'c']
+    assert [p.session_id for p in bus.snapshot()] == ['b', 'c']
+    assert subscription.drain_forgotten() == {'a'}
+
+
+def test_idle_students_are_forgotten():
+    """
+    Attempts not updated for max_age seconds should be dropped and reported to subscribers.
+    """
+    bus = ProgressBus(max_age=60)
+    subscription = bus.subscribe()
+    bus.publish(progress('old', 10, completed=True, updated_at=NOW - 120))
+    bus.publish(progress('new', 1))
+
+    assert [p.session_id for p in subscription.drain()] == ['new']
+    assert subscription.drain_forgotten() == {'old'}
+    assert subscription.drain_forgotten() == set()
+    assert [p.session_id for p in bus.snapshot()] == ['new']
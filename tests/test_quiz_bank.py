@@ -0,0 +1,168 @@
+import json
+import marshal
+import os
+
+import pytest
+
+from quiz_bank import SNAPSHOT_VERSION, QuizBank
+from quiz_model import Quiz, QuizFormatError
+
+
+def write_quiz(path, title, questions=1, mtime=None):
+    path.write_text(json.dumps({
+        'title': title,
+        'questions': [{'question': f'Q{i}', 'options': ['a', 'b'], 'correct': 0, 'explanation': ''}
+                      for i in range(questions)],
+    }))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_refresh_swaps_changed_quizzes(tmp_path):
+    """
+    Edited, added and removed files should be picked up, while a previously
+    fetched quiz keeps its old content.
+    """
+    write_quiz(tmp_path / 'algebra.json', 'Algebra', mtime=1_000_000)
+    write_quiz(tmp_path / 'geometry.json', 'Geometry', mtime=1_000_000)
+    bank = QuizBank(str(tmp_path))
+    pinned = bank['algebra']
+
+    changed = []
+    bank.add_listener(changed.append)
+    write_quiz(tmp_path / 'algebra.json', 'Algebra v2', questions=2, mtime=2_000_000)
+    write_quiz(tmp_path / 'calculus.json', 'Calculus')
+    os.remove(tmp_path / 'geometry.json')
+
+    changes = bank.refresh()
+    assert changes == {'added': ['calculus'], 'changed': ['algebra'], 'removed': ['geometry']}
+    assert sorted(changed) == ['algebra', 'geometry']
+    assert bank['algebra'].title == 'Algebra v2'
+    assert pinned.title == 'Algebra'
+    assert sorted(bank) == ['algebra', 'calculus']
+
+
+def test_broken_edit_keeps_previous_version(tmp_path):
+    """
+    A file saved with invalid JSON should not take the quiz offline.
+    """
+    write_quiz(tmp_path / 'algebra.json', 'Algebra', mtime=1_000_000)
+    bank = QuizBank(str(tmp_path))
+    (tmp_path / 'algebra.json').write_text('{"title": ')
+
+    assert bank.refresh() == {'added': [], 'changed': [], 'removed': []}
+    assert bank['algebra'].title == 'Algebra'
+
+
+def test_compiled_questions_are_validated_and_immutable():
+    """
+    Questions are compiled into immutable objects with precomputed labels.
+    """
+    quiz = Quiz.from_dict('algebra', {'questions': [
+        {'question': 'Solve $x + 1 = 2$', 'options': ['0', '1', '2'], 'correct': 1, 'explanation': 'x = 1'},
+    ]})
+    question = quiz.questions[0]
+    assert quiz.title == 'algebra'
+    assert question.labels == ('A', 'B', 'C')
+    assert question.option_count == 3
+    assert quiz.answer_key == (1,)
+    with pytest.raises(AttributeError):
+        question.correct = 0
+
+    with pytest.raises(QuizFormatError):
+        Quiz.from_dict('broken', {'questions': [{'question': 'Q', 'options': ['a', 'b'], 'correct': 5}]})
+
+
+def test_lazy_bank_loads_questions_on_demand(tmp_path, capsys):
+    """
+    A lazy bank lists quizzes from its manifest and keeps at most cache_size
+    quizzes loaded; a restart reuses the manifest without parsing files.
+    """
+    for name in ('a', 'b', 'c'):
+        write_quiz(tmp_path / f'{name}.json', name.upper(), questions=2)
+
+    bank = QuizBank(str(tmp_path), lazy=True, cache_size=2)
+    assert bank.info('a') == ('A', 2, bank.info('a').signature)
+    assert len(bank._quizzes) == 0
+
+    assert bank['a'].title == 'A'
+    bank['b'], bank['c']
+    assert list(bank._quizzes) == ['b', 'c']
+
+    capsys.readouterr()
+    restarted = QuizBank(str(tmp_path), lazy=True)
+    assert 'Indexed 3 quizzes (0 parsed)' in capsys.readouterr().out
+    assert restarted.refresh() == {'added': [], 'changed': [], 'removed': []}
+    assert restarted.manifest() == bank.manifest()
+
+
+def test_restart_restores_unchanged_quizzes_from_snapshot(tmp_path, capsys):
+    """
+    A restarted bank should reparse only files changed since the snapshot, and ignore a corrupt snapshot.
+    """
+    for name in ('a', 'b', 'c'):
+        write_quiz(tmp_path / f'{name}.json', name.upper(), questions=2, mtime=1_000_000)
+    bank = QuizBank(str(tmp_path))
+    write_quiz(tmp_path / 'b.json', 'B v2', questions=3, mtime=2_000_000)
+
+    capsys.readouterr()
+    restarted = QuizBank(str(tmp_path))
+    out = capsys.readouterr().out
+    assert 'Loaded quiz: b (3 questions)' in out
+    assert 'Loaded 2 quizzes from snapshot (1 parsed)' in out
+    assert restarted['a'].fingerprint == bank['a'].fingerprint
+    assert restarted['b'].title == 'B v2'
+    with pytest.raises(AttributeError):
+        restarted['a'].questions[0].correct = 1
+
+    (tmp_path / '.quiz_snapshot.marshal').write_bytes(b'not marshal data')
+    assert sorted(QuizBank(str(tmp_path))) == ['a', 'b', 'c']
+    assert 'Ignoring unreadable quiz snapshot' in capsys.readouterr().out
+
+    # Entries are type checked, since anyone who can add a quiz file can write the snapshot
+    signature = restarted.manifest()['a'].signature
+    (tmp_path / '.quiz_snapshot.marshal').write_bytes(marshal.dumps({'version': SNAPSHOT_VERSION, 'quizzes': {
+        'a': (signature, 'quiz', ('A', (('Q?', ('x', 'y'), 5, '', None, (), None, None),)))}}))
+    assert sorted(QuizBank(str(tmp_path))) == ['a', 'b', 'c']
+    assert 'Ignoring unreadable quiz snapshot' in capsys.readouterr().out
+    QuizBank(str(tmp_path))
+    assert 'Loaded 3 quizzes from snapshot (0 parsed)' in capsys.readouterr().out
+
+
+def test_lazy_bank_keeps_last_good_version_of_broken_file(tmp_path):
+    """
+    A lazy bank should keep serving a broken file's last good version after LRU eviction, or stop listing it.
+    """
+    for name in ('a', 'b', 'c'):
+        write_quiz(tmp_path / f'{name}.json', name.upper(), mtime=1_000_000)
+    bank = QuizBank(str(tmp_path), lazy=True, cache_size=1)
+    assert bank['a'].title == 'A'
+
+    (tmp_path / 'a.json').write_text('{"title": ')
+    (tmp_path / 'b.json').write_text('{"title": ')
+    assert bank.refresh() == {'added': [], 'changed': [], 'removed': ['b']}
+    bank['c']
+    assert 'a' not in bank._quizzes
+    assert bank['a'].title == 'A'
+    assert sorted(bank) == ['a', 'c']
+
+    write_quiz(tmp_path / 'b.json', 'B v2', mtime=2_000_000)
+    assert bank.refresh() == {'added': ['b'], 'changed': [], 'removed': []}
+    assert 'a' not in QuizBank(str(tmp_path), lazy=True)
+
+
+def test_listeners_can_ask_for_added_quizzes(tmp_path):
+    """
+    Listeners registered with added=True should also hear about new quiz files.
+    """
+    write_quiz(tmp_path / 'algebra.json', 'Algebra', mtime=1_000_000)
+    bank = QuizBank(str(tmp_path))
+    changed, everything = [], []
+    bank.add_listener(changed.append)
+    bank.add_listener(everything.append, added=True)
+
+    write_quiz(tmp_path / 'algebra.json', 'Algebra v2', mtime=2_000_000)
+    write_quiz(tmp_path / 'calculus.json', 'Calculus')
+    bank.refresh()
+    assert changed == ['algebra']
+    assert sorted(everything) == ['algebra', 'calculus']
@@ -0,0 +1,73 @@
+import json
+
+from quiz_bank import QuizBank
+from quiz_ingest import Ingest
+
+QUESTIONS = [
+    {'question': '1 + 1?', 'options': ['2', '3'], 'correct': 0, 'explanation': 'Count'},
+    {'question': '2 + 2?', 'options': ['3', '4'], 'correct': 1, 'explanation': 'Count again'},
+]
+GENERATED = [
+    {'question': '1 + 1?', 'options': ['A) 2', 'B) 3'], 'correct_answer': 'A', 'explanation': 'Count'},
+    {'question': '2 + 2?', 'options': ['A) 3', 'B) 4'], 'correct_answer': 'B', 'explanation': 'Count again'},
+]
+
+
+def make_inputs(directory):
+    directory.mkdir()
+    (directory / 'sums.json').write_text(json.dumps({'title': 'Sums', 'questions': QUESTIONS}))
+    (directory / 'generated.json').write_text(
+        '```json\n' + json.dumps({'title': 'Generated sums', 'questions': GENERATED}) + '\n```')
+    (directory / 'y8_exam.py').write_text(
+        'y8_exam = {\n'
+        '    "Algebra Basics": [{"question": "x + 1 = 2?", "options": ["1", "2"], "correct": 0, "image": None}],\n'
+        '    "Geometry": [{"question": "Sides of a square?", "options": ["3", "4"], "correct": 1}],\n'
+        '}\n')
+    (directory / 'broken.json').write_text(json.dumps({'title': 'Broken', 'questions': [
+        {'question': 'Fine?', 'options': ['a', 'b'], 'correct': 0},
+        {'question': '', 'options': ['a', 'b'], 'correct': 0},
+        {'question': 'No options?', 'options': [], 'correct': 0},
+    ]}))
+
+
+def test_all_input_formats_are_converted_and_deduplicated(tmp_path):
+    """
+    Bank JSON, generated JSON and archive modules should be imported, with duplicates and invalid files reported.
+    """
+    make_inputs(tmp_path / 'inputs')
+    bank_dir = tmp_path / 'bank'
+
+    summary = Ingest(str(bank_dir), workers=2).run([str(tmp_path / 'inputs')])
+    assert summary['written'] == 3
+    assert summary['duplicates'] == 1  # sums.json asks the same questions as the generated quiz
+    assert summary['failed'] == 1
+    assert list(summary['errors'].values()) == [['question 2 has no question text',
+                                                 'question 3 needs a list of at least two text options']]
+
+    bank = QuizBank(str(bank_dir))
+    assert sorted(bank) == ['generated', 'y8_exam_algebra_basics', 'y8_exam_geometry']
+    assert bank['generated'].questions[1].options == ('3', '4')
+    assert bank['generated'].answer_key == (0, 1)
+    assert bank['y8_exam_geometry'].title == 'Geometry'
+
+
+def test_reruns_skip_unchanged_inputs(tmp_path):
+    """
+    A re-run should only read changed files, rewrite their own quizzes, and not overwrite other quizzes.
+    """
+    make_inputs(tmp_path / 'inputs')
+    bank_dir = tmp_path / 'bank'
+    Ingest(str(bank_dir), workers=1).run([str(tmp_path / 'inputs')])
+
+    summary = Ingest(str(bank_dir), workers=1).run([str(tmp_path / 'inputs')])
+    assert (summary['skipped'], summary['written'], summary['failed']) == (3, 0, 1)
+
+    (tmp_path / 'inputs' / 'sums.json').write_text(json.dumps({'title': 'Sums', 'questions': QUESTIONS[:1]}))
+    (tmp_path / 'other').mkdir()
+    (tmp_path / 'other' / 'sums.json').write_text(json.dumps({'title': 'Other sums', 'questions': QUESTIONS[1:]}))
+    summary = Ingest(str(bank_dir), workers=1).run([str(tmp_path / 'inputs'), str(tmp_path / 'other')])
+    assert (summary['skipped'], summary['written']) == (2, 2)
+
+    names = sorted(path.stem for path in bank_dir.glob('[!.]*.json'))
+    assert len(names) == 5 and names[1] == 'sums' and names[2].startswith('sums_')
+    assert len(json.loads((bank_dir / 'sums.json').read_text())['questions']) == 1
@@ -0,0 +1,100 @@
+import json
+import random
+
+import pytest
+
+from quiz_bank import QuizBank
+from quiz_model import DrawQuiz, PoolRule, Question
+from quiz_pools import PoolIndex
+
+
+def write_pool(path, count=50):
+    path.write_text(json.dumps({
+        'title': 'Pool',
+        'questions': [{'question': f'Q{i}', 'options': ['right', 'wrong', 'other'], 'correct': 0,
+                       'tags': ['algebra'] if i % 2 else ['geometry'],
+                       'difficulty': 'easy' if i < count // 2 else 'hard'}
+                      for i in range(count)],
+    }))
+
+
+def test_draw_quiz_is_loaded_from_the_bank(tmp_path):
+    """
+    A file with draw rules should load as a DrawQuiz listed with its total question count.
+    """
+    write_pool(tmp_path / 'pool.json')
+    (tmp_path / 'exam.json').write_text(json.dumps({
+        'title': 'Exam', 'shuffle_options': True,
+        'draw': [{'tags': 'algebra', 'difficulty': 'easy', 'count': 3}, {'tags': ['geometry'], 'count': 2}],
+    }))
+    bank = QuizBank(str(tmp_path))
+
+    exam = bank['exam']
+    assert isinstance(exam, DrawQuiz)
+    assert bank.info('exam').question_count == 5
+    assert exam.rules[0].criteria == (('algebra',), None, 'easy')
+    assert exam.answer_key is None
+
+
+def test_pools_intersect_criteria_and_follow_the_bank(tmp_path):
+    """
+    Pools should hold questions matching every criterion and be rebuilt when the bank changes.
+    """
+    write_pool(tmp_path / 'pool.json')
+    bank = QuizBank(str(tmp_path))
+    index = PoolIndex(bank)
+
+    pool = index.pool(('algebra',), difficulty='easy')
+    assert len(pool) == 12
+    assert all('algebra' in question.tags and question.difficulty == 'easy' for question in pool)
+    assert index.pool(('algebra',), None, 'easy') is pool
+
+    write_pool(tmp_path / 'pool.json', count=10)
+    bank.refresh()
+    assert len(index.pool(('algebra',), difficulty='easy')) == 2
+
+
+def test_sample_draws_distinct_questions_and_shuffles_options(tmp_path):
+    """
+    Each rule should add distinct questions, and shuffled options should keep the right answer.
+    """
+    write_pool(tmp_path / 'pool.json')
+    (tmp_path / 'exam.json').write_text(json.dumps({
+        'title': 'Exam', 'shuffle_options': True,
+        'draw': [{'tags': ['algebra'], 'count': 20}, {'difficulty': 'easy', 'count': 10}],
+    }))
+    bank = QuizBank(str(tmp_path))
+    quiz = PoolIndex(bank).sample(bank['exam'], random.Random(1))
+
+    assert quiz.name == 'exam' and quiz.title == 'Exam'
+    assert len(quiz) == 30
+    assert len({question.text for question in quiz.questions}) == 30
+    assert all(question.options[question.correct] == 'right' for question in quiz.questions)
+    assert any(question.correct != 0 for question in quiz.questions)
+    assert isinstance(quiz.questions[0], Question)
+
+
+def test_sources_record_drawn_questions_and_option_order(tmp_path):
+    """
+    Every drawn question should be traceable to its source question and shown option order.
+    """
+    write_pool(tmp_path / 'pool.json', count=10)
+    bank = QuizBank(str(tmp_path))
+    draw = DrawQuiz('exam', 'Exam', (PoolRule(4, ('algebra',)),), shuffle_options=True)
+    quiz, sources = PoolIndex(bank).sample_with_sources(draw, random.Random(2))
+
+    assert len(sources) == 4
+    for question, source in zip(quiz.questions, sources):
+        original = bank[source['quiz']].questions[source['question']]
+        assert original.with_options(tuple(source['options'])).options == question.options
+        assert question.correct == source['options'].index(original.correct)
+
+
+def test_pools_refuse_a_lazy_bank(tmp_path):
+    """
+    Building pools would load every quiz of a lazy bank through its cache, so it should fail instead.
+    """
+    write_pool(tmp_path / 'pool.json')
+    index = PoolIndex(QuizBank(str(tmp_path), lazy=True))
+    with pytest.raises(RuntimeError):
+        index.pool(('algebra',))
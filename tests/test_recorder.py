@@ -0,0 +1,67 @@
+import json
+
+from quiz_results.recorder import ResultsWriter
+
+
+def make_result(attempt_id, completed_at='20250301-093000'):
+    return {
+        'attempt_id': attempt_id,
+        'student_name': 'Alex',
+        'quiz_name': 'algebra',
+        'answers': [0, 1],
+        'score': '1/2',
+        'completed_at': completed_at,
+    }
+
+
+def test_writer_batches_into_daily_log(tmp_path):
+    """
+    Queued results should end up as lines in the log for their day.
+    """
+    writer = ResultsWriter(directory=str(tmp_path), flush_interval=0.01)
+    batches = []
+    writer.add_listener(batches.append)
+
+    for i in range(5):
+        assert writer.submit(make_result(f'attempt-{i}'))
+    writer.flush()
+    writer.close()
+
+    lines = (tmp_path / 'results_20250301.jsonl').read_text().splitlines()
+    assert [json.loads(line)['attempt_id'] for line in lines] == [f'attempt-{i}' for i in range(5)]
+    assert sum(len(batch) for batch in batches) == 5
+
+
+def test_writer_ignores_duplicate_attempts(tmp_path):
+    """
+    Submitting the same attempt twice (e.g. reloading /results) writes it once.
+    """
+    writer = ResultsWriter(directory=str(tmp_path), flush_interval=0.01)
+    assert writer.submit(make_result('same'))
+    assert not writer.submit(make_result('same'))
+    writer.close()
+
+    lines = (tmp_path / 'results_20250301.jsonl').read_text().splitlines()
+    assert len(lines) == 1
+
+
+def test_failed_writes_are_retried(tmp_path):
+    """
+    Results that could not be written should be kept, still deduplicated, and written once the disk recovers.
+    """
+    blocker = tmp_path / 'results'
+    blocker.write_text('a file where the results directory should be')
+    writer = ResultsWriter(directory=str(blocker), flush_interval=0.01, retry_interval=0.01)
+    batches = []
+    writer.add_listener(batches.append)
+
+    assert writer.submit(make_result('kept'))
+    writer.flush()
+    assert batches == []
+    assert not writer.submit(make_result('kept'))
+
+    blocker.unlink()
+    writer.close()
+    lines = (blocker / 'results_20250301.jsonl').read_text().splitlines()
+    assert [json.loads(line)['attempt_id'] for line in lines] == ['kept']
+    assert not writer.submit(make_result('kept'))
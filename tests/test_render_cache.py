@@ -0,0 +1,41 @@
+from render_cache import RenderCache
+
+
+def test_render_reuses_cached_html():
+    """
+    Rendering the same content twice should convert it only once.
+    """
+    cache = RenderCache(max_entries=10)
+    first = cache.render('Solve $x^2 = 4$', quiz='algebra')
+    second = cache.render('Solve $x^2 = 4$', quiz='algebra')
+    assert first == second
+    assert '<math' in first
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_is_bounded():
+    """
+    The least recently used entry should be evicted once the cache is full.
+    """
+    cache = RenderCache(max_entries=2)
+    cache.render('one')
+    cache.render('two')
+    cache.render('one')
+    cache.render('three')
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+    assert RenderCache.make_key('two') not in cache._entries
+
+
+def test_invalidate_quiz_only_drops_its_entries():
+    """
+    Invalidating a quiz should leave content of other quizzes cached.
+    """
+    cache = RenderCache()
+    cache.render('question A', quiz='a')
+    cache.render('question B', quiz='b')
+    assert cache.invalidate('a') == 1
+    assert len(cache) == 1
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
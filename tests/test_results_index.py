@@ -0,0 +1,99 @@
+import json
+
+from quiz_results.index import ResultsIndex
+
+
+def make_result(attempt_id, student, answers, score, completed_at='20250301-093000'):
+    return {
+        'attempt_id': attempt_id,
+        'student_name': student,
+        'quiz_name': 'algebra',
+        'answers': answers,
+        'score': score,
+        'completed_at': completed_at,
+    }
+
+
+def test_ingest_and_aggregate(tmp_path):
+    """
+    Ingested results should be reflected in the aggregate queries.
+    """
+    index = ResultsIndex(str(tmp_path / 'index.sqlite3'), answer_key=lambda quiz: [1, 0])
+    assert index.ingest([
+        make_result('a1', 'Alex', [1, 0], '2/2'),
+        make_result('a2', 'Sam', [1, 1], '1/2', completed_at='20250302-093000'),
+    ]) == 2
+    assert index.ingest([make_result('a1', 'Alex', [1, 0], '2/2')]) == 0
+
+    assert index.score_distribution('algebra') == {1: 1, 2: 1}
+    rates = [row['rate'] for row in index.question_correctness('algebra')]
+    assert rates == [1.0, 0.5]
+    assert [row['attempt_id'] for row in index.student_history('Sam')] == ['a2']
+    assert index.quiz_summary()[0]['attempts'] == 2
+
+
+def test_sync_reads_only_new_results(tmp_path):
+    """
+    sync() should pick up per-attempt files and only the new tail of JSONL logs.
+    """
+    results = tmp_path / 'results'
+    results.mkdir()
+    (results / 'algebra_Alex_20250301-093000.json').write_text(json.dumps({
+        'student_name': 'Alex', 'quiz_name': 'algebra', 'answers': [1], 'score': '1/1',
+        'completed_at': '20250301-093000'}))
+    log = results / 'results_20250302.jsonl'
+    log.write_text(json.dumps(make_result('b1', 'Sam', [1], '1/1')) + '\n')
+
+    index = ResultsIndex(str(tmp_path / 'index.sqlite3'))
+    assert index.sync(str(results)) == 2
+    assert index.sync(str(results)) == 0
+
+    with open(log, 'a') as f:
+        f.write(json.dumps(make_result('b2', 'Kim', [0], '0/1')) + '\n')
+    assert index.sync(str(results)) == 1
+
+
+def test_recorded_correctness_wins_over_the_current_answer_key(tmp_path):
+    """
+    Results saved with their correctness should be indexed as taken, even after the answer key changed.
+    """
+    index = ResultsIndex(str(tmp_path / 'index.sqlite3'), answer_key=lambda quiz: [0, 0])
+    index.ingest([
+        dict(make_result('a1', 'Alex', [1, 0], '2/2'), is_correct=[True, True], quiz_fingerprint='v1'),
+        make_result('a2', 'Sam', [1, 0], '1/2'),
+    ])
+
+    rates = [row['rate'] for row in index.question_correctness('algebra')]
+    assert rates == [0.5, 1.0]
+
+
+def test_drawn_answers_are_counted_for_their_source_question(tmp_path):
+    """
+    Answers to a drawn quiz should be grouped by the pool question given, not by the position it was shown in.
+    """
+    index = ResultsIndex(str(tmp_path / 'index.sqlite3'))
+    index.ingest([
+        dict(make_result('d1', 'Alex', [0, 1], '1/2'), quiz_name='exam', is_correct=[True, False],
+             questions=[{'quiz': 'algebra', 'question': 3, 'options': [0, 1]},
+                        {'quiz': 'geometry', 'question': 0, 'options': [1, 0]}]),
+        dict(make_result('d2', 'Sam', [1, 1], '2/2'), quiz_name='exam', is_correct=[True, True],
+             questions=[{'quiz': 'geometry', 'question': 0, 'options': [0, 1]},
+                        {'quiz': 'algebra', 'question': 3, 'options': [1, 0]}]),
+    ])
+
+    rows = index.question_correctness('exam')
+    assert [(row['quiz'], row['question'], row['answered'], row['correct']) for row in rows] == \
+        [('algebra', 3, 2, 2), ('geometry', 0, 2, 1)]
+
+
+def test_index_from_an_older_schema_is_rebuilt(tmp_path):
+    """
+    An index created before answers recorded their source question should be dropped, so sync() refills it.
+    """
+    path = str(tmp_path / 'index.sqlite3')
+    index = ResultsIndex(path)
+    index.ingest([make_result('a1', 'Alex', [1, 0], '2/2')])
+    index._conn.execute('PRAGMA user_version = 1')
+    index.close()
+
+    assert ResultsIndex(path).quiz_summary() == []
@@ -0,0 +1,118 @@
+import sqlite3
+import time
+
+import pytest
+
+from quiz_model import Quiz
+from session_store import QuizSession, SessionBackend, SessionStore, SqliteSessionStore
+
+
+def test_least_recently_used_session_is_evicted():
+    """
+    A full store should evict the session that was used least recently.
+    """
+    store = SessionStore(max_sessions=2)
+    first = store.get_or_create('a')
+    store.get_or_create('b')
+    assert store.get('a') is first
+    store.get_or_create('c')
+
+    assert 'b' not in store
+    assert sorted(store) == ['a', 'c']
+    assert store.stats() == {'live': 2, 'created': 3, 'expired': 0, 'evicted': 1}
+
+
+def test_idle_sessions_expire():
+    """
+    Sessions idle for longer than the TTL should be dropped.
+    """
+    store = SessionStore(ttl=0.05)
+    store.get_or_create('a')
+    time.sleep(0.1)
+    store.get_or_create('b')
+
+    assert 'a' not in store
+    assert store.stats()['expired'] == 1
+
+
+def test_sessions_use_slots():
+    """
+    QuizSession should not carry a per-instance __dict__.
+    """
+    assert not hasattr(QuizSession(), '__dict__')
+
+
+def test_sqlite_store_shares_sessions_and_pins_quiz(tmp_path):
+    """
+    A session saved by one store should be visible to another store on the
+    same database, with the quiz version it started with.
+    """
+    path = str(tmp_path / 'sessions.sqlite3')
+    quiz = Quiz.from_dict('algebra', {'title': 'Algebra', 'questions': [
+        {'question': 'Q1', 'options': ['a', 'b'], 'correct': 1},
+    ]})
+    bank = {'algebra': quiz}
+    first = SqliteSessionStore(path, bank)
+    second = SqliteSessionStore(path, bank)
+
+    session = first.get_or_create('abc')
+    session.current_quiz = 'algebra'
+    session.quiz = quiz
+    session.answers.append((0, 1))
+    session.score = 1
+    first.save(session)
+
+    # The quiz file changes while the attempt is in flight
+    bank['algebra'] = Quiz.from_dict('algebra', {'title': 'Algebra v2', 'questions': []})
+
+    loaded = second.get('abc')
+    assert loaded.answers == [(0, 1)]
+    assert loaded.score == 1
+    assert loaded.quiz.title == 'Algebra'
+    assert loaded.quiz.fingerprint == quiz.fingerprint
+
+
+def test_saved_result_is_remembered_by_other_stores(tmp_path):
+    """
+    A session marked as saved should stay marked when loaded by another process, so its result isn't written again.
+    """
+    path = str(tmp_path / 'sessions.sqlite3')
+    first = SqliteSessionStore(path, {})
+    session = first.get_or_create('abc')
+    session.attempt_id = 'attempt-1'
+    session.result_saved = True
+    first.save(session)
+
+    loaded = SqliteSessionStore(path, {}).get('abc')
+    assert loaded.result_saved
+
+    # Sessions stored before the flag existed have not saved their result
+    data = session.to_dict()
+    del data['result_saved']
+    assert not QuizSession.from_dict('old', data, None).result_saved
+
+
+def test_locked_database_is_retried(tmp_path):
+    """
+    A write blocked by another process should wait only briefly per try, and succeed once the lock is released.
+    """
+    path = str(tmp_path / 'sessions.sqlite3')
+    store = SqliteSessionStore(path, {}, busy_timeout=0.01, retries=1)
+    session = store.get_or_create('abc')
+    session.student_name = 'Ann'
+
+    blocker = sqlite3.connect(path)
+    blocker.execute('BEGIN IMMEDIATE')
+    with pytest.raises(sqlite3.OperationalError):
+        store.save(session)
+    blocker.rollback()
+    store.save(session)
+    assert SqliteSessionStore(path, {}).get('abc').student_name == 'Ann'
+
+
+def test_session_backend_is_abstract():
+    """
+    Stores must implement the whole interface.
+    """
+    with pytest.raises(TypeError):
+        SessionBackend()